@@ -1,17 +1,48 @@
 import sys
+import time
+
+# 冷启动计时零点：尽早记录，导入 tkinter 与网络模块的耗时也计入
+_STARTED = time.perf_counter()
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+	# 带参数启动时进入命令行 / 服务模式，不加载 tkinter
+	from ocoa_cli import main
+	sys.exit(main(sys.argv[1:]))
+
+if __name__ == "__main__":
+	# 单实例：启动之初先抢占命令通道端口（绑定即为抢占，天然互斥），窗口构建期间再启动的实例也会抢占失败
+	# 抢占失败说明已有实例：让它把窗口切到前台，本进程立即退出，不加载 tkinter、不重复初始化
+	from ocoa_core import default_data_dir, send_instance_command, InstanceServer
+	_instance = InstanceServer(default_data_dir())
+	_instance_reply = None
+	if not _instance.start():
+		# 对方刚绑定端口、尚未写出实例信息时暂无应答，稍后重试
+		for _ in range(10):
+			_instance_reply = send_instance_command(default_data_dir(), "focus", timeout=5.0)
+			if _instance_reply is not None:
+				break
+			time.sleep(0.3)
+		if _instance_reply is not None and _instance_reply.get("ok"):
+			sys.exit(0)
+
 import os
-import json
 import re
-import webbrowser
-import subprocess
-import urllib.request
-import urllib.error
+import mmap
+import heapq
+import queue
+import itertools
+import threading
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from collections import deque
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from tkinter import scrolledtext
+
+from ocoa_core import (
+	MONITOR_UNKNOWN, MONITOR_DISCONNECTED, MONITOR_WRONG_SSID, MONITOR_CAPTIVE, MONITOR_OFFLINE, MONITOR_ONLINE,
+	NetworkService, InstanceServer, FlowProfiler, tracer, setup_logging, configure_log_retention, normalize_url,
+	atomic_write_json
+)
 
 
 def enable_high_dpi_scaling():
@@ -22,35 +53,916 @@ def enable_high_dpi_scaling():
 		pass
 
 
+class AnimationClock:
+	# 统一的动画时钟：所有淡入淡出在同一个 after() 节拍里推进，无动画时停止计时
+	def __init__(self, root, frame_ms: int = 16):
+		self.root = root
+		self.frame_ms = frame_ms
+		self._fades = {}
+		self._after_id = None
+
+	def fade(self, window, target: float, step: float = 0.08, on_done=None):
+		# 同一窗口的新动画覆盖旧动画；透明度在内存中跟踪，不再每帧读取 -alpha
+		previous = self._fades.get(window)
+		if previous is not None:
+			alpha = previous[0]
+		else:
+			try:
+				alpha = float(window.attributes("-alpha"))
+			except Exception:
+				if on_done:
+					on_done()
+				return
+		self._fades[window] = [alpha, target, abs(step), on_done]
+		if self._after_id is None:
+			self._after_id = self.root.after(self.frame_ms, self._tick)
+
+	def cancel(self, window):
+		self._fades.pop(window, None)
+
+	def stop(self):
+		self._fades.clear()
+		if self._after_id is not None:
+			try:
+				self.root.after_cancel(self._after_id)
+			except Exception:
+				pass
+			self._after_id = None
+
+	def _tick(self):
+		self._after_id = None
+		finished = []
+		for window, fade in list(self._fades.items()):
+			alpha, target, step, on_done = fade
+			alpha = min(target, alpha + step) if alpha < target else max(target, alpha - step)
+			fade[0] = alpha
+			try:
+				window.attributes("-alpha", alpha)
+			except Exception:
+				alpha = target
+			if alpha == target:
+				finished.append((window, on_done))
+		for window, on_done in finished:
+			self._fades.pop(window, None)
+			if on_done:
+				try:
+					on_done()
+				except Exception:
+					pass
+		if self._fades:
+			self._after_id = self.root.after(self.frame_ms, self._tick)
+
+
+class _ToastSlot:
+	__slots__ = ("window", "label", "message", "count", "hide_id")
+
+	def __init__(self, window, label):
+		self.window = window
+		self.label = label
+		self.message = None
+		self.count = 0
+		self.hide_id = None
+
+
+class ToastManager:
+	# Toast 提示：复用少量 Toplevel 窗口，重复消息合并计数，同时可见数量有上限，其余排队
+	def __init__(self, root, clock: AnimationClock, max_visible: int = 3, max_queued: int = 8,
+			duration_ms: int = 1300, bg: str = "#111827", fg: str = "#f9fafb"):
+		self.root = root
+		self.clock = clock
+		self.max_visible = max_visible
+		self.duration_ms = duration_ms
+		self.bg = bg
+		self.fg = fg
+		self._idle = []
+		self._visible = []
+		self._queue = deque(maxlen=max_queued)
+
+	def show(self, message: str):
+		for slot in self._visible:
+			if slot.message == message:
+				# 相同消息仍在显示：计数并延长显示时间（若正在淡出则重新淡入）
+				slot.count += 1
+				self._render(slot)
+				self._layout()
+				self.clock.fade(slot.window, target=0.96, step=0.12)
+				self._schedule_hide(slot)
+				return
+		for item in self._queue:
+			if item[0] == message:
+				item[1] += 1
+				return
+		if len(self._visible) >= self.max_visible:
+			self._queue.append([message, 1])
+			return
+		self._display(message, 1)
+
+	def _acquire(self) -> _ToastSlot:
+		if self._idle:
+			return self._idle.pop()
+		window = tk.Toplevel(self.root)
+		window.overrideredirect(True)
+		window.configure(bg=self.bg)
+		window.withdraw()
+		label = tk.Label(window, bg=self.bg, fg=self.fg, padx=14, pady=8)
+		label.pack()
+		return _ToastSlot(window, label)
+
+	def _display(self, message: str, count: int):
+		slot = self._acquire()
+		slot.message = message
+		slot.count = count
+		self._visible.append(slot)
+		self._render(slot)
+		self._layout()
+		try:
+			slot.window.attributes("-alpha", 0.0)
+		except Exception:
+			pass
+		slot.window.deiconify()
+		self.clock.fade(slot.window, target=0.96, step=0.12)
+		self._schedule_hide(slot)
+
+	def _render(self, slot: _ToastSlot):
+		text = slot.message if slot.count <= 1 else f"{slot.message}（×{slot.count}）"
+		slot.label.configure(text=text)
+
+	def _layout(self):
+		# 自下而上堆叠，避免相互遮挡；标签的请求尺寸在 configure 后即可获得，无需 update_idletasks
+		right = self.root.winfo_x() + self.root.winfo_width() - 16
+		bottom = self.root.winfo_y() + self.root.winfo_height() - 16
+		for slot in self._visible:
+			width = slot.label.winfo_reqwidth()
+			height = slot.label.winfo_reqheight()
+			slot.window.geometry(f"+{right - width}+{bottom - height}")
+			bottom -= height + 8
+
+	def _schedule_hide(self, slot: _ToastSlot):
+		if slot.hide_id is not None:
+			self.root.after_cancel(slot.hide_id)
+		slot.hide_id = self.root.after(self.duration_ms, lambda: self._hide(slot))
+
+	def _hide(self, slot: _ToastSlot):
+		slot.hide_id = None
+		self.clock.fade(slot.window, target=0.0, step=0.12, on_done=lambda: self._release(slot))
+
+	def _release(self, slot: _ToastSlot):
+		try:
+			slot.window.withdraw()
+		except Exception:
+			return
+		if slot in self._visible:
+			self._visible.remove(slot)
+		slot.message = None
+		self._idle.append(slot)
+		if self._queue:
+			message, count = self._queue.popleft()
+			self._display(message, count)
+		else:
+			self._layout()
+
+
+def hex_to_rgb(h: str):
+	h = h.lstrip('#')
+	return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+
+
+class GradientPainter:
+	# 左到右渐变抬头：按尺寸缓存渲染好的单张图片，尺寸变化按帧合并后最多重绘一次
+	def __init__(self, canvas: tk.Canvas, start_hex: str, end_hex: str, frame_ms: int = 16, cache_size: int = 6):
+		self.canvas = canvas
+		self.start_rgb = hex_to_rgb(start_hex)
+		self.end_rgb = hex_to_rgb(end_hex)
+		self.frame_ms = frame_ms
+		self.cache_size = cache_size
+		self.events = 0
+		self.redraws = 0
+		self._cache = {}
+		self._size = None
+		self._after_id = None
+		self._item = canvas.create_image(0, 0, anchor="nw", tags=("gradient",))
+		self.redraw()
+		canvas.bind("<Configure>", self._on_configure, add="+")
+
+	def _on_configure(self, _event):
+		self.events += 1
+		if self._after_id is None:
+			self._after_id = self.canvas.after(self.frame_ms, self._flush)
+
+	def _flush(self):
+		self._after_id = None
+		self.redraw()
+
+	def redraw(self):
+		width = self.canvas.winfo_width() or self.canvas.winfo_reqwidth() or 900
+		height = self.canvas.winfo_height() or self.canvas.winfo_reqheight() or 90
+		if (width, height) == self._size:
+			return
+		self._size = (width, height)
+		self.canvas.itemconfigure(self._item, image=self._image_for(width, height))
+		self.canvas.tag_lower(self._item)
+		self.redraws += 1
+
+	def _image_for(self, width: int, height: int):
+		key = (width, height)
+		image = self._cache.pop(key, None)
+		if image is None:
+			image = tk.PhotoImage(master=self.canvas, width=width, height=height)
+			r1, g1, b1 = self.start_rgb
+			r2, g2, b2 = self.end_rgb
+			span = max(1, width - 1)
+			row = " ".join(
+				f"#{int(r1 + (r2 - r1) * i / span):02x}{int(g1 + (g2 - g1) * i / span):02x}{int(b1 + (b2 - b1) * i / span):02x}"
+				for i in range(width)
+			)
+			# 单行数据平铺到整张图片，一次 put 完成
+			image.put("{" + row + "}", to=(0, 0, width, height))
+			if len(self._cache) >= self.cache_size:
+				self._cache.pop(next(iter(self._cache)))
+		# 重新插入以保持最近使用的顺序
+		self._cache[key] = image
+		return image
+
+
+# Localize level and common phrases to Chinese for UI readability
+UI_LEVEL_NAMES = {"DEBUG": "调试", "INFO": "信息", "WARNING": "警告", "ERROR": "错误", "CRITICAL": "严重"}
+UI_TRANSLATIONS = {
+	"Application starting…": "应用启动中…",
+	"UI initialized and window centered": "界面已初始化并居中",
+	"Auth URL missing; prompting settings dialog": "未配置认证URL，已打开设置",
+	"Opening auth URL: ": "正在打开认证链接：",
+	"Failed to open auth URL": "打开认证链接失败",
+	"No SSID configured; skipping auto check": "未配置WiFi名称，跳过自动检测",
+	"Current SSID: ": "当前WiFi：",
+	"Target SSID: ": "目标WiFi：",
+	"Network usable on target SSID: ": "网络可用性（目标WiFi）：",
+	"Opening auth URL due to unusable network: ": "网络不可用，打开认证链接：",
+	"Failed to open auth URL after unusable check": "网络不可用后打开认证链接失败",
+	"WiFi connect command returned non-zero or uncertain result": "WiFi连接指令返回异常或未知",
+	"User cancelled auto-connect prompt": "用户取消了自动连接",
+	"Failed to connect to target SSID after attempt": "尝试后未能连接到目标WiFi",
+	"Opening auth URL after connect but network unusable": "连接后网络仍不可用，打开认证链接",
+	"Failed to open auth URL after connect": "连接后打开认证链接失败",
+	"Disconnected from WiFi: ": "已断开WiFi：",
+	"WiFi disconnect command failed": "WiFi断开指令失败",
+	"Exception during WiFi disconnect": "断开WiFi时发生异常",
+	"Failed to get connected SSID": "获取当前WiFi失败",
+	"Exception during WiFi connect command": "执行WiFi连接指令时发生异常",
+	"Probe failed: ": "连通性探测失败："
+}
+# 预编译为单次扫描的替换：等级标签与常用英文短语一并处理
+UI_TRANSLATIONS.update({f"[{k}]": f"[{v}]" for k, v in UI_LEVEL_NAMES.items()})
+_UI_TRANSLATION_RE = re.compile("|".join(
+	re.escape(k) for k in sorted(UI_TRANSLATIONS, key=len, reverse=True)
+))
+
+
+def translate_for_ui(text: str) -> str:
+	return _UI_TRANSLATION_RE.sub(lambda m: UI_TRANSLATIONS[m.group(0)], text)
+
+
+class LogEntry:
+	__slots__ = ("seq", "created", "levelno", "levelname", "text")
+
+	def __init__(self, seq, created, levelno, levelname, text):
+		self.seq = seq
+		self.created = created
+		self.levelno = levelno
+		self.levelname = levelname
+		self.text = text
+
+
+class LogStore:
+	# 有界环形日志缓存：按等级建索引（各等级内按序号有序），支持按等级 / 时间 / 关键字查询
+	# 新记录从尾部追加，历史文件中读取的旧记录从头部补入
+	def __init__(self, capacity: int = 20000):
+		self.capacity = capacity
+		self._entries = deque()
+		self._by_level = {}
+		self._next_seq = 0
+		self._low_seq = 0
+
+	def __len__(self):
+		return len(self._entries)
+
+	@property
+	def last_seq(self) -> int:
+		return self._next_seq - 1
+
+	def append(self, created: float, levelno: int, levelname: str, text: str) -> LogEntry:
+		entry = LogEntry(self._next_seq, created, levelno, levelname, text)
+		self._next_seq += 1
+		if len(self._entries) >= self.capacity:
+			oldest = self._entries.popleft()
+			self._by_level[oldest.levelno].popleft()
+		self._entries.append(entry)
+		self._by_level.setdefault(levelno, deque()).append(entry)
+		return entry
+
+	def prepend(self, records) -> int:
+		# records 为由旧到新的 (created, levelno, levelname, text)；缓存已满时不再补入
+		added = 0
+		for created, levelno, levelname, text in reversed(records):
+			if len(self._entries) >= self.capacity:
+				break
+			self._low_seq -= 1
+			entry = LogEntry(self._low_seq, created, levelno, levelname, text)
+			self._entries.appendleft(entry)
+			self._by_level.setdefault(levelno, deque()).appendleft(entry)
+			added += 1
+		return added
+
+	def query(self, min_level: int = 0, needle: str = "", since: float = None, after_seq: int = None):
+		# 只合并达到等级的索引，过滤 WARNING 以上时无需扫描全部记录
+		streams = [items for level, items in self._by_level.items() if level >= min_level and items]
+		if since is not None:
+			streams = [self._tail_since(items, since) for items in streams]
+		merged = heapq.merge(*streams, key=lambda e: e.seq) if len(streams) > 1 else iter(streams[0] if streams else ())
+		needle = (needle or "").casefold()
+		result = []
+		for entry in merged:
+			if after_seq is not None and entry.seq <= after_seq:
+				continue
+			if needle and needle not in entry.text.casefold():
+				continue
+			result.append(entry)
+		return result
+
+	@staticmethod
+	def _tail_since(items, since: float):
+		lo, hi = 0, len(items)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if items[mid].created < since:
+				lo = mid + 1
+			else:
+				hi = mid
+		return itertools.islice(items, lo, None)
+
+
+class LogFileHistory:
+	# 按页倒序读取 data/logs/app.log*（内存映射），每次只解析一页，避免一次性载入全部历史
+	# 压缩的轮转文件（.gz，每天一个）在读到时整体解压到内存，再同样按页读取
+	_HEADER = re.compile(rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) \[(\w+)\] [^:]*: ", re.M)
+
+	def __init__(self, logs_dir: str, base: str = "app.log", page_size: int = 256 * 1024):
+		self.logs_dir = logs_dir
+		self.base = base
+		self.page_size = page_size
+		self._files = None
+		self._index = 0
+		self._offset = None
+		self._unpacked = None
+		# 当前日志文件中此后写入的内容已在内存缓存里，从这里往前读即可
+		self._live_offset = self._file_size(os.path.join(logs_dir, base))
+
+	def _list_files(self):
+		try:
+			names = [n for n in os.listdir(self.logs_dir) if n.startswith(self.base + ".")]
+		except OSError:
+			names = []
+		# 轮转文件名带日期后缀，按名称倒序即由新到旧
+		return [self.base] + sorted(names, reverse=True)
+
+	@property
+	def exhausted(self) -> bool:
+		return self._files is not None and self._index >= len(self._files)
+
+	def load_older(self):
+		if self._files is None:
+			self._files = self._list_files()
+		while self._index < len(self._files):
+			name = self._files[self._index]
+			path = os.path.join(self.logs_dir, name)
+			if self._offset is None:
+				if name.endswith(".gz"):
+					self._unpacked = self._unpack(path)
+					self._offset = len(self._unpacked)
+				else:
+					self._offset = self._live_offset if name == self.base else self._file_size(path)
+			if self._offset <= 0:
+				self._index += 1
+				self._offset = None
+				self._unpacked = None
+				continue
+			records = self._read_page(path)
+			if records:
+				return records
+		return []
+
+	@staticmethod
+	def _file_size(path: str) -> int:
+		try:
+			return os.path.getsize(path)
+		except OSError:
+			return 0
+
+	@staticmethod
+	def _unpack(path: str) -> bytes:
+		import gzip
+		try:
+			with gzip.open(path, "rb") as f:
+				return f.read()
+		except (OSError, EOFError):
+			return b""
+
+	def _read_page(self, path: str):
+		if self._unpacked is not None:
+			chunk, start = self._slice_page(self._unpacked)
+		else:
+			try:
+				with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+					chunk, start = self._slice_page(mm)
+			except (OSError, ValueError):
+				chunk, start = b"", 0
+		self._offset = start
+		return self._parse(chunk)
+
+	def _slice_page(self, buf):
+		end = min(self._offset, len(buf))
+		start = max(0, end - self.page_size)
+		if start > 0:
+			# 从页内第一条记录开头切分，之前的续行（如异常堆栈）留给下一页
+			match = self._HEADER.search(buf, start, end)
+			if match is not None and match.start() < end:
+				start = match.start()
+		return buf[start:end], start
+
+	def _parse(self, chunk: bytes):
+		records = []
+		matches = list(self._HEADER.finditer(chunk))
+		for i, match in enumerate(matches):
+			body_end = matches[i + 1].start() if i + 1 < len(matches) else len(chunk)
+			try:
+				created = time.mktime(time.strptime(match.group(1).decode("ascii"), "%Y-%m-%d %H:%M:%S"))
+			except ValueError:
+				continue
+			created += int(match.group(2)) / 1000.0
+			levelname = match.group(3).decode("ascii", "ignore")
+			message = chunk[match.end():body_end].decode("utf-8", errors="replace").rstrip("\n")
+			stamp = f"{match.group(1).decode('ascii')},{match.group(2).decode('ascii')}"
+			levelno = logging.getLevelName(levelname) if levelname in UI_LEVEL_NAMES else logging.INFO
+			records.append((created, levelno, levelname, translate_for_ui(f"{stamp} [{levelname}] {message}")))
+		return records
+
+
+class TkLogSink(logging.Handler):
+	# 界面日志输出：任意线程只做入队，有新记录时才排一帧，由 Tk 主线程批量写入并合并滚动，文本行数有上限
+	# 所有记录都进入 LogStore，切换等级 / 搜索时从缓存重新渲染
+	def __init__(self, root, widget, max_lines: int = 2000, frame_ms: int = 33, max_batch: int = 500,
+			store: LogStore = None, history: LogFileHistory = None, backlog=()):
+		super().__init__()
+		self.root = root
+		self.widget = widget
+		self.max_lines = max_lines
+		self.frame_ms = frame_ms
+		self.max_batch = max_batch
+		self.store = store or LogStore()
+		self.history = history
+		self.min_level = logging.INFO
+		self.needle = ""
+		self._view_after_seq = None
+		self.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+		# deque 的 append / popleft 是线程安全的；backlog 为挂载前已产生的记录
+		self._pending = deque(backlog)
+		# 只在有新记录时排一次 after()，空闲时不占用定时器
+		self._schedule_lock = threading.Lock()
+		self._scheduled = False
+		self._closed = False
+		self._after_id = None
+		if self._pending:
+			self._schedule()
+
+	def handle(self, record):
+		# emit 只入队，不持有 Handler 的锁：其他线程在锁内调用 after() 时要等主线程处理，主线程若同时写日志会互相等待
+		if self.filter(record):
+			self.emit(record)
+		return record
+
+	def emit(self, record):
+		self._pending.append(record)
+		self._schedule()
+
+	def _schedule(self):
+		with self._schedule_lock:
+			if self._scheduled or self._closed:
+				return
+			self._scheduled = True
+		try:
+			self._after_id = self.root.after(self.frame_ms, self._drain)
+		except Exception:
+			# 窗口已销毁等情况：记录留在队列中，下一条记录再尝试
+			with self._schedule_lock:
+				self._scheduled = False
+
+	def close(self):
+		with self._schedule_lock:
+			self._closed = True
+		if self._after_id is not None:
+			try:
+				self.root.after_cancel(self._after_id)
+			except Exception:
+				pass
+			self._after_id = None
+		logging.getLogger().removeHandler(self)
+		super().close()
+
+	def set_filter(self, min_level: int = None, needle: str = None):
+		if min_level is not None:
+			self.min_level = min_level
+		if needle is not None:
+			self.needle = needle.strip()
+		self.render()
+
+	def clear_view(self):
+		# 仅清空视图，记录仍保留在缓存中，可通过搜索找回
+		self._view_after_seq = self.store.last_seq
+		self.render()
+
+	def load_older(self) -> int:
+		if self.history is None:
+			return 0
+		added = self.store.prepend(self.history.load_older())
+		if added:
+			self._view_after_seq = None
+			self.render()
+		return added
+
+	def _matches(self, entry: LogEntry) -> bool:
+		if entry.levelno < self.min_level:
+			return False
+		if self.needle:
+			return self.needle.casefold() in entry.text.casefold()
+		return self._view_after_seq is None or entry.seq > self._view_after_seq
+
+	def render(self):
+		# 搜索时覆盖整个缓存（包括已清空的部分）
+		after_seq = None if self.needle else self._view_after_seq
+		entries = self.store.query(self.min_level, self.needle, after_seq=after_seq)[-self.max_lines:]
+		chunks = []
+		for entry in entries:
+			chunks.append(entry.text + "\n")
+			chunks.append((entry.levelname,))
+		try:
+			self.widget.configure(state="normal")
+			self.widget.delete("1.0", "end")
+			if chunks:
+				self.widget.insert("end", *chunks)
+			self.widget.configure(state="disabled")
+			self.widget.see("end")
+		except Exception:
+			pass
+
+	def _drain(self):
+		with self._schedule_lock:
+			self._scheduled = False
+			self._after_id = None
+		chunks = []
+		for _ in range(min(self.max_batch, len(self._pending))):
+			record = self._pending.popleft()
+			try:
+				msg = translate_for_ui(self.format(record))
+			except Exception:
+				continue
+			entry = self.store.append(record.created, record.levelno, record.levelname, msg)
+			if self._matches(entry):
+				chunks.append(msg + "\n")
+				chunks.append((record.levelname,))
+		# 超出单批上限的记录留到下一帧
+		if self._pending:
+			self._schedule()
+		if not chunks:
+			return
+		# 本批超过可见上限时只写入最新的部分
+		chunks = chunks[-2 * self.max_lines:]
+		try:
+			widget = self.widget
+			# 仅当视图停在底部时才自动滚动，避免打断用户查看历史
+			follow = widget.yview()[1] >= 0.999
+			widget.configure(state="normal")
+			widget.insert("end", *chunks)
+			lines = int(widget.index("end-1c").split(".")[0])
+			# "end-1c" 位于最后一个换行之后，故行数需比上限多 1 才裁剪
+			if lines > self.max_lines + 1:
+				widget.delete("1.0", f"{lines - self.max_lines}.0")
+			widget.configure(state="disabled")
+			if follow:
+				widget.see("end")
+		except Exception:
+			pass
+
+
+class _UiTask:
+	__slots__ = ("label", "fn", "args", "on_done", "on_error", "quiet", "cancelled")
+
+	def __init__(self, label, fn, args, on_done, on_error, quiet=False):
+		self.label = label
+		self.fn = fn
+		self.args = args
+		self.on_done = on_done
+		self.on_error = on_error
+		self.quiet = quiet
+		self.cancelled = False
+
+	def cancel(self):
+		self.cancelled = True
+
+
+class BackgroundWorker:
+	# 后台线程执行阻塞操作（netsh / HTTP），结果经线程安全队列由 after() 回到 Tk 主线程
+	def __init__(self, root, max_workers: int = 3, poll_interval: int = 40):
+		self._root = root
+		self._max_workers = max_workers
+		self._poll_interval = poll_interval
+		self._jobs = queue.Queue()
+		self._results = queue.Queue()
+		self._threads = []
+		self._active = []
+		self._listeners = []
+		self._poll_id = None
+		self._closed = False
+		# 可选的任务包装（如对一次流程做 cProfile 采样）
+		self.job_wrapper = None
+
+	@property
+	def busy(self) -> bool:
+		return bool(self._active)
+
+	def add_progress_listener(self, callback):
+		self._listeners.append(callback)
+
+	def submit(self, label: str, fn, *args, on_done=None, on_error=None, quiet=False):
+		# quiet 任务（如后台周期监测）不在进度栏显示
+		if self._closed:
+			return None
+		if self.job_wrapper is not None:
+			fn = self.job_wrapper(fn)
+		task = _UiTask(label, fn, args, on_done, on_error, quiet)
+		self._active.append(task)
+		if len(self._threads) < min(self._max_workers, len(self._active)):
+			t = threading.Thread(target=self._worker_loop, name=f"worker-{len(self._threads)}", daemon=True)
+			self._threads.append(t)
+			t.start()
+		self._jobs.put(task)
+		self._notify_progress()
+		self._schedule_poll()
+		return task
+
+	def shutdown(self):
+		# 窗口关闭时取消全部任务，丢弃尚未返回的结果
+		self._closed = True
+		for task in self._active:
+			task.cancel()
+		self._active = []
+		for _ in self._threads:
+			self._jobs.put(None)
+		if self._poll_id is not None:
+			try:
+				self._root.after_cancel(self._poll_id)
+			except Exception:
+				pass
+			self._poll_id = None
+
+	def _worker_loop(self):
+		while True:
+			task = self._jobs.get()
+			if task is None:
+				return
+			if task.cancelled:
+				self._results.put((task, False, None))
+				continue
+			try:
+				self._results.put((task, True, task.fn(*task.args)))
+			except BaseException as exc:
+				self._results.put((task, False, exc))
+
+	def _schedule_poll(self):
+		if self._poll_id is None and not self._closed:
+			self._poll_id = self._root.after(self._poll_interval, self._drain)
+
+	def _drain(self):
+		self._poll_id = None
+		if self._closed:
+			return
+		changed = False
+		while True:
+			try:
+				task, ok, value = self._results.get_nowait()
+			except queue.Empty:
+				break
+			changed = True
+			if task in self._active:
+				self._active.remove(task)
+			if task.cancelled:
+				continue
+			try:
+				if ok:
+					if task.on_done:
+						task.on_done(value)
+				elif task.on_error:
+					task.on_error(value)
+				else:
+					logging.getLogger(__name__).error(f"后台任务失败：{task.label}", exc_info=value)
+			except Exception:
+				logging.getLogger(__name__).exception(f"后台任务回调异常：{task.label}")
+		if changed:
+			self._notify_progress()
+		if self._active:
+			self._schedule_poll()
+
+	def _notify_progress(self):
+		labels = [t.label for t in self._active if not t.cancelled and not t.quiet]
+		for callback in self._listeners:
+			try:
+				callback(labels)
+			except Exception:
+				pass
+
+
+class DiagnosticsPanel:
+	# 诊断面板：各阶段（netsh / 关联 / DNS / TLS / 门户登录 / 打开浏览器）耗时统计与最近明细，打开期间每秒刷新
+	COLUMNS = (("count", "次数", 60), ("errors", "失败", 60), ("mean_ms", "平均", 80), ("p50_ms", "P50", 80),
+		("p95_ms", "P95", 80), ("max_ms", "最大", 80))
+
+	def __init__(self, app, refresh_ms: int = 1000):
+		self.app = app
+		self.refresh_ms = refresh_ms
+		self._after_id = None
+		self.window = tk.Toplevel(app)
+		self.window.title("诊断")
+		self.window.transient(app)
+		self.window.configure(bg="#f5f7fb")
+		self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+		container = ttk.Frame(self.window, padding=16)
+		container.pack(fill="both", expand=True)
+
+		bar = ttk.Frame(container)
+		bar.pack(fill="x", pady=(0, 10))
+		self._enabled_var = tk.BooleanVar(value=tracer.enabled)
+		ttk.Checkbutton(bar, text="记录各阶段耗时", variable=self._enabled_var, command=self._on_toggle).pack(side="left")
+		ttk.Button(bar, text="清空", style="Primary.TButton", command=self._on_reset).pack(side="right")
+		ttk.Button(bar, text="导出指标", style="Primary.TButton", command=app._export_metrics).pack(side="right", padx=(0, 8))
+		ttk.Button(bar, text="采样一次检测", style="Primary.TButton", command=self._on_profile).pack(side="right", padx=(0, 8))
+
+		self.tree = ttk.Treeview(container, columns=[c[0] for c in self.COLUMNS], height=12)
+		self.tree.heading("#0", text="阶段")
+		self.tree.column("#0", width=180)
+		for key, title, width in self.COLUMNS:
+			self.tree.heading(key, text=title)
+			self.tree.column(key, width=width, anchor="e")
+		self.tree.pack(fill="both", expand=True)
+
+		ttk.Label(container, text="最近记录（毫秒）", style="Subtle.TLabel").pack(anchor="w", pady=(10, 4))
+		from tkinter import scrolledtext
+		self.recent = scrolledtext.ScrolledText(container, height=8, wrap="none", state="disabled",
+			font=("Consolas", 9), borderwidth=0, highlightthickness=0)
+		self.recent.pack(fill="both", expand=True)
+		self.refresh()
+
+	@property
+	def alive(self) -> bool:
+		try:
+			return bool(self.window.winfo_exists())
+		except Exception:
+			return False
+
+	def focus(self):
+		self.window.deiconify()
+		self.window.lift()
+
+	def close(self):
+		if self._after_id is not None:
+			self.window.after_cancel(self._after_id)
+			self._after_id = None
+		self.window.destroy()
+
+	def refresh(self):
+		self._after_id = self.window.after(self.refresh_ms, self.refresh)
+		phases = tracer.phases()
+		existing = set(self.tree.get_children())
+		for name, stats in phases.items():
+			values = [stats[key] for key, _, _ in self.COLUMNS]
+			if name in existing:
+				self.tree.item(name, values=values)
+			else:
+				self.tree.insert("", "end", iid=name, text=name, values=values)
+		for name in existing - set(phases):
+			self.tree.delete(name)
+		lines = []
+		for item in reversed(tracer.recent_spans(30)):
+			extra = " ".join(f"{k}={v}" for k, v in item.items() if k not in ("time", "phase", "ms", "error") and v is not None)
+			error = f" [{item['error']}]" if item["error"] else ""
+			lines.append(f"{time.strftime('%H:%M:%S', time.localtime(item['time']))} {item['phase']:<18} {item['ms']:>9.1f}{error} {extra}")
+		self.recent.configure(state="normal")
+		self.recent.delete("1.0", "end")
+		self.recent.insert("end", "\n".join(lines) if lines else "暂无记录（需勾选“记录各阶段耗时”）")
+		self.recent.configure(state="disabled")
+
+	def _on_toggle(self):
+		tracer.enabled = self._enabled_var.get()
+		logging.getLogger(__name__).info(f"阶段耗时追踪已{'开启' if tracer.enabled else '关闭'}")
+
+	def _on_reset(self):
+		tracer.reset()
+		self.refresh_now()
+
+	def _on_profile(self):
+		self.app._profile_next_flow()
+
+	def refresh_now(self):
+		if self._after_id is not None:
+			self.window.after_cancel(self._after_id)
+		self.refresh()
+
+
+class StartupProfiler:
+	# 冷启动计时：以开始执行 OCOA.py 为零点，记录导入完成、窗口骨架建好、首帧绘制与可交互的时刻
+	# 环境变量 OCOA_STARTUP_REPORT 指定文件时写出 JSON（bench/bench_startup.py 据此做冷启动回归测试）
+	def __init__(self, started: float):
+		self.started = started
+		self.started_at = time.time() - (time.perf_counter() - started)
+		self.marks = {}
+
+	def mark(self, name: str) -> float:
+		return self.marks.setdefault(name, time.perf_counter() - self.started)
+
+	def report(self) -> dict:
+		return {"started_at": self.started_at, "marks_ms": {k: round(v * 1000, 1) for k, v in self.marks.items()}}
+
+	def finish(self):
+		for name in ("first_paint", "interactive"):
+			if name in self.marks:
+				tracer.record(f"startup.{name}", self.marks[name])
+		marks = self.report()["marks_ms"]
+		logging.getLogger(__name__).info(
+			f"启动耗时：首帧 {marks.get('first_paint', '-')} ms，可交互 {marks.get('interactive', '-')} ms"
+			f"（导入 {marks.get('imports', '-')} ms，窗口骨架 {marks.get('shell', '-')} ms）"
+		)
+		path = os.environ.get("OCOA_STARTUP_REPORT")
+		if path:
+			try:
+				atomic_write_json(path, self.report())
+			except Exception:
+				logging.getLogger(__name__).exception("写出启动耗时失败")
+
+
+class _StartupLogBuffer(logging.Handler):
+	# 日志栏建好前的记录暂存于此（有上限），建好后交给 TkLogSink 补显示
+	def __init__(self, capacity: int = 1000):
+		super().__init__()
+		self.records = deque(maxlen=capacity)
+
+	def emit(self, record):
+		self.records.append(record)
+
+
 class App(tk.Tk):
-	def __init__(self):
+	# 启动分两段：先建窗口骨架（抬头、按钮、状态栏）并尽快画出首帧，
+	# 首帧之后再构建日志栏、处理转交的命令并开始自动检测；设置对话框在首次打开时才构建
+	def __init__(self, startup: StartupProfiler = None, instance: InstanceServer = None):
+		self.startup = startup or StartupProfiler(time.perf_counter())
+		self.startup.mark("imports")
 		super().__init__()
 		self.title("网络一键认证 - 控制台")
 		self.configure(bg="#f5f7fb")
-		
-		# 设置窗口初始大小和最小大小
-		self.geometry("600x500")  # 设置初始窗口大小
-		self.minsize(500, 400)    # 设置最小窗口大小
-		
-		# 将窗口居中显示
-		screen_width = self.winfo_screenwidth()
-		screen_height = self.winfo_screenheight()
-		x = (screen_width - 600) // 2
-		y = (screen_height - 500) // 2
-		self.geometry(f"600x500+{x}+{y}")
+		self._place_window(1200, 800)
 
 		# Settings
 		# Persist user data under data/user_settings.json
-		self.data_dir = os.path.join(os.path.dirname(__file__), "data")
-		self.settings_path = os.path.join(self.data_dir, "user_settings.json")
+		self.data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 		self.logs_dir = os.path.join(self.data_dir, "logs")
-		self._setup_logging()
+		setup_logging(self.logs_dir)
+		# 在本次启动写入任何日志前记下文件末尾，此后的记录都会进入日志栏，向前翻页时从这里开始读
+		self._log_history = LogFileHistory(self.logs_dir)
+		self._startup_logs = _StartupLogBuffer()
+		logging.getLogger().addHandler(self._startup_logs)
 		logging.getLogger(__name__).info("应用启动中…")
-		self.settings = {
-			"wifi_ssid": "",
-			"auth_url": ""
-		}
-		self._load_settings()
+		# 网络操作与设置由 NetworkService 统一提供，命令行模式共用同一实现
+		self.net = NetworkService(self.data_dir)
+		self.settings = self.net.settings
+		configure_log_retention(self.settings)
+		self.worker = BackgroundWorker(self)
+		self.anim = AnimationClock(self)
+		self.toasts = ToastManager(self, self.anim)
+		self.monitor = self.net.create_monitor()
+		self._monitor_after_id = None
+		self.readiness = self.net.create_readiness_waiter()
+		self._flow_started = None
+		self._flow_profiler = None
+		self._diagnostics = None
+		# 单实例命令通道：后续启动的界面 / 命令行把命令转交到这里
+		self._ipc_requests = queue.Queue()
+		self._ipc_after_id = None
+		# 端口通常已在文件开头、构建窗口之前绑定；直接构造 App 时在此绑定
+		self.instance = instance
+		if self.instance is None:
+			self.instance = InstanceServer(self.data_dir)
+			self.instance.start()
+		self.instance.handler = self._on_ipc_command
+		self._log_sink = None
+		self._settings_dialog = None
+		self._started_up = False
 
 		self.style = ttk.Style()
 		available_themes = self.style.theme_names()
@@ -67,21 +979,44 @@ class App(tk.Tk):
 
 		self._configure_styles()
 		self._build_ui()
-		self._center_window(1200, 800)
-		logging.getLogger(__name__).info("界面已初始化并居中")
-		# 默认日志过滤级别
-		self._ui_log_level = logging.INFO
-		self._attach_ui_logger()
-
-		# 启动后自动检测网络与目标WiFi
-		self.after(400, self._auto_check_flow)
+		self.worker.add_progress_listener(self._on_worker_progress)
+		self.protocol("WM_DELETE_WINDOW", self._on_close)
+		self.startup.mark("shell")
+		# 抬头画布首次绘制即视为首帧；窗口最小化启动等收不到 Expose 时由定时器兜底
+		self._header.bind("<Expose>", self._on_first_paint, add="+")
+		self.after(2000, self._on_first_paint)
+
+	def _on_first_paint(self, _event=None):
+		if self._started_up:
+			return
+		self._started_up = True
+		self.startup.mark("first_paint")
+		# 排在本轮重绘之后执行
+		self.after_idle(self._finish_startup)
 
-		# 主窗口淡入效果
-		try:
-			self.attributes("-alpha", 0.0)
-			self.after(10, lambda: self._fade_in(self, target=1.0, step=0.06, interval=14))
-		except Exception:
-			pass
+	def _finish_startup(self):
+		self._build_log_viewer()
+		self._attach_ui_logger()
+		logging.getLogger(__name__).info("界面已初始化并居中")
+		if not self.instance.serving:
+			logging.getLogger(__name__).warning("单实例端口被其他程序占用，本次不接收其他实例转交的命令")
+
+		# 启动后自动检测网络与目标WiFi，随后转入常驻监测；设置了 startup_jitter 时按主机错峰
+		startup_delay = self.net.startup_delay()
+		if startup_delay:
+			logging.getLogger(__name__).info(f"错峰启动：{startup_delay:.1f} 秒后自动检测网络")
+		self.after(400 + int(startup_delay * 1000), self._auto_check_flow)
+		if self.settings.get("monitor_enabled", True):
+			self._schedule_monitor(10.0 + startup_delay)
+		self.net.start_scanner()
+		self._poll_ipc()
+		self.after_idle(self._on_interactive)
+
+	def _on_interactive(self):
+		self.startup.mark("interactive")
+		self.startup.finish()
+		if os.environ.get("OCOA_EXIT_AFTER_STARTUP"):
+			self.after(0, self._on_close)
 
 	def _configure_styles(self):
 		default_font = ("Microsoft YaHei UI", 10)
@@ -135,7 +1070,8 @@ class App(tk.Tk):
 		# 渐变抬头区域
 		header = tk.Canvas(outer, height=90, highlightthickness=0, bd=0)
 		header.pack(fill="x", side="top")
-		self._draw_horizontal_gradient(header, "#4f46e5", "#06b6d4")
+		self._header = header
+		self._header_gradient = GradientPainter(header, "#4f46e5", "#06b6d4")
 		header.create_text(24, 26, anchor="nw", text="网络一键认证", fill="#ffffff",
 			font=("Microsoft YaHei UI", 16, "bold"))
 		header.create_text(26, 58, anchor="nw", text="快速认证 · 一键断开 · 简洁设置", fill="#e5e7eb",
@@ -180,6 +1116,16 @@ class App(tk.Tk):
 		button3.grid(row=0, column=2, sticky="ew", padx=8)
 		button4.grid(row=0, column=3, sticky="ew", padx=(8, 0))
 
+		# 后台任务进度
+		status_bar = ttk.Frame(main_content)
+		status_bar.pack(fill="x", pady=(0, 12))
+		self._busy_var = tk.StringVar(value="就绪")
+		status_label = ttk.Label(status_bar, textvariable=self._busy_var, style="Subtle.TLabel")
+		status_label.pack(side="left")
+		self._busy_bar = ttk.Progressbar(status_bar, mode="indeterminate", length=140)
+		self._busy_bar.pack(side="right")
+		self._busy_running = False
+
 		# 添加分隔线
 		separator = ttk.Separator(main_content, orient="horizontal")
 		separator.pack(fill="x", pady=(0, 20))  # 增加底部间距
@@ -189,8 +1135,28 @@ class App(tk.Tk):
 		btns.grid_columnconfigure(2, weight=1)
 		btns.grid_columnconfigure(3, weight=1)
 
+		# 日志栏在首帧之后构建（_build_log_viewer），先占好位置
+		self._log_area = ttk.Frame(main_content)
+		self._log_area.pack(fill="both", expand=True)
+		
+		# 创建底部版权信息区域
+		separator = ttk.Separator(card)
+		separator.pack(fill="x", side="bottom", pady=(10, 0))
+		
+		footer = ttk.Label(card, text="© 2025 网络一键认证工具", style="Subtle.TLabel")
+		footer.pack(side="bottom", pady=(10, 5))  # 调整上下边距
+
+		# 悬停动效
+		for b in (button1, button2, button3):
+			self._apply_button_hover(b)
+		for b in (button4,):
+			self._apply_button_hover(b)
+
+	def _build_log_viewer(self):
+		from tkinter import scrolledtext
+		parent = self._log_area
 		# Log toolbar
-		log_bar = ttk.Frame(main_content)
+		log_bar = ttk.Frame(parent)
 		log_bar.pack(fill="x", pady=(16, 6))
 		log_label = ttk.Label(log_bar, text="运行日志", style="Subtle.TLabel")
 		log_label.pack(side="left")
@@ -202,10 +1168,20 @@ class App(tk.Tk):
 		level_menu.pack(side="right")
 		clear_btn = ttk.Button(log_bar, text="清空", style="Primary.TButton", command=lambda: self._clear_log_view())
 		clear_btn.pack(side="right", padx=(0, 8))
+		older_btn = ttk.Button(log_bar, text="更早", style="Primary.TButton", command=lambda: self._load_older_logs())
+		older_btn.pack(side="right", padx=(0, 8))
+		diag_btn = ttk.Button(log_bar, text="诊断", style="Primary.TButton", command=lambda: self._open_diagnostics_panel())
+		diag_btn.pack(side="right", padx=(0, 8))
+		# 在全部缓存日志中搜索
+		self._log_search_var = tk.StringVar(value="")
+		self._log_search_after_id = None
+		search_entry = ttk.Entry(log_bar, textvariable=self._log_search_var, width=18)
+		search_entry.pack(side="right", padx=(0, 8))
+		self._log_search_var.trace_add("write", lambda *_: self._on_log_search_changed())
 
 		# Log viewer (dark, monospace, no wrap)
 		self.log_text = scrolledtext.ScrolledText(
-			main_content,
+			parent,
 			height=12,
 			wrap="none",
 			state="disabled",
@@ -222,155 +1198,322 @@ class App(tk.Tk):
 		self.log_text.tag_configure("WARNING", foreground="#fbbf24")
 		self.log_text.tag_configure("ERROR", foreground="#f87171")
 		self.log_text.pack(fill="both", expand=True)  # 让日志区域可以随窗口调整大小
-		
-		# 创建底部版权信息区域
-		separator = ttk.Separator(card)
-		separator.pack(fill="x", side="bottom", pady=(10, 0))
-		
-		footer = ttk.Label(card, text="© 2025 网络一键认证工具", style="Subtle.TLabel")
-		footer.pack(side="bottom", pady=(10, 5))  # 调整上下边距
 
-		# 悬停动效
-		for b in (button1, button2, button3):
-			self._apply_button_hover(b)
-		for b in (button4,):
-			self._apply_button_hover(b)
-
-	def _center_window(self, width, height):
-		self.update_idletasks()
-		w = width
-		h = height
-		screen_w = self.winfo_screenwidth()
-		screen_h = self.winfo_screenheight()
-		x = int((screen_w / 2) - (w / 2))
-		y = int((screen_h / 2) - (h / 2))
-		self.geometry(f"{w}x{h}+{x}+{y}")
-		self.minsize(w, h)
+	def _place_window(self, width, height):
+		# 一次性设置大小与居中位置：屏幕尺寸无需等待布局即可获得，不调用 update_idletasks
+		x = (self.winfo_screenwidth() - width) // 2
+		y = (self.winfo_screenheight() - height) // 2
+		self.geometry(f"{width}x{height}+{x}+{y}")
+		self.minsize(width, height)
 
 	def on_primary_action(self):
-		url = (self.settings.get("auth_url") or "").strip()
+		# 按当前所连WiFi的配置档选择认证地址；未配置时探测一次，从门户重定向中发现
+		def job():
+			ssid = self.net.get_connected_ssid(max_age=5.0)
+			return ssid, self.net.resolve_auth_url(ssid)
+		self.worker.submit("正在检测当前WiFi…", job, on_done=lambda result: self._on_primary_ssid(*result), quiet=True)
+
+	def _on_primary_ssid(self, ssid: str, url: str):
 		if not url:
-			self._toast("请先在“设置”中配置认证 URL")
-			logging.getLogger(__name__).warning("未配置认证URL，已打开设置")
+			self._toast("未发现认证页面，请在“设置”中配置认证 URL")
+			logging.getLogger(__name__).warning("未配置认证URL且未发现门户重定向，已打开设置")
 			self._open_settings_dialog()
 			return
+		self._authenticate(url, credentials=self.net.credentials_for(ssid))
+
+	def _authenticate(self, url: str, prefix: str = "", credentials: str = None):
+		# 已配置门户账号时先在后台自动登录，失败再回退到浏览器
+		if self.net.portal_login.has_credentials(url, credentials):
+			self._toast(f"{prefix}正在自动认证…")
+			self.worker.submit(
+				"正在自动认证…", self.net.portal_login.login, url, credentials,
+				on_done=lambda result: self._on_portal_login_done(result, url),
+				on_error=lambda exc: self._on_portal_login_done(None, url)
+			)
+			return
+		self._toast(f"{prefix}正在打开认证页面…")
+		self._open_auth_page(url)
+		self._finish_flow("browser")
+
+	def _on_portal_login_done(self, result, url: str):
+		if result is not None and result.ok:
+			self._toast("认证成功，网络已可用")
+			self._finish_flow("online")
+			return
+		logging.getLogger(__name__).warning("自动认证未成功，改为打开认证页面")
+		self._toast("自动认证失败，正在打开认证页面…")
+		self._open_auth_page(url)
+		self._finish_flow("browser")
+
+	def _open_auth_page(self, url: str) -> bool:
 		try:
-			webbrowser.open(url, new=2)
-			self._toast("已打开认证页面")
+			import webbrowser
+			with tracer.span("browser.open"):
+				webbrowser.open(url, new=2)
 			logging.getLogger(__name__).info(f"正在打开认证链接：{url}")
+			opened = True
 		except Exception:
 			self._toast("无法打开浏览器，请手动访问 URL")
 			logging.getLogger(__name__).exception("打开认证链接失败")
+			opened = False
+		# 浏览器认证的结果无从得知，历史中只记录是否成功打开；之后的探测会反映是否已可用
+		if self.net.history:
+			self.net.history.record_auth("browser", opened)
+		return opened
+
+	def _on_worker_progress(self, labels):
+		try:
+			if labels:
+				self._busy_var.set(labels[-1])
+				if not self._busy_running:
+					self._busy_bar.start(12)
+					self._busy_running = True
+			else:
+				self._busy_var.set("就绪")
+				if self._busy_running:
+					self._busy_bar.stop()
+					self._busy_running = False
+		except Exception:
+			pass
+		# 采样中的流程在后台任务全部结束后收尾
+		if self._flow_profiler is not None and not self.worker.busy:
+			self._finish_flow_profile()
+
+	def _schedule_monitor(self, delay: float):
+		self._monitor_after_id = self.after(int(delay * 1000), self._monitor_tick)
+
+	def _monitor_tick(self):
+		self._monitor_after_id = None
+		self.worker.submit(
+			"后台监测网络…", self.monitor.check_once,
+			on_done=self._on_monitor_checked, on_error=self._on_monitor_error, quiet=True
+		)
+
+	def _on_monitor_checked(self, result):
+		previous, current = result
+		if current != previous and previous != MONITOR_UNKNOWN:
+			self._on_monitor_transition(previous, current)
+		self._schedule_monitor(self.monitor.next_delay())
+
+	def _on_monitor_error(self, exc):
+		logging.getLogger(__name__).error("连通性监测异常", exc_info=exc)
+		self._schedule_monitor(self.monitor.fast_interval * 5)
+
+	def _on_monitor_transition(self, previous: str, current: str):
+		ssid = self.monitor.ssid
+		auth_url = self.net.auth_url_for(ssid)
+		if current == MONITOR_CAPTIVE:
+			if auth_url:
+				logging.getLogger(__name__).info(f"监测到网络需认证：{auth_url}")
+				self._authenticate(auth_url, "认证已失效，", self.net.credentials_for(ssid))
+			else:
+				self._toast("网络需要认证，请先在设置中配置认证 URL")
+		elif current == MONITOR_ONLINE:
+			self._toast("网络已恢复")
+		elif current == MONITOR_OFFLINE:
+			self._toast("网络不可用（未被门户拦截），稍后自动重试")
+		elif current == MONITOR_DISCONNECTED:
+			self._toast("WiFi已断开" + ("，正在自动重连…" if self.monitor.reconnect_enabled else ""))
+		elif current == MONITOR_WRONG_SSID:
+			self._toast(f"当前已切换到其他WiFi：{self.monitor.ssid}")
+
+	def _on_close(self):
+		# 取消后台任务后再销毁窗口
+		if self._monitor_after_id is not None:
+			try:
+				self.after_cancel(self._monitor_after_id)
+			except Exception:
+				pass
+		if self._ipc_after_id is not None:
+			try:
+				self.after_cancel(self._ipc_after_id)
+			except Exception:
+				pass
+		self.instance.close()
+		self.monitor.stop()
+		self.readiness.cancel()
+		stats = self.net.iface_cache.stats()
+		logging.getLogger(__name__).info(
+			f"接口状态缓存：命中 {stats['hits']}，刷新 {stats['misses']}，共享刷新 {stats['shared']}"
+		)
+		self.worker.shutdown()
+		self.net.shutdown()
+		if self._log_sink is not None:
+			self._log_sink.close()
+		self.anim.stop()
+		self.destroy()
+
+	def _on_ipc_command(self, command: str, argv: list) -> dict:
+		# 在命令通道线程中调用：命令行命令直接用本实例的 NetworkService 执行，界面操作交回 Tk 线程
+		if command == "ping":
+			return {"ok": True}
+		if command == "focus":
+			self._ipc_requests.put(command)
+			return {"ok": True}
+		if command == "cli":
+			from ocoa_cli import run_forwarded
+			logging.getLogger(__name__).info(f"执行转交的命令：{' '.join(argv)}")
+			return run_forwarded(self.net, argv)
+		return {"ok": False, "error": f"未知命令：{command}"}
+
+	def _poll_ipc(self):
+		self._ipc_after_id = None
+		while True:
+			try:
+				command = self._ipc_requests.get_nowait()
+			except queue.Empty:
+				break
+			if command == "focus":
+				self._bring_to_front()
+		self._ipc_after_id = self.after(250, self._poll_ipc)
+
+	def _bring_to_front(self):
+		try:
+			self.deiconify()
+			self.lift()
+			self.attributes("-topmost", True)
+			self.after(200, lambda: self.attributes("-topmost", False))
+			self.focus_force()
+		except Exception:
+			pass
+		self._toast("程序已在运行")
+
+	def _start_flow(self):
+		self._flow_started = time.perf_counter()
+
+	def _finish_flow(self, outcome: str):
+		# 一次自动检测 / 连接流程从开始到结束（可用、转浏览器、失败）的总耗时
+		if self._flow_started is None:
+			return
+		tracer.record("flow.auto_check", time.perf_counter() - self._flow_started, None if outcome == "online" else outcome)
+		self._flow_started = None
 
 	def _auto_check_flow(self):
-		ssid_target = (self.settings.get("wifi_ssid") or "").strip()
-		auth_url = (self.settings.get("auth_url") or "").strip()
+		self._start_flow()
+		ssid_target = self.net.preferred_ssid()
+		self.worker.submit(
+			"正在检测当前WiFi…", self.net.get_connected_ssid,
+			on_done=lambda current: self._auto_check_on_ssid(current, ssid_target)
+		)
+
+	def _auto_check_on_ssid(self, current: str, ssid_target: str):
+		logging.getLogger(__name__).info(f"当前WiFi：{current or '未连接'}，目标WiFi：{ssid_target or '未配置'}")
+		if current and self.net.is_known_ssid(current):
+			# 已连到任一已配置的网络（未配置任何网络时为当前网络），按该网络的配置档检测并认证
+			self.worker.submit(
+				"正在检测网络可用性…", self.net.is_network_usable, current,
+				on_done=lambda usable: self._auto_check_on_usable(usable, current)
+			)
+			return
 		if not ssid_target:
 			self._toast("未设置WiFi名称，请先到设置中配置")
-			logging.getLogger(__name__).warning("未配置WiFi名称，跳过自动检测")
-			return
-		current = self._get_connected_ssid()
-		logging.getLogger(__name__).info(f"当前WiFi：{current or '未连接'}，目标WiFi：{ssid_target}")
-		if current and current == ssid_target:
-			# 已连到目标WiFi，检测是否可用
-			usable = self._is_network_usable()
-			logging.getLogger(__name__).info(f"网络可用性（目标WiFi）：{usable}")
-			if not usable and auth_url:
-				self._toast("网络不可用，正在打开认证页面…")
-				try:
-					webbrowser.open(auth_url, new=2)
-					logging.getLogger(__name__).info(f"网络不可用，打开认证链接：{auth_url}")
-				except Exception:
-					logging.getLogger(__name__).exception("网络不可用后打开认证链接失败")
+			logging.getLogger(__name__).warning("未配置WiFi名称且未连接WiFi，跳过自动检测")
+			self._finish_flow("not_configured")
 			return
 		# 未连接目标WiFi
 		if messagebox.askyesno("提示", f"当前WiFi为：{current or '未连接'}\n是否连接指定WiFi：{ssid_target}？"):
-			ok = self._connect_to_wifi(ssid_target)
-			if not ok:
-				self._toast("连接指令已发送，若失败请检查是否已创建同名配置文件")
-				logging.getLogger(__name__).warning("WiFi连接指令返回异常或未知")
-			# 简单等待后复检
-			self.after(2500, self._auto_check_after_connect)
+			self.monitor.reconnect_enabled = self.settings.get("monitor_auto_reconnect", True) is not False
+			self.worker.submit("正在连接WiFi…", self.net.connect_to_wifi, ssid_target, on_done=self._auto_check_on_connect)
 		else:
 			self._toast("已取消自动连接")
 			logging.getLogger(__name__).info("用户取消了自动连接")
+			self._finish_flow("cancelled")
+
+	def _auto_check_on_usable(self, usable: bool, ssid: str):
+		logging.getLogger(__name__).info(f"网络可用性（{ssid}）：{usable}")
+		auth_url = self.net.auth_url_for(ssid)
+		if not usable and auth_url:
+			logging.getLogger(__name__).info(f"网络不可用，开始认证：{auth_url}")
+			self._authenticate(auth_url, "网络不可用，", self.net.credentials_for(ssid))
+		else:
+			self._finish_flow("online" if usable else "offline")
+
+	def _auto_check_on_connect(self, ok: bool):
+		if not ok:
+			self._toast("连接指令已发送，若失败请检查是否已创建同名配置文件")
+			logging.getLogger(__name__).warning("WiFi连接指令返回异常或未知")
+		self._auto_check_after_connect()
 
 	def _auto_check_after_connect(self):
-		ssid_target = (self.settings.get("wifi_ssid") or "").strip()
-		auth_url = (self.settings.get("auth_url") or "").strip()
-		current = self._get_connected_ssid()
+		ssid_target = self.net.preferred_ssid()
+
+		def job():
+			# 轮询至关联并拿到IP后再探测，不再固定等待
+			ready = self.readiness.wait(ssid_target)
+			if not ready.ready:
+				return self.net.get_connected_ssid(), None
+			return ssid_target, self.net.is_network_usable(ssid_target)
+
+		self.worker.submit(
+			"正在等待连接就绪…", job,
+			on_done=lambda result: self._after_connect_on_checked(result[0], result[1], ssid_target)
+		)
+
+	def _after_connect_on_checked(self, current: str, usable, ssid_target: str):
 		if current != ssid_target:
 			self._toast("未成功连接到目标WiFi")
 			logging.getLogger(__name__).error("尝试后未能连接到目标WiFi")
+			self._finish_flow("not_connected")
 			return
-		if not self._is_network_usable() and auth_url:
-			self._toast("网络不可用，正在打开认证页面…")
-			try:
-				webbrowser.open(auth_url, new=2)
-				logging.getLogger(__name__).info("连接后网络仍不可用，打开认证链接")
-			except Exception:
-				logging.getLogger(__name__).exception("连接后打开认证链接失败")
+		if usable is None:
+			self._toast("已连接目标WiFi，但尚未获取到IP地址")
+			logging.getLogger(__name__).warning("已关联目标WiFi，等待IP超时")
+			self._finish_flow("no_ip")
+			return
+		auth_url = self.net.auth_url_for(ssid_target)
+		if not usable and auth_url:
+			logging.getLogger(__name__).info("连接后网络仍不可用，开始认证")
+			self._authenticate(auth_url, "网络不可用，", self.net.credentials_for(ssid_target))
+		else:
+			self._finish_flow("online" if usable else "offline")
 
 	def on_disconnect(self):
-		ssid = self._get_connected_ssid()
-		try:
-			res = subprocess.run(
-				["netsh", "wlan", "disconnect"],
-				capture_output=True,
-				text=False,
-				timeout=6
-			)
-			if res.returncode == 0:
-				display_ssid = ssid if ssid and "\ufffd" not in ssid else "当前WiFi"
-				self._toast(f"已断开：{display_ssid}")
-				logging.getLogger(__name__).info(f"已断开WiFi：{ssid}")
-			else:
-				self._toast("断开失败，请重试或以管理员运行")
-				logging.getLogger(__name__).error("WiFi断开指令失败")
-		except Exception:
-			self._toast("断开失败，请检查系统权限")
-			logging.getLogger(__name__).exception("断开WiFi时发生异常")
+		# 用户主动断开后不再自动重连，直到再次手动连接
+		self.monitor.reconnect_enabled = False
+		self.worker.submit(
+			"正在断开WiFi…", self.net.disconnect_wifi,
+			on_done=self._on_disconnect_done, on_error=self._on_disconnect_error
+		)
+
+	def _on_disconnect_done(self, result):
+		ssid, ok = result
+		if ok:
+			display_ssid = ssid if ssid and "\ufffd" not in ssid else "当前WiFi"
+			self._toast(f"已断开：{display_ssid}")
+			logging.getLogger(__name__).info(f"已断开WiFi：{ssid}")
+		else:
+			self._toast("断开失败，请重试或以管理员运行")
+			logging.getLogger(__name__).error("WiFi断开指令失败")
+
+	def _on_disconnect_error(self, exc):
+		self._toast("断开失败，请检查系统权限")
+		logging.getLogger(__name__).error("断开WiFi时发生异常", exc_info=exc)
 
 	def on_connect_wifi(self):
-		ssid_target = (self.settings.get("wifi_ssid") or "").strip()
+		ssid_target = self.net.preferred_ssid()
 		if not ssid_target:
 			self._toast("未设置WiFi名称，请先到设置中配置")
 			self._open_settings_dialog()
 			return
 		logging.getLogger(__name__).info(f"User requested connect to SSID: {ssid_target}")
-		ok = self._connect_to_wifi(ssid_target)
+		self._start_flow()
+		self.monitor.reconnect_enabled = self.settings.get("monitor_auto_reconnect", True) is not False
+		self.worker.submit("正在连接WiFi…", self.net.connect_to_wifi, ssid_target, on_done=self._on_connect_wifi_done)
+
+	def _on_connect_wifi_done(self, ok: bool):
 		if ok:
 			self._toast("已发送连接指令，正在尝试连接…")
-			self.after(2500, self._auto_check_after_connect)
+			self._auto_check_after_connect()
 		else:
 			self._toast("指令发送失败，可能需要管理员或未创建配置文件")
 			logging.getLogger(__name__).error("Connect command failed or returned non-zero")
+			self._finish_flow("connect_failed")
 
 	def on_settings(self):
 		self._open_settings_dialog()
 
 	def _toast(self, message: str):
-		toast = tk.Toplevel(self)
-		toast.overrideredirect(True)
-		toast.configure(bg="#111827")
-
-		label = tk.Label(toast, text=message, bg="#111827", fg="#f9fafb", padx=14, pady=8)
-		label.pack()
-
-		self.update_idletasks()
-		x = self.winfo_x() + self.winfo_width() - toast.winfo_reqwidth() - 16
-		y = self.winfo_y() + self.winfo_height() - toast.winfo_reqheight() - 16
-		toast.geometry(f"+{x}+{y}")
-
-		# 淡入 + 自动淡出
-		try:
-			toast.attributes("-alpha", 0.0)
-			self._fade_in(toast, target=0.96, step=0.12, interval=18)
-			def _close():
-				self._fade_out(toast, step=0.12, interval=18, on_done=toast.destroy)
-			toast.after(1300, _close)
-		except Exception:
-			toast.after(1200, toast.destroy)
+		self.toasts.show(message)
 
 	def _apply_button_hover(self, btn):
 		def on_enter(_):
@@ -388,271 +1531,124 @@ class App(tk.Tk):
 		btn.bind("<Enter>", on_enter)
 		btn.bind("<Leave>", on_leave)
 
-	def _fade_in(self, window, target=1.0, step=0.08, interval=16):
-		try:
-			alpha = float(window.attributes("-alpha"))
-		except Exception:
-			return
-		alpha = min(target, alpha + step)
-		try:
-			window.attributes("-alpha", alpha)
-		except Exception:
-			return
-		if alpha < target:
-			self.after(interval, lambda: self._fade_in(window, target, step, interval))
-
-	def _fade_out(self, window, step=0.08, interval=16, on_done=None):
-		try:
-			alpha = float(window.attributes("-alpha"))
-		except Exception:
-			if on_done:
-				on_done()
-			return
-		alpha = max(0.0, alpha - step)
-		try:
-			window.attributes("-alpha", alpha)
-		except Exception:
-			if on_done:
-				on_done()
-			return
-		if alpha > 0.0:
-			self.after(interval, lambda: self._fade_out(window, step, interval, on_done))
-		else:
-			if on_done:
-				on_done()
-
-	def _draw_horizontal_gradient(self, canvas: tk.Canvas, start_hex: str, end_hex: str):
-		# 左到右渐变（以细矩形模拟）
-		canvas.delete("all")
-		width = canvas.winfo_width() or canvas.winfo_reqwidth() or 900
-		height = canvas.winfo_height() or canvas.winfo_reqheight() or 90
-		steps = max(1, min(256, width))
-		def hex_to_rgb(h):
-			h = h.lstrip('#')
-			return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-		r1, g1, b1 = hex_to_rgb(start_hex)
-		r2, g2, b2 = hex_to_rgb(end_hex)
-		for i in range(steps):
-			r = int(r1 + (r2 - r1) * i / steps)
-			g = int(g1 + (g2 - g1) * i / steps)
-			b = int(b1 + (b2 - b1) * i / steps)
-			color = f"#{r:02x}{g:02x}{b:02x}"
-			canvas.create_rectangle(i * (width/steps), 0, (i+1) * (width/steps), height, outline='', fill=color)
-		# 监听尺寸变化重绘
-		def on_resize(_):
-			self._draw_horizontal_gradient(canvas, start_hex, end_hex)
-		canvas.bind("<Configure>", on_resize)
-
-	def _get_connected_ssid(self) -> str:
-		try:
-			res = subprocess.run(
-				["netsh", "wlan", "show", "interfaces"],
-				capture_output=True,
-				text=False,
-				timeout=6
-			)
-			raw = res.stdout or b""
-			output = self._decode_best_effort(raw)
-			ssid_value = ""
-			for raw_line in output.splitlines():
-				line = raw_line.strip()
-				if not line:
-					continue
-				# Skip BSSID lines
-				if line.upper().startswith("BSSID"):
-					continue
-				if line.upper().startswith("SSID") and ":" in line:
-					ssid_value = line.split(":", 1)[1].strip()
-					break
-			return ssid_value
-		except Exception:
-			logging.getLogger(__name__).exception("Failed to get connected SSID")
-			return ""
-
-	def _connect_to_wifi(self, ssid: str) -> bool:
-		try:
-			# 依据现有配置文件进行连接：profile 名通常与 SSID 相同
-			res = subprocess.run(
-				["netsh", "wlan", "connect", f"name={ssid}"],
-				capture_output=True,
-				text=False,
-				timeout=8
-			)
-			return res.returncode == 0
-		except Exception:
-			logging.getLogger(__name__).exception("Exception during WiFi connect command")
-			return False
-
-	def _is_network_usable(self) -> bool:
-		# 通过公共探测地址判断是否真正“可用”
-		test_endpoints = [
-			"https://www.gstatic.com/generate_204",
-			"http://www.msftconnecttest.com/connecttest.txt"
-		]
-		for url in test_endpoints:
-			try:
-				req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-				with urllib.request.urlopen(req, timeout=3) as resp:
-					code = getattr(resp, 'status', resp.getcode())
-					final_url = getattr(resp, 'url', url)
-					# 若被重定向到认证门户，则 final_url 变化明显
-					redirected = (final_url and final_url.split('/')[2] != url.split('/')[2])
-					if code == 204 and not redirected:
-						return True
-					if code == 200:
-						content = resp.read(256).decode('utf-8', errors='ignore')
-						if "Microsoft" in content or "Success" in content or len(content) <= 64:
-							if not redirected:
-								return True
-			except Exception:
-				logging.getLogger(__name__).warning(f"Probe failed: {url}")
-				continue
-		return False
-
-	def _setup_logging(self):
-		try:
-			os.makedirs(self.logs_dir, exist_ok=True)
-			logger = logging.getLogger()
-			logger.setLevel(logging.INFO)
-			file_handler = TimedRotatingFileHandler(
-				filename=os.path.join(self.logs_dir, "app.log"), when="midnight", backupCount=7, encoding="utf-8"
-			)
-			file_fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
-			file_handler.setFormatter(file_fmt)
-			logger.addHandler(file_handler)
-			console = logging.StreamHandler()
-			console.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
-			logger.addHandler(console)
-		except Exception:
-			logging.basicConfig(level=logging.INFO)
-
 	def _attach_ui_logger(self):
-		class TkTextHandler(logging.Handler):
-			def __init__(self, widget):
-				super().__init__()
-				self.widget = widget
-				self.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-			def emit(self, record):
-				try:
-					msg = self.format(record)
-					# Localize level and common phrases to Chinese for UI readability
-					level = record.levelname
-					level_cn = {"DEBUG": "调试", "INFO": "信息", "WARNING": "警告", "ERROR": "错误"}.get(level, level)
-					msg = msg.replace(f"[{level}]", f"[{level_cn}]")
-					translations = {
-						"Application starting…": "应用启动中…",
-						"UI initialized and window centered": "界面已初始化并居中",
-						"Auth URL missing; prompting settings dialog": "未配置认证URL，已打开设置",
-						"Opening auth URL: ": "正在打开认证链接：",
-						"Failed to open auth URL": "打开认证链接失败",
-						"No SSID configured; skipping auto check": "未配置WiFi名称，跳过自动检测",
-						"Current SSID: ": "当前WiFi：",
-						"Target SSID: ": "目标WiFi：",
-						"Network usable on target SSID: ": "网络可用性（目标WiFi）：",
-						"Opening auth URL due to unusable network: ": "网络不可用，打开认证链接：",
-						"Failed to open auth URL after unusable check": "网络不可用后打开认证链接失败",
-						"WiFi connect command returned non-zero or uncertain result": "WiFi连接指令返回异常或未知",
-						"User cancelled auto-connect prompt": "用户取消了自动连接",
-						"Failed to connect to target SSID after attempt": "尝试后未能连接到目标WiFi",
-						"Opening auth URL after connect but network unusable": "连接后网络仍不可用，打开认证链接",
-						"Failed to open auth URL after connect": "连接后打开认证链接失败",
-						"Disconnected from WiFi: ": "已断开WiFi：",
-						"WiFi disconnect command failed": "WiFi断开指令失败",
-						"Exception during WiFi disconnect": "断开WiFi时发生异常",
-						"Failed to get connected SSID": "获取当前WiFi失败",
-						"Exception during WiFi connect command": "执行WiFi连接指令时发生异常",
-						"Probe failed: ": "连通性探测失败："
-					}
-					for k, v in translations.items():
-						msg = msg.replace(k, v)
-					level = record.levelname
-					# Filter by UI-selected level
-					level_order = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
-					min_level = getattr(self.widget.master.master.master.master, "_ui_log_level", logging.INFO)
-					if level_order.get(level, 100) < min_level:
-						return
-					self.widget.configure(state="normal")
-					self.widget.insert("end", msg + "\n", (level,))
-					self.widget.configure(state="disabled")
-					self.widget.see("end")
-				except Exception:
-					pass
+		# 接管启动阶段暂存的记录，之后的日志直接进入日志栏
+		logging.getLogger().removeHandler(self._startup_logs)
 		try:
-			ui_handler = TkTextHandler(self.log_text)
-			logging.getLogger().addHandler(ui_handler)
+			self._log_sink = TkLogSink(
+				self, self.log_text,
+				max_lines=int(self.settings.get("ui_log_max_lines") or 2000),
+				store=LogStore(int(self.settings.get("ui_log_store_size") or 20000)),
+				history=self._log_history,
+				backlog=self._startup_logs.records
+			)
+			logging.getLogger().addHandler(self._log_sink)
 		except Exception:
 			pass
 
 	def _on_change_log_level(self):
 		mapping = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
-		self._ui_log_level = mapping.get(self._log_level_var.get(), logging.INFO)
+		level = mapping.get(self._log_level_var.get(), logging.INFO)
+		# 选择调试级别时才让根日志器产生 DEBUG 记录（文件日志仍只记录 INFO 及以上）
+		logging.getLogger().setLevel(min(level, logging.INFO))
+		# 日志栏在首帧之后才构建，构建前或构建失败时没有 _log_sink
+		if self._log_sink is None:
+			return
+		self._log_sink.set_filter(min_level=level)
+
+	def _on_log_search_changed(self):
+		# 输入防抖，停顿后再重新渲染
+		if self._log_search_after_id is not None:
+			self.after_cancel(self._log_search_after_id)
+		self._log_search_after_id = self.after(200, self._apply_log_search)
+
+	def _apply_log_search(self):
+		self._log_search_after_id = None
+		if self._log_sink is None:
+			return
+		self._log_sink.set_filter(needle=self._log_search_var.get())
+
+	def _load_older_logs(self):
+		if self._log_sink is None:
+			return
+		if not self._log_sink.load_older():
+			self._toast("没有更早的日志了")
 
 	def _clear_log_view(self):
 		try:
-			self.log_text.configure(state="normal")
-			self.log_text.delete("1.0", "end")
-			self.log_text.configure(state="disabled")
+			self._log_sink.clear_view()
 		except Exception:
 			pass
 
-	def _decode_best_effort(self, data: bytes) -> str:
-		# Try multiple encodings to avoid Chinese garbling from netsh
-		for enc in ("utf-8", "gbk", "cp936"):
-			try:
-				return data.decode(enc)
-			except Exception:
-				pass
-		try:
-			return data.decode("mbcs", errors="ignore")
-		except Exception:
-			return data.decode(errors="ignore")
+	def _open_diagnostics_panel(self):
+		if self._diagnostics is not None and self._diagnostics.alive:
+			self._diagnostics.focus()
+			return
+		self._diagnostics = DiagnosticsPanel(self)
 
-	def _load_settings(self):
-		try:
-			if os.path.exists(self.settings_path):
-				with open(self.settings_path, "r", encoding="utf-8") as f:
-					data = json.load(f)
-					if isinstance(data, dict):
-						self.settings.update({
-							"wifi_ssid": data.get("wifi_ssid", ""),
-							"auth_url": data.get("auth_url", "")
-						})
-		except Exception:
-			# Ignore malformed file; keep defaults
-			pass
+	def _export_metrics(self):
+		if self.net.dump_metrics():
+			self._toast("性能指标已导出")
+			logging.getLogger(__name__).info(f"性能指标已写入：{self.net.metrics_path}")
+		else:
+			self._toast("导出失败，请检查权限")
 
-	def _save_settings(self, wifi_ssid: str, auth_url: str) -> bool:
+	def _profile_next_flow(self):
+		# 对一次自动检测流程做 cProfile 采样：流程中的后台任务依次在同一份统计下执行
+		if self._flow_profiler is not None:
+			self._toast("正在采样中，请等待本次检测完成")
+			return
+		if self.worker.busy:
+			self._toast("后台任务进行中，请稍后再试")
+			return
+		self._flow_profiler = FlowProfiler()
+		self.worker.job_wrapper = self._flow_profiler.wrap
+		logging.getLogger(__name__).info("开始对本次自动检测进行性能采样")
+		self._auto_check_flow()
+		if not self.worker.busy:
+			self._finish_flow_profile()
+
+	def _finish_flow_profile(self):
+		profiler, self._flow_profiler = self._flow_profiler, None
+		self.worker.job_wrapper = None
+		if profiler is None or not profiler.calls:
+			return
+		path = os.path.join(self.logs_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.prof")
 		try:
-			# Ensure data directory exists
-			os.makedirs(self.data_dir, exist_ok=True)
-			data = {"wifi_ssid": wifi_ssid, "auth_url": auth_url}
-			with open(self.settings_path, "w", encoding="utf-8") as f:
-				json.dump(data, f, ensure_ascii=False, indent=2)
-			self.settings.update(data)
-			return True
+			summary = profiler.dump(path)
+			logging.getLogger(__name__).info(f"性能采样已保存：{path}\n{summary}")
+			self._toast("性能采样已保存到日志目录")
 		except Exception:
-			return False
-
-	def _normalize_url(self, value: str) -> str:
-		value = (value or "").strip()
-		if not value:
-			return ""
-		# If already has scheme, keep
-		if value.lower().startswith(("http://", "https://")):
-			return value
-		# Accept IP/host[:port][/path]
-		# Basic pattern for IPv4 or hostname
-		pattern = r"^(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?(?:/.*)?$|^[a-zA-Z0-9.-]+(?::\d+)?(?:/.*)?$"
-		if re.match(pattern, value):
-			return f"http://{value}"
-		return value
+			logging.getLogger(__name__).exception("保存性能采样失败")
 
 	def _open_settings_dialog(self):
+		# 首次打开时构建，之后关闭只隐藏，再次打开时刷新为当前设置
+		if self._settings_dialog is None:
+			self._settings_dialog = self._build_settings_dialog()
+		dlg, ssid_var, url_var = self._settings_dialog
+		ssid_var.set(self.settings.get("wifi_ssid", ""))
+		url_var.set(self.settings.get("auth_url", ""))
+		# Center dialog relative to main window
+		dlg.update_idletasks()
+		x = self.winfo_x() + (self.winfo_width() - dlg.winfo_reqwidth()) // 2
+		y = self.winfo_y() + (self.winfo_height() - dlg.winfo_reqheight()) // 2
+		dlg.geometry(f"+{x}+{y}")
+		dlg.deiconify()
+		dlg.lift()
+		dlg.grab_set()
+
+	def _hide_settings_dialog(self):
+		dlg = self._settings_dialog[0]
+		dlg.grab_release()
+		dlg.withdraw()
+
+	def _build_settings_dialog(self):
 		dlg = tk.Toplevel(self)
+		dlg.withdraw()
 		dlg.title("设置")
 		dlg.transient(self)
-		dlg.grab_set()
 		dlg.configure(bg="#f5f7fb")
+		dlg.protocol("WM_DELETE_WINDOW", self._hide_settings_dialog)
 
 		container = ttk.Frame(dlg, padding=16)
 		container.pack(fill="both", expand=True)
@@ -661,7 +1657,7 @@ class App(tk.Tk):
 		row1.pack(fill="x", pady=(0, 10))
 		label_ssid = ttk.Label(row1, text="WiFi 名称 (SSID)：")
 		label_ssid.pack(side="left")
-		ssid_var = tk.StringVar(value=self.settings.get("wifi_ssid", ""))
+		ssid_var = tk.StringVar()
 		entry_ssid = ttk.Entry(row1, textvariable=ssid_var, width=36)
 		entry_ssid.pack(side="right", fill="x", expand=True)
 
@@ -669,7 +1665,7 @@ class App(tk.Tk):
 		row2.pack(fill="x", pady=(0, 10))
 		label_url = ttk.Label(row2, text="认证 URL：")
 		label_url.pack(side="left")
-		url_var = tk.StringVar(value=self.settings.get("auth_url", ""))
+		url_var = tk.StringVar()
 		entry_url = ttk.Entry(row2, textvariable=url_var, width=36)
 		entry_url.pack(side="right", fill="x", expand=True)
 
@@ -678,28 +1674,29 @@ class App(tk.Tk):
 
 		def on_save():
 			ssid = ssid_var.get().strip()
-			url = self._normalize_url(url_var.get())
-			ok = self._save_settings(ssid, url)
+			url = normalize_url(url_var.get())
+			ok = self.net.save_settings(ssid, url)
 			if ok:
 				self._toast("设置已保存")
-				dlg.destroy()
+				self._hide_settings_dialog()
 			else:
 				self._toast("保存失败，请检查权限")
 
 		btn_save = ttk.Button(btns, text="保存", style="Primary.TButton", command=on_save)
-		btn_cancel = ttk.Button(btns, text="取消", style="Primary.TButton", command=dlg.destroy)
+		btn_cancel = ttk.Button(btns, text="取消", style="Primary.TButton", command=self._hide_settings_dialog)
 		btn_cancel.pack(side="right")
 		btn_save.pack(side="right", padx=(0, 8))
-
-		self.update_idletasks()
-		dlg.update_idletasks()
-		# Center dialog relative to main window
-		x = self.winfo_x() + (self.winfo_width() - dlg.winfo_reqwidth()) // 2
-		y = self.winfo_y() + (self.winfo_height() - dlg.winfo_reqheight()) // 2
-		dlg.geometry(f"+{x}+{y}")
+		return dlg, ssid_var, url_var
 
 
 if __name__ == "__main__":
+	if _instance_reply is not None:
+		# 已运行的是后台服务模式实例，没有窗口可切换；提示后退出，避免两个实例同时监测与连接
+		root = tk.Tk()
+		root.withdraw()
+		messagebox.showinfo("提示", _instance_reply.get("error") or "OCOA 已在运行")
+		root.destroy()
+		sys.exit(0)
 	enable_high_dpi_scaling()
-	app = App()
+	app = App(StartupProfiler(_STARTED), _instance)
 	app.mainloop()
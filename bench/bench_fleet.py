@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from standins import StandinServer
+from ocoa_core import (
+	PROBE_ONLINE, PROBE_CAPTIVE, ProbeEngine, ProbeEndpoint, PortalLoginEngine, RequestLimiter, DecorrelatedBackoff,
+	host_jitter, atomic_write_json
+)
+
+# 机房批量部署的负载模拟：大量“机器”（线程，各自独立的数据目录与限流状态）同时开机，对同一个门户替身探测并登录
+# 门户替身每秒只能处理 capacity 个请求，超出返回 503 + Retry-After
+#   legacy：同时启动，失败后固定间隔重试（旧行为）
+#   fleet ：按主机名错峰启动 + 本机令牌桶限流 + 去相关抖动退避，并遵守 Retry-After
+# 另用多个子进程共用一个 ratelimit.db，校验跨进程限流的总放行数不超过“桶容量 + 速率 × 时长”
+# python bench/bench_fleet.py [--agents 200] [--window 20] [--capacity 40] [--json]
+
+
+def ms(seconds: float) -> float:
+	return round(seconds * 1000, 2)
+
+
+def summarize(samples) -> dict:
+	samples = sorted(samples)
+	if not samples:
+		return {"n": 0}
+	p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+	return {"n": len(samples), "median_ms": ms(statistics.median(samples)), "p95_ms": ms(p95), "max_ms": ms(samples[-1])}
+
+
+class Agent:
+	# 一台机器的启动流程：探测 → 被门户拦截时自动登录 → 未成功则等待后重试
+	def __init__(self, index: int, server: StandinServer, engine: ProbeEngine, root: str, fleet: bool, args):
+		self.name = f"lab-pc-{index:03d}"
+		self.server = server
+		self.engine = engine
+		self.fleet = fleet
+		self.args = args
+		data_dir = os.path.join(root, self.name)
+		portals_path = os.path.join(data_dir, "portals.json")
+		atomic_write_json(portals_path, {
+			"credentials": {"default": {"username": "bench", "password": "bench"}},
+			"portals": {"*": {"username_field": "DDDDD", "password_field": "upass", "extra_fields": {"c": self.name}}}
+		})
+		self.limiter = RequestLimiter.from_settings(os.path.join(data_dir, "ratelimit.db"), {}) if fleet else None
+		self.endpoint = ProbeEndpoint(server.url(f"/204?c={self.name}"), 1.5)
+		self.login = PortalLoginEngine(
+			portals_path, verify=lambda: self.probe() == PROBE_ONLINE, timeout=3.0, limiter=self.limiter
+		)
+		self.online_after = None
+		self.attempts = 0
+
+	def probe(self) -> str:
+		if self.limiter:
+			self.limiter.acquire("probe")
+		return self.engine.run(endpoints=[self.endpoint]).verdict
+
+	def run(self, started: float):
+		if self.fleet:
+			time.sleep(host_jitter(self.args.window, self.name))
+		backoff = DecorrelatedBackoff(1.0, 30.0)
+		while time.monotonic() - started < self.args.deadline:
+			self.attempts += 1
+			verdict = self.probe()
+			if verdict == PROBE_CAPTIVE and self.login.login(self.server.portal_url).ok:
+				verdict = PROBE_ONLINE
+			if verdict == PROBE_ONLINE:
+				self.online_after = time.monotonic() - started
+				break
+			time.sleep(backoff.next() if self.fleet else self.args.legacy_retry)
+		self.login.session.close()
+		if self.limiter:
+			self.limiter.close()
+
+
+def bench_mode(fleet: bool, args) -> dict:
+	server = StandinServer(captive=True, capacity=args.capacity).start()
+	engine = ProbeEngine(probe_timeout=1.5, deadline=2.0, max_workers=64, keepalive=0)
+	root = tempfile.mkdtemp(prefix="ocoa-fleet-")
+	try:
+		agents = [Agent(i, server, engine, root, fleet, args) for i in range(args.agents)]
+		started = time.monotonic()
+		threads = [threading.Thread(target=a.run, args=(started,), daemon=True) for a in agents]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		elapsed = time.monotonic() - started
+		online = [a.online_after for a in agents if a.online_after is not None]
+		return {
+			"agents": args.agents,
+			"online": len(online),
+			"peak_rps": server.peak_rps(),
+			"requests": server.requests,
+			"rejected_503": server.rejected,
+			"attempts": sum(a.attempts for a in agents),
+			"elapsed_s": round(elapsed, 2),
+			"time_to_online": summarize(online)
+		}
+	finally:
+		engine.shutdown()
+		server.close()
+
+
+def limiter_worker(path: str, seconds: float, rate: float, burst: float):
+	limiter = RequestLimiter(path, {"portal": (rate, burst)})
+	end = time.time() + seconds
+	grants = 0
+	while True:
+		remaining = end - time.time()
+		if remaining <= 0 or not limiter.acquire("portal", remaining):
+			break
+		grants += 1
+	limiter.close()
+	print(grants)
+
+
+def bench_shared_limiter(processes: int, seconds: float, rate: float = 2.0, burst: float = 3.0) -> dict:
+	path = os.path.join(tempfile.mkdtemp(prefix="ocoa-limiter-"), "ratelimit.db")
+	cmd = [sys.executable, os.path.abspath(__file__), "--limiter-worker", path, str(seconds), str(rate), str(burst)]
+	workers = [subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+	grants = [int(w.communicate()[0].strip() or 0) for w in workers]
+	bound = burst + rate * seconds
+	return {
+		"processes": processes,
+		"seconds": seconds,
+		"grants": sum(grants),
+		"per_process": grants,
+		"bound": bound,
+		# 进程启动时刻不同，允许 1 个令牌的计时误差
+		"ok": sum(grants) <= bound + 1
+	}
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="机房批量启动负载模拟（本地门户替身）")
+	parser.add_argument("--agents", type=int, default=200, help="模拟的机器数")
+	parser.add_argument(
+		"--window", type=float, default=None,
+		help="错峰启动窗口（秒，对应 startup_jitter；默认按 机器数 × 4 ÷ capacity 估算，每台启动约 4 个门户请求）"
+	)
+	parser.add_argument("--capacity", type=int, default=40, help="门户替身每秒可处理的请求数")
+	parser.add_argument("--legacy-retry", type=float, default=3.0, help="旧行为的固定重试间隔（秒）")
+	parser.add_argument("--deadline", type=float, default=90.0, help="每种模式的最长模拟时长（秒）")
+	parser.add_argument("--processes", type=int, default=4, help="跨进程限流校验的进程数")
+	parser.add_argument("--only", default="", help="只运行 legacy / fleet / limiter 中的部分（逗号分隔）")
+	parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+	parser.add_argument("--limiter-worker", nargs=4, help=argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+	if args.limiter_worker:
+		path, seconds, rate, burst = args.limiter_worker
+		limiter_worker(path, float(seconds), float(rate), float(burst))
+		return 0
+	if args.window is None:
+		args.window = args.agents * 4 / max(1, args.capacity)
+	# 过载时每次登录失败都会告警，模拟中只保留错误
+	logging.getLogger("ocoa_core").setLevel(logging.ERROR)
+	only = {s.strip() for s in args.only.split(",") if s.strip()}
+	results = {}
+	for mode in ("legacy", "fleet"):
+		if not only or mode in only:
+			results[mode] = bench_mode(mode == "fleet", args)
+	if not only or "limiter" in only:
+		results["limiter"] = bench_shared_limiter(args.processes, 5.0)
+	if args.json:
+		print(json.dumps(results, ensure_ascii=False, indent=2))
+	else:
+		for mode in ("legacy", "fleet"):
+			if mode in results:
+				r = results[mode]
+				tto = r["time_to_online"]
+				print(
+					f"{mode:<7} 错峰 {0 if mode == 'legacy' else args.window:g} s，可用 {r['online']}/{r['agents']}，门户峰值 {r['peak_rps']} 请求/秒，"
+					f"共 {r['requests']} 请求（503：{r['rejected_503']}），恢复上网 P50 {tto.get('median_ms', '-')} ms / "
+					f"P95 {tto.get('p95_ms', '-')} ms / 最慢 {tto.get('max_ms', '-')} ms"
+				)
+		if "limiter" in results:
+			r = results["limiter"]
+			print(f"跨进程限流：{r['processes']} 个进程 {r['seconds']:g} 秒共放行 {r['grants']} 次（上限 {r['bound']:g}）"
+				+ ("" if r["ok"] else "，超出上限！"))
+	return 0 if results.get("limiter", {}).get("ok", True) else 1
+
+
+if __name__ == "__main__":
+	sys.exit(main())
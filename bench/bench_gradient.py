@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from OCOA import GradientPainter, hex_to_rgb
+
+# 抬头渐变重绘开销：模拟拖动窗口边缘产生的连续 <Configure> 事件，对比旧实现与缓存图片 + 按帧合并的实现
+# 需要图形环境：python bench/bench_gradient.py [--events 300] [--json]
+
+START_HEX = "#4f46e5"
+END_HEX = "#06b6d4"
+
+
+def legacy_draw(canvas: tk.Canvas, start_hex: str, end_hex: str):
+	# 旧版 _draw_horizontal_gradient：每次事件删除全部图元并重建最多 256 个矩形，且重复绑定
+	canvas.delete("all")
+	width = canvas.winfo_width() or canvas.winfo_reqwidth() or 900
+	height = canvas.winfo_height() or canvas.winfo_reqheight() or 90
+	steps = max(1, min(256, width))
+	r1, g1, b1 = hex_to_rgb(start_hex)
+	r2, g2, b2 = hex_to_rgb(end_hex)
+	for i in range(steps):
+		r = int(r1 + (r2 - r1) * i / steps)
+		g = int(g1 + (g2 - g1) * i / steps)
+		b = int(b1 + (b2 - b1) * i / steps)
+		color = f"#{r:02x}{g:02x}{b:02x}"
+		canvas.create_rectangle(i * (width/steps), 0, (i+1) * (width/steps), height, outline='', fill=color)
+	canvas.bind("<Configure>", lambda _: legacy_draw(canvas, start_hex, end_hex))
+
+
+def drag(root: tk.Tk, canvas: tk.Canvas, events: int, interval: float):
+	# 宽度来回变化，模拟拖动；每步处理一次事件循环
+	start = time.perf_counter()
+	for i in range(events):
+		canvas.configure(width=600 + (i * 7) % 600)
+		root.update()
+		time.sleep(interval)
+	# 等待尚未执行的合并重绘
+	time.sleep(0.05)
+	root.update()
+	return time.perf_counter() - start - interval * events - 0.05
+
+
+def run(events: int, interval: float) -> dict:
+	root = tk.Tk()
+	results = {}
+	try:
+		canvas = tk.Canvas(root, height=90, highlightthickness=0, bd=0)
+		canvas.pack(fill="x")
+		root.update()
+		legacy_draw(canvas, START_HEX, END_HEX)
+		elapsed = drag(root, canvas, events, interval)
+		results["legacy"] = {
+			"events": events,
+			"total_ms": round(elapsed * 1000, 2),
+			"per_event_ms": round(elapsed * 1000 / events, 3),
+			"canvas_items": len(canvas.find_all())
+		}
+		canvas.destroy()
+
+		canvas = tk.Canvas(root, height=90, highlightthickness=0, bd=0)
+		canvas.pack(fill="x")
+		root.update()
+		painter = GradientPainter(canvas, START_HEX, END_HEX)
+		elapsed = drag(root, canvas, events, interval)
+		results["cached"] = {
+			"events": painter.events,
+			"redraws": painter.redraws,
+			"total_ms": round(elapsed * 1000, 2),
+			"per_event_ms": round(elapsed * 1000 / max(1, painter.events), 3),
+			"canvas_items": len(canvas.find_all())
+		}
+	finally:
+		root.destroy()
+	return results
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="抬头渐变重绘开销基准")
+	parser.add_argument("--events", type=int, default=300, help="模拟的尺寸变化事件数")
+	parser.add_argument("--interval", type=float, default=0.002, help="事件间隔（秒）")
+	parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+	args = parser.parse_args(argv)
+	results = run(args.events, args.interval)
+	if args.json:
+		print(json.dumps(results, ensure_ascii=False, indent=2))
+	else:
+		for name, item in results.items():
+			print(f"{name:>7}: 每次事件 {item['per_event_ms']:.3f} ms，总计 {item['total_ms']:.1f} ms，画布图元 {item['canvas_items']}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
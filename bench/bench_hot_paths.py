@@ -0,0 +1,391 @@
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from standins import FakeNetsh, StandinServer
+from ocoa_core import (
+	PROBE_ONLINE, PROBE_CAPTIVE, NetworkService, ReadinessWaiter, Tracer, CompressedTimedRotatingFileHandler,
+	setup_logging, flush_logging
+)
+
+# 认证 / 连接热路径基准：netsh 由 bench/fakes/netsh 替身响应，探测与门户地址由本地 HTTP 替身提供，无需真实网络
+# 测量网络可用性探测、连接就绪、自动检测流程（到“可用”为止）、日志吞吐与冷启动耗时，结果写为 JSON 便于版本间对比
+# python bench/bench_hot_paths.py [--rounds 5] [--output 文件] [--compare 旧结果.json] [--only probe,connect,...]
+
+TARGET_SSID = "Campus-Net"
+
+# 探测场景：各地址同时发起，取第一个决定性结果
+PROBE_SCENARIOS = {
+	"fast_204": ["/204"],
+	"fast_among_slow": ["/slow/400", "/204", "/hang"],
+	"slow_only": ["/slow/300"],
+	"success_200": ["/hang", "/ok"],
+	"captive_redirect": ["/redirect", "/hang"],
+	"all_hanging": ["/hang", "/hang"]
+}
+
+# 自动检测场景：初始连接状态与门户状态
+AUTO_CHECK_SCENARIOS = {
+	"online": {"ssid": TARGET_SSID, "captive": False},
+	"captive": {"ssid": TARGET_SSID, "captive": True},
+	"disconnected_captive": {"ssid": "", "captive": True}
+}
+
+
+def ms(seconds: float) -> float:
+	return round(seconds * 1000, 2)
+
+
+def summarize(samples) -> dict:
+	samples = sorted(samples)
+	if not samples:
+		return {"n": 0}
+	p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+	return {
+		"n": len(samples),
+		"min_ms": ms(samples[0]),
+		"median_ms": ms(statistics.median(samples)),
+		"p95_ms": ms(p95),
+		"max_ms": ms(samples[-1])
+	}
+
+
+def make_data_dir(server: StandinServer, endpoints, probe_timeout: float = 1.5) -> str:
+	# 与真实安装相同的配置文件布局，NetworkService 按正常流程读取
+	data_dir = tempfile.mkdtemp(prefix="ocoa-bench-")
+	settings = {
+		"wifi_ssid": TARGET_SSID,
+		"auth_url": server.portal_url,
+		"probe_endpoints": [server.url(path) for path in endpoints],
+		"probe_timeout": probe_timeout,
+		"probe_deadline": probe_timeout + 0.5
+	}
+	portals = {
+		"credentials": {"default": {"username": server.username, "password": server.password}},
+		"portals": {"*": {"success_markers": ["认证成功"]}}
+	}
+	with open(os.path.join(data_dir, "user_settings.json"), "w", encoding="utf-8") as f:
+		json.dump(settings, f, ensure_ascii=False)
+	with open(os.path.join(data_dir, "portals.json"), "w", encoding="utf-8") as f:
+		json.dump(portals, f, ensure_ascii=False)
+	return data_dir
+
+
+def portal_reachable(server: StandinServer):
+	# has_ip_path 对回环地址返回 False（真实环境中表示尚无网络），替身环境下改为检查门户端口可达
+	def check() -> bool:
+		try:
+			with socket.create_connection(("127.0.0.1", server.port), timeout=0.2):
+				return True
+		except OSError:
+			return False
+	return check
+
+
+def make_waiter(net: NetworkService, server: StandinServer) -> ReadinessWaiter:
+	return ReadinessWaiter(lambda: net.get_connected_ssid(max_age=0), portal_reachable(server), deadline=10.0)
+
+
+def bench_probe(server: StandinServer, rounds: int) -> dict:
+	results = {}
+	for name, endpoints in PROBE_SCENARIOS.items():
+		server.reset(captive=False)
+		net = NetworkService(make_data_dir(server, endpoints))
+		samples = []
+		verdict = None
+		try:
+			for _ in range(rounds):
+				start = time.perf_counter()
+				verdict = net.probe().verdict
+				samples.append(time.perf_counter() - start)
+		finally:
+			net.shutdown()
+		# 每轮新建的 TCP 连接数反映 keep-alive 复用情况
+		results[name] = dict(summarize(samples), verdict=verdict, requests=server.requests, connections=server.connections)
+	return results
+
+
+def bench_connect(netsh: FakeNetsh, server: StandinServer, rounds: int, latency_ms: float, assoc_delay_ms: float) -> dict:
+	net = NetworkService(make_data_dir(server, ["/204"]))
+	waiter = make_waiter(net, server)
+	command, ready, polls = [], [], []
+	try:
+		for _ in range(rounds):
+			netsh.configure(latency_ms=latency_ms, ssid="", assoc_delay_ms=assoc_delay_ms)
+			start = time.perf_counter()
+			net.connect_to_wifi(TARGET_SSID)
+			command.append(time.perf_counter() - start)
+			result = waiter.wait(TARGET_SSID)
+			ready.append(time.perf_counter() - start)
+			polls.append(result.polls)
+	finally:
+		net.shutdown()
+	return {
+		"command": summarize(command),
+		"ready": summarize(ready),
+		"polls_median": statistics.median(polls) if polls else None,
+		"assoc_delay_ms": assoc_delay_ms
+	}
+
+
+def auto_check_flow(net: NetworkService, waiter: ReadinessWaiter) -> dict:
+	# 与界面 _auto_check_flow → _auto_check_on_ssid → _auto_check_on_usable / _auto_check_after_connect 的顺序一致
+	phases = {}
+	start = time.perf_counter()
+	ssid = net.get_connected_ssid()
+	phases["ssid"] = time.perf_counter() - start
+	if not net.is_known_ssid(ssid):
+		target = net.preferred_ssid()
+		net.connect_to_wifi(target)
+		ready = waiter.wait(target)
+		phases["connect"] = time.perf_counter() - start - sum(phases.values())
+		if not ready.ready:
+			return {"online": False, "phases": phases}
+		ssid = target
+	mark = time.perf_counter()
+	result = net.probe(ssid)
+	phases["probe"] = time.perf_counter() - mark
+	online = result.verdict == PROBE_ONLINE
+	if result.verdict == PROBE_CAPTIVE:
+		mark = time.perf_counter()
+		online = net.portal_login.login(net.auth_url_for(ssid), net.credentials_for(ssid)).ok
+		phases["auth"] = time.perf_counter() - mark
+	phases["total"] = time.perf_counter() - start
+	return {"online": online, "phases": phases}
+
+
+def bench_auto_check(netsh: FakeNetsh, server: StandinServer, rounds: int, latency_ms: float, assoc_delay_ms: float) -> dict:
+	results = {}
+	for name, scenario in AUTO_CHECK_SCENARIOS.items():
+		phase_samples = {}
+		online = 0
+		for _ in range(rounds):
+			# 每轮使用新的服务实例，避免接口缓存与 keep-alive 连接跨轮复用
+			netsh.configure(latency_ms=latency_ms, ssid=scenario["ssid"], assoc_delay_ms=assoc_delay_ms)
+			server.reset(captive=scenario["captive"])
+			net = NetworkService(make_data_dir(server, ["/204", "/hang"]))
+			try:
+				outcome = auto_check_flow(net, make_waiter(net, server))
+			finally:
+				net.shutdown()
+			online += bool(outcome["online"])
+			for phase, value in outcome["phases"].items():
+				phase_samples.setdefault(phase, []).append(value)
+		results[name] = {
+			"online_rate": round(online / rounds, 3),
+			"phases": {phase: summarize(values) for phase, values in phase_samples.items()}
+		}
+	return results
+
+
+def bench_log_rotation(records: int) -> dict:
+	# 轮转时 gzip 压缩的耗时与压缩比（在写线程上执行，不占用调用方）
+	logs_dir = tempfile.mkdtemp(prefix="ocoa-bench-rotate-")
+	handler = CompressedTimedRotatingFileHandler(os.path.join(logs_dir, "app.log"))
+	handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+	for i in range(records):
+		handler.emit(logging.LogRecord("ocoa_core", logging.INFO, __file__, 0, f"Probe failed: http://127.0.0.1/{i}", None, None))
+	handler.flush()
+	raw = os.path.getsize(os.path.join(logs_dir, "app.log"))
+	start = time.perf_counter()
+	handler.doRollover()
+	elapsed = time.perf_counter() - start
+	handler.close()
+	packed = sum(os.path.getsize(os.path.join(logs_dir, n)) for n in os.listdir(logs_dir) if n.endswith(".gz"))
+	return {"raw_bytes": raw, "gzip_bytes": packed, "ratio": round(raw / max(1, packed), 1), "rollover_ms": round(elapsed * 1000, 1)}
+
+
+def bench_logging(records: int) -> dict:
+	results = {}
+	logger = logging.getLogger("ocoa.bench")
+	start = time.perf_counter()
+	for i in range(records):
+		logger.info(f"Probe failed: http://127.0.0.1/{i}")
+	elapsed = time.perf_counter() - start
+	# 调用方只付入队的代价；写线程落盘的总耗时另计
+	flush_logging(60)
+	drained = time.perf_counter() - start
+	results["file_handler"] = {
+		"records": records, "records_per_s": round(records / elapsed), "per_record_us": round(elapsed * 1e6 / records, 2),
+		"drain_ms": round(drained * 1000, 1)
+	}
+	results["rotation"] = bench_log_rotation(records)
+
+	try:
+		from OCOA import LogStore, translate_for_ui
+	except Exception as exc:
+		results["ui_store"] = {"skipped": f"无法导入界面模块：{exc}"}
+		return results
+	# 界面日志的非 Tk 部分：翻译 + 写入索引缓存（每帧批量写入文本框前的处理）
+	store = LogStore()
+	formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+	record = logging.LogRecord("ocoa", logging.WARNING, __file__, 0, "Probe failed: http://127.0.0.1/", None, None)
+	start = time.perf_counter()
+	for _ in range(records):
+		store.append(record.created, record.levelno, record.levelname, translate_for_ui(formatter.format(record)))
+	elapsed = time.perf_counter() - start
+	results["ui_store"] = {"records": records, "records_per_s": round(records / elapsed), "per_record_us": round(elapsed * 1e6 / records, 2)}
+
+	if not os.environ.get("DISPLAY") and os.name != "nt":
+		results["ui_sink"] = {"skipped": "无图形环境"}
+		return results
+	import tkinter as tk
+	from tkinter import scrolledtext
+	from OCOA import TkLogSink
+	root = tk.Tk()
+	try:
+		widget = scrolledtext.ScrolledText(root, height=10)
+		widget.pack()
+		sink = TkLogSink(root, widget, frame_ms=16)
+		start = time.perf_counter()
+		for i in range(records):
+			sink.emit(logging.LogRecord("ocoa", logging.INFO, __file__, 0, f"Probe failed: {i}", None, None))
+		while sink._pending:
+			root.update()
+		elapsed = time.perf_counter() - start
+		sink.close()
+		results["ui_sink"] = {"records": records, "records_per_s": round(records / elapsed), "per_record_us": round(elapsed * 1e6 / records, 2)}
+	finally:
+		root.destroy()
+	return results
+
+
+def bench_tracing(calls: int = 200000) -> dict:
+	# 单个 span 的开销：关闭时应可忽略（相对一次 netsh 调用的数十毫秒）
+	results = {}
+	for name, enabled in (("disabled", False), ("enabled", True)):
+		local = Tracer(enabled=enabled)
+		start = time.perf_counter()
+		for _ in range(calls):
+			with local.span("bench"):
+				pass
+		results[name] = {"calls": calls, "per_span_ns": round((time.perf_counter() - start) * 1e9 / calls, 1)}
+	return results
+
+
+def bench_cold_start(netsh: FakeNetsh, rounds: int) -> dict:
+	data_dir = tempfile.mkdtemp(prefix="ocoa-bench-cli-")
+	netsh.configure(latency_ms=0, ssid=TARGET_SSID)
+	commands = {
+		"import_core": [sys.executable, "-c", "import ocoa_core"],
+		"import_gui": [sys.executable, "-c", "import OCOA"],
+		"cli_status": [sys.executable, os.path.join(ROOT_DIR, "OCOA.py"), "status", "--json", "--data-dir", data_dir],
+		"interpreter": [sys.executable, "-c", "pass"]
+	}
+	env = netsh.env()
+	results = {}
+	for name, cmd in commands.items():
+		samples = []
+		for _ in range(rounds):
+			start = time.perf_counter()
+			subprocess.run(cmd, cwd=ROOT_DIR, env=env, capture_output=True, timeout=60)
+			samples.append(time.perf_counter() - start)
+		results[name] = summarize(samples)
+	return results
+
+
+def git_revision() -> str:
+	try:
+		res = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, timeout=10)
+		return res.stdout.strip()
+	except Exception:
+		return ""
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+	# 展开为 "auto_check.captive.phases.total.median_ms" 形式，供对比使用
+	flat = {}
+	for key, value in results.items():
+		path = f"{prefix}.{key}" if prefix else key
+		if isinstance(value, dict):
+			flat.update(flatten(value, path))
+		elif isinstance(value, (int, float)) and not isinstance(value, bool):
+			flat[path] = value
+	return flat
+
+
+def compare(old: dict, new: dict):
+	old_flat, new_flat = flatten(old.get("results", {})), flatten(new.get("results", {}))
+	print(f"\n对比 {old.get('meta', {}).get('revision') or '旧结果'} → {new['meta']['revision'] or '当前'}（中位数 / 吞吐）：")
+	for key in sorted(new_flat):
+		if not (key.endswith("median_ms") or key.endswith("records_per_s")) or key not in old_flat:
+			continue
+		before, after = old_flat[key], new_flat[key]
+		change = (after - before) / before * 100 if before else 0.0
+		print(f"  {key:<55} {before:>10} → {after:<10} ({change:+.1f}%)")
+
+
+SUITES = ("probe", "connect", "auto_check", "logging", "tracing", "cold_start")
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="认证 / 连接热路径基准（本地替身，无需网络）")
+	parser.add_argument("--rounds", type=int, default=5, help="每个场景的重复次数")
+	parser.add_argument("--netsh-latency", type=float, default=40, help="netsh 替身每次调用的延迟（毫秒）")
+	parser.add_argument("--assoc-delay", type=float, default=300, help="连接指令到关联成功的延迟（毫秒）")
+	parser.add_argument("--log-records", type=int, default=20000, help="日志吞吐测试的记录数")
+	parser.add_argument("--only", default="", help=f"只运行指定项目（逗号分隔）：{','.join(SUITES)}")
+	parser.add_argument("--output", default="", help="结果 JSON 路径（默认 bench/results/hot_paths-时间.json）")
+	parser.add_argument("--compare", default="", help="与之前的结果 JSON 对比")
+	args = parser.parse_args(argv)
+	only = [s for s in args.only.split(",") if s] or list(SUITES)
+
+	logs_dir = tempfile.mkdtemp(prefix="ocoa-bench-logs-")
+	setup_logging(logs_dir, console_level=logging.CRITICAL)
+	results = {}
+	server = StandinServer().start()
+	try:
+		with FakeNetsh() as netsh:
+			if "probe" in only:
+				results["probe"] = bench_probe(server, args.rounds)
+			if "connect" in only:
+				results["connect"] = bench_connect(netsh, server, args.rounds, args.netsh_latency, args.assoc_delay)
+			if "auto_check" in only:
+				results["auto_check"] = bench_auto_check(netsh, server, args.rounds, args.netsh_latency, args.assoc_delay)
+			if "logging" in only:
+				results["logging"] = bench_logging(args.log_records)
+			if "tracing" in only:
+				results["tracing"] = bench_tracing()
+			if "cold_start" in only:
+				results["cold_start"] = bench_cold_start(netsh, args.rounds)
+	finally:
+		server.close()
+
+	report = {
+		"meta": {
+			"revision": git_revision(),
+			"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"rounds": args.rounds,
+			"netsh_latency_ms": args.netsh_latency,
+			"assoc_delay_ms": args.assoc_delay
+		},
+		"results": results
+	}
+	output = args.output or os.path.join(BENCH_DIR, "results", f"hot_paths-{time.strftime('%Y%m%d-%H%M%S')}.json")
+	os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+	with open(output, "w", encoding="utf-8") as f:
+		json.dump(report, f, ensure_ascii=False, indent=2)
+	print(json.dumps(results, ensure_ascii=False, indent=2))
+	print(f"\n结果已写入：{output}")
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as f:
+			compare(json.load(f), report)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocoa_core import parse_interface_snapshot, parse_networks, parse_ip_interfaces
+
+# netsh 输出解析：先用 fixtures/netsh 中的中英文样本校验解析结果（与 expected.json 比对），再计时
+# 对比旧实现（逐次尝试多种编码 + 只取首个网卡的 SSID / 状态 / 信号）与单次遍历的结构化解析
+# python bench/bench_netsh_parse.py [--rounds 2000] [--json]；校验失败时退出码为 1
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "netsh")
+
+
+def legacy_decode(data: bytes) -> str:
+	for enc in ("utf-8", "gbk", "cp936"):
+		try:
+			return data.decode(enc)
+		except Exception:
+			pass
+	return data.decode(errors="ignore")
+
+
+def legacy_parse(output: str) -> dict:
+	# 旧版：逐行扫描到第二个 SSID 为止，只得到首个网卡的四个字段
+	snap = {"ssid": "", "state": "", "bssid": "", "signal": None}
+	for raw_line in output.splitlines():
+		line = raw_line.strip()
+		if not line or ":" not in line:
+			continue
+		key, value = line.split(":", 1)
+		key = key.strip().upper()
+		value = value.strip()
+		if key in ("BSSID", "AP BSSID"):
+			snap["bssid"] = snap["bssid"] or value
+		elif key == "SSID":
+			if snap["ssid"]:
+				break
+			snap["ssid"] = value
+		elif key in ("STATE", "状态") and not snap["state"]:
+			snap["state"] = value
+		elif key in ("SIGNAL", "信号") and snap["signal"] is None:
+			try:
+				snap["signal"] = int(value.rstrip("%").strip())
+			except ValueError:
+				pass
+	return snap
+
+
+def parser_for(name: str):
+	if name.startswith("interfaces"):
+		return parse_interface_snapshot
+	if name.startswith("ipv4"):
+		return parse_ip_interfaces
+	return parse_networks
+
+
+def parse_fixture(name: str, text: str) -> dict:
+	if name.startswith("interfaces"):
+		snap = parse_interface_snapshot(text)
+		return {
+			"primary": snap.primary.name if snap.primary else None,
+			"interfaces": [i.as_dict() for i in snap.interfaces]
+		}
+	if name.startswith("ipv4"):
+		return {"interfaces": [dict(i.as_dict(), usable_address=i.usable_address) for i in parse_ip_interfaces(text)]}
+	return {"networks": [n.as_dict() for n in parse_networks(text)]}
+
+
+def load_corpus():
+	with open(os.path.join(FIXTURE_DIR, "expected.json"), "r", encoding="utf-8") as f:
+		expected = json.load(f)
+	corpus = []
+	for name in sorted(expected):
+		with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+			corpus.append((name, f.read(), expected[name]))
+	return corpus
+
+
+def verify(corpus) -> list:
+	failures = []
+	for name, data, expected in corpus:
+		encoding = expected.pop("encoding", "utf-8")
+		# 经 JSON 往返，使元组与列表可直接比较
+		parsed = json.loads(json.dumps(parse_fixture(name, data.decode(encoding)), ensure_ascii=False))
+		if parsed != expected:
+			failures.append(name)
+		expected["encoding"] = encoding
+	return failures
+
+
+def timed(fn, rounds: int) -> float:
+	start = time.perf_counter()
+	for _ in range(rounds):
+		fn()
+	return (time.perf_counter() - start) / rounds
+
+
+def run(corpus, rounds: int) -> dict:
+	results = {}
+	for name, data, expected in corpus:
+		encoding = expected["encoding"]
+		item = {"bytes": len(data)}
+		parse = parser_for(name)
+		item["structured_us"] = round(timed(lambda: parse(data.decode(encoding)), rounds) * 1e6, 2)
+		if name.startswith("interfaces"):
+			item["legacy_us"] = round(timed(lambda: legacy_parse(legacy_decode(data)), rounds) * 1e6, 2)
+		results[name] = item
+	return results
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="netsh 输出解析基准")
+	parser.add_argument("--rounds", type=int, default=2000, help="每个样本的解析次数")
+	parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+	args = parser.parse_args(argv)
+	corpus = load_corpus()
+	failures = verify(corpus)
+	results = {"verified": len(corpus) - len(failures), "failures": failures, "samples": run(corpus, args.rounds)}
+	if args.json:
+		print(json.dumps(results, ensure_ascii=False, indent=2))
+	else:
+		for name, item in results["samples"].items():
+			legacy = f"，旧实现 {item['legacy_us']:.1f} µs" if "legacy_us" in item else ""
+			print(f"{name:<40} {item['bytes']:>5} B：结构化解析 {item['structured_us']:.1f} µs{legacy}")
+		print(f"样本校验：通过 {results['verified']} 个" + (f"，失败：{', '.join(failures)}" if failures else ""))
+	return 1 if failures else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
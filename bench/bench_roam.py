@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from standins import FakeNetsh
+from ocoa_core import NetworkService, BssidScanCache, parse_networks, atomic_write_json, _load_wlan_api
+
+# 接入点扫描表与漫游：用 fixtures/netsh 中的 mode=bssid 样本与 netsh 替身校验
+#   1. 扫描表：索引正确（按信号排序、按信道推断频段），并计时一次刷新
+#   2. 漫游判断：信号弱且有更强接入点时漫游；信号正常、已在最强接入点、冷却期内不漫游；
+#      漫游从不经 netsh 连接（netsh 无法指定接入点）
+#   3. 信号下降到经 WLAN API 发出漫游指令的耗时（接口刷新 → 提前唤醒扫描线程 → 漫游判断 → 连接指令）
+# python bench/bench_roam.py [--rounds 2000] [--json]；校验失败时退出码为 1
+# 非 Windows 上 WLAN API 不可用，不会漫游，第 3 项记为未通过
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures", "netsh")
+SSID = "Campus-Net"
+BEST = "70:3a:0e:aa:bb:01"
+WEAK = "70:3a:0e:aa:bb:02"
+
+
+def load_fixture(name: str) -> str:
+	with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+		return f.read().decode("utf-8")
+
+
+def bench_table(rounds: int) -> dict:
+	text = load_fixture("networks_en_bssid.txt")
+	cache = BssidScanCache(fetch=lambda: parse_networks(text))
+	start = time.perf_counter()
+	for _ in range(rounds):
+		cache.refresh()
+	elapsed = time.perf_counter() - start
+	aps = cache.access_points(SSID)
+	checks = {
+		"best_first": [a.bssid for a in aps] == [BEST, WEAK],
+		"band_inferred": [a.band for a in aps] == ["5 GHz", "2.4 GHz"],
+		"band_reported": cache.lookup("70:3A:0E:CC:DD:02").band == "5 GHz",
+		"unknown_ssid": cache.best("Nope") is None
+	}
+	return {"refresh_us": round(elapsed * 1e6 / rounds, 2), "checks": checks}
+
+
+def make_service(root: str, **settings) -> NetworkService:
+	atomic_write_json(os.path.join(root, "user_settings.json"), dict({"wifi_ssid": SSID, "history_enabled": False}, **settings))
+	return NetworkService(root)
+
+
+def bench_decisions(netsh: FakeNetsh, wlan_api: bool) -> dict:
+	cases = (
+		("weak_signal_roams", {"bssid": WEAK, "signal": 30}, BEST),
+		("strong_signal_stays", {"bssid": WEAK, "signal": 80}, None),
+		("already_best_stays", {"bssid": BEST, "signal": 30}, None),
+		("small_gain_stays", {"bssid": WEAK, "signal": 45, "margin": 60}, None)
+	)
+	results = {}
+	for name, case, expected in cases:
+		netsh.configure(latency_ms=0, ssid=SSID, networks_fixture="networks_en_bssid.txt",
+			bssid=case["bssid"], signal=case["signal"])
+		net = make_service(tempfile.mkdtemp(prefix="ocoa-roam-"), roam_signal_margin=case.get("margin", 20))
+		try:
+			candidate = net.roam_candidate()
+			roamed = net.maybe_roam()
+			# 漫游只经 WLAN API：不可用时不漫游，任何情况下都不应发出 netsh 连接指令
+			connects = netsh.state().get("connects", 0)
+			results[name] = {
+				"candidate": candidate.bssid if candidate else None, "roamed": roamed, "netsh_connects": connects,
+				"ok": (candidate.bssid if candidate else None) == expected and roamed == (wlan_api and bool(expected))
+					and connects == 0
+			}
+		finally:
+			net.shutdown()
+	# 冷却期内不重复漫游
+	netsh.configure(latency_ms=0, ssid=SSID, networks_fixture="networks_en_bssid.txt", bssid=WEAK, signal=30)
+	net = make_service(tempfile.mkdtemp(prefix="ocoa-roam-"))
+	try:
+		first = net.roam_candidate() is not None
+		net._roamed_at = time.monotonic()
+		second = net.roam_candidate() is not None
+		results["cooldown"] = {"candidate": [first, second], "ok": first and not second}
+		target = net._connect_target(SSID)
+		results["connect_target"] = {"target": list(target) if target else None, "ok": bool(target) and target[1] == BEST}
+	finally:
+		net.shutdown()
+	return results
+
+
+def bench_reaction(netsh: FakeNetsh, rounds: int, latency_ms: float) -> dict:
+	samples = []
+	netsh_connects = 0
+	for _ in range(rounds):
+		netsh.configure(latency_ms=latency_ms, ssid=SSID, networks_fixture="networks_en_bssid.txt", bssid=WEAK, signal=90)
+		net = make_service(tempfile.mkdtemp(prefix="ocoa-roam-"), scan_interval=60)
+		net.scanner.min_interval = 0.2
+		try:
+			net.start_scanner()
+			while net.scanner.scans == 0:
+				time.sleep(0.01)
+			time.sleep(0.3)
+			state = netsh.state()
+			state["signal"] = 30
+			netsh.configure(**state)
+			dropped = time.perf_counter()
+			# 监测每次刷新接口状态时发现信号低于阈值；漫游指令经 WLAN API 发出（发出前记录 _roamed_at）
+			net.get_interface(max_age=0)
+			deadline = dropped + 10
+			while net._roamed_at is None and time.perf_counter() < deadline:
+				time.sleep(0.005)
+			if net._roamed_at is not None:
+				samples.append(time.perf_counter() - dropped)
+			netsh_connects += netsh.state().get("connects", 0)
+		finally:
+			net.shutdown()
+	samples.sort()
+	return {
+		"rounds": rounds,
+		"roamed": len(samples),
+		"netsh_connects": netsh_connects,
+		"median_ms": round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+		"max_ms": round(samples[-1] * 1000, 1) if samples else None
+	}
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="接入点扫描表与漫游基准（netsh 替身）")
+	parser.add_argument("--rounds", type=int, default=2000, help="扫描表刷新的计时次数")
+	parser.add_argument("--reaction-rounds", type=int, default=3, help="漫游反应时间的测量次数")
+	parser.add_argument("--netsh-latency", type=float, default=40, help="netsh 替身每次调用的延迟（毫秒）")
+	parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+	args = parser.parse_args(argv)
+	logging.getLogger("ocoa_core").setLevel(logging.ERROR)
+	results = {"wlan_api": _load_wlan_api() is not None, "table": bench_table(args.rounds)}
+	with FakeNetsh() as netsh:
+		results["decisions"] = bench_decisions(netsh, results["wlan_api"])
+		results["reaction"] = bench_reaction(netsh, args.reaction_rounds, args.netsh_latency)
+	failures = [k for k, ok in results["table"]["checks"].items() if not ok]
+	failures += [k for k, r in results["decisions"].items() if not r["ok"]]
+	# 只走了 netsh（或没有发出漫游指令）都算未通过
+	if results["reaction"]["roamed"] < args.reaction_rounds or results["reaction"]["netsh_connects"]:
+		failures.append("reaction")
+	results["failures"] = failures
+	if args.json:
+		print(json.dumps(results, ensure_ascii=False, indent=2))
+	else:
+		print(f"扫描表刷新：{results['table']['refresh_us']:.1f} µs（WLAN API：{'可用' if results['wlan_api'] else '不可用，不会漫游'}）")
+		for name, r in results["decisions"].items():
+			print(f"{name:<22} {'通过' if r['ok'] else '未通过'}")
+		r = results["reaction"]
+		print(f"信号下降 → 漫游指令：中位数 {r['median_ms']} ms，最慢 {r['max_ms']} ms（{r['roamed']}/{r['rounds']} 次）")
+		print("通过" if not failures else f"未通过：{', '.join(failures)}")
+	return 1 if failures else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
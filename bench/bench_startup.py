@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from standins import FakeNetsh
+
+# 界面冷启动回归测试：
+# 1. 导入检查（无需图形环境）：import OCOA 后不应已加载仅在联网 / 打开浏览器 / 日志栏时才用到的模块
+# 2. 冷启动计时（需要图形环境）：以 OCOA_STARTUP_REPORT 启动界面，到可交互后自动退出，
+#    读取首帧与可交互时刻（从创建进程起算，含解释器启动），中位数超出预算时退出码为 1
+# python bench/bench_startup.py [--rounds 5] [--first-paint-budget 600] [--interactive-budget 1000] [--imports-only] [--json]
+# 计时会以程序目录下的 data/ 启动界面，请在 OCOA 未运行时执行
+
+# 首帧之前不应导入的模块
+DEFERRED_MODULES = (
+	"webbrowser", "subprocess", "urllib.parse", "html.parser", "tempfile", "ipaddress",
+	"http.client", "ssl", "sqlite3", "tkinter.scrolledtext"
+)
+
+
+def check_imports() -> dict:
+	code = (
+		"import sys, json, time\n"
+		"t = time.perf_counter()\n"
+		"import OCOA\n"
+		"elapsed = time.perf_counter() - t\n"
+		f"print(json.dumps({{'loaded': [m for m in {DEFERRED_MODULES!r} if m in sys.modules], 'ms': elapsed * 1000}}))\n"
+	)
+	out = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, timeout=60)
+	if out.returncode != 0:
+		return {"ok": False, "error": out.stderr.strip().splitlines()[-1:] or ["import failed"]}
+	data = json.loads(out.stdout)
+	return {"ok": not data["loaded"], "eager": data["loaded"], "import_ms": round(data["ms"], 1)}
+
+
+def launch_once(netsh: FakeNetsh) -> dict:
+	report = os.path.join(tempfile.mkdtemp(prefix="ocoa-startup-"), "startup.json")
+	env = netsh.env()
+	env["OCOA_STARTUP_REPORT"] = report
+	env["OCOA_EXIT_AFTER_STARTUP"] = "1"
+	spawned = time.time()
+	proc = subprocess.run(
+		[sys.executable, os.path.join(ROOT_DIR, "OCOA.py")], cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=60
+	)
+	if not os.path.exists(report):
+		detail = (proc.stderr or "").strip().splitlines()[-1:] or ["无输出"]
+		raise RuntimeError(f"界面未能启动（需要图形环境）：{detail[0]}")
+	with open(report, "r", encoding="utf-8") as f:
+		data = json.load(f)
+	# 进程内的时刻以开始执行 OCOA.py 为零点，加上解释器启动耗时即为从创建进程起算
+	offset = (data["started_at"] - spawned) * 1000
+	marks = {name: round(offset + value, 1) for name, value in data["marks_ms"].items()}
+	marks["interpreter"] = round(offset, 1)
+	return marks
+
+
+def summarize(samples) -> dict:
+	return {"median_ms": round(statistics.median(samples), 1), "max_ms": round(max(samples), 1)} if samples else {}
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="界面冷启动回归测试")
+	parser.add_argument("--rounds", type=int, default=5, help="冷启动次数")
+	parser.add_argument("--first-paint-budget", type=float, default=600, help="首帧预算（毫秒，中位数）")
+	parser.add_argument("--interactive-budget", type=float, default=1000, help="可交互预算（毫秒，中位数）")
+	parser.add_argument("--imports-only", action="store_true", help="只做导入检查（无图形环境时使用）")
+	parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+	args = parser.parse_args(argv)
+	results = {"imports": check_imports()}
+	failures = [] if results["imports"]["ok"] else ["imports"]
+	if not args.imports_only:
+		try:
+			with FakeNetsh() as netsh:
+				netsh.configure(latency_ms=0, ssid="")
+				runs = [launch_once(netsh) for _ in range(args.rounds)]
+		except (RuntimeError, OSError, subprocess.TimeoutExpired) as exc:
+			print(exc, file=sys.stderr)
+			return 1
+		phases = {}
+		for name in ("interpreter", "imports", "shell", "first_paint", "interactive"):
+			phases[name] = summarize([r[name] for r in runs if name in r])
+		results["startup"] = phases
+		budgets = {"first_paint": args.first_paint_budget, "interactive": args.interactive_budget}
+		for name, budget in budgets.items():
+			if phases[name].get("median_ms", float("inf")) > budget:
+				failures.append(name)
+		results["budgets_ms"] = budgets
+	results["failures"] = failures
+	if args.json:
+		print(json.dumps(results, ensure_ascii=False, indent=2))
+	else:
+		imports = results["imports"]
+		if "error" in imports:
+			print(f"导入检查失败：{imports['error']}")
+		else:
+			eager = "、".join(imports["eager"]) or "无"
+			print(f"import OCOA：{imports['import_ms']} ms，首帧前已加载的延迟模块：{eager}")
+		for name, stats in results.get("startup", {}).items():
+			if stats:
+				budget = results["budgets_ms"].get(name)
+				suffix = f"（预算 {budget:g} ms）" if budget else ""
+				print(f"{name:<12} 中位数 {stats['median_ms']:>7.1f} ms，最慢 {stats['max_ms']:>7.1f} ms{suffix}")
+		print("通过" if not failures else f"未通过：{', '.join(failures)}")
+	return 1 if failures else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
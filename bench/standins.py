@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import threading
+import tempfile
+from urllib.parse import parse_qs
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 基准测试用的本地替身：无需真实网络即可复现 netsh 与探测 / 门户服务器的各种表现
+
+FAKES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakes")
+
+
+class FakeNetsh:
+	# 将 bench/fakes 放到 PATH 最前，使 subprocess 调用的 netsh 变为可编程的替身
+	def __init__(self, state_dir: str = None):
+		self.state_dir = state_dir or tempfile.mkdtemp(prefix="ocoa-netsh-")
+		self.state_path = os.path.join(self.state_dir, "netsh_state.json")
+		self._saved_env = None
+
+	def configure(self, latency_ms: float = 30, ssid: str = "", assoc_delay_ms: float = 300, profiles=None, **extra):
+		state = {"latency_ms": latency_ms, "ssid": ssid, "assoc_delay_ms": assoc_delay_ms}
+		if profiles is not None:
+			state["profiles"] = list(profiles)
+		state.update(extra)
+		with open(self.state_path, "w", encoding="utf-8") as f:
+			json.dump(state, f)
+
+	def state(self) -> dict:
+		with open(self.state_path, "r", encoding="utf-8") as f:
+			return json.load(f)
+
+	def env(self, base: dict = None) -> dict:
+		env = dict(os.environ if base is None else base)
+		env["PATH"] = FAKES_DIR + os.pathsep + env.get("PATH", "")
+		env["OCOA_FAKE_NETSH_STATE"] = self.state_path
+		return env
+
+	def __enter__(self):
+		self._saved_env = {k: os.environ.get(k) for k in ("PATH", "OCOA_FAKE_NETSH_STATE")}
+		os.environ.update(self.env())
+		return self
+
+	def __exit__(self, *exc):
+		for key, value in self._saved_env.items():
+			if value is None:
+				os.environ.pop(key, None)
+			else:
+				os.environ[key] = value
+
+
+PORTAL_PAGE = """<html><head><meta charset="gbk"><title>校园网认证</title></head><body>
+<form action="/portal/auth" method="post">
+<input type="hidden" name="token" value="bench">
+<input name="DDDDD"><input type="password" name="upass">
+<input type="submit" name="0MKKey" value="登录">
+</form></body></html>""".encode("gbk")
+
+
+class StandinServer:
+	# 本地 HTTP 替身，路径决定行为：
+	#   /204              立即返回 204（门户模式且未认证时重定向到门户）
+	#   /slow/<ms>        延迟后按 /204 处理
+	#   /hang             不响应，直到服务器关闭
+	#   /ok               200 + “Microsoft Connect Test”
+	#   /redirect         始终重定向到门户
+	#   /portal/          登录页（GBK）；POST /portal/auth 用户名密码正确后视为已认证
+	# 门户地址使用 localhost 而探测地址使用 127.0.0.1，使重定向被判定为“跨主机”的门户劫持
+	# 模拟多台机器时，探测地址带 ?c=<客户端>、登录表单带同名字段 c，认证状态按客户端分别记录
+	# capacity 为每秒能处理的请求数，超出时返回 503 + Retry-After（模拟门户过载）
+	def __init__(self, captive: bool = False, username: str = "bench", password: str = "bench",
+			capacity: int = 0, retry_after: int = 2):
+		self.captive = captive
+		self.authenticated = False
+		self.clients = set()
+		self.username = username
+		self.password = password
+		self.capacity = capacity
+		self.retry_after = retry_after
+		self.requests = 0
+		self.connections = 0
+		self.rejected = 0
+		self.request_times = []
+		self._window = deque()
+		self._lock = threading.Lock()
+		self._closing = threading.Event()
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+		self._server.daemon_threads = True
+		self.port = self._server.server_address[1]
+		self._thread = threading.Thread(target=self._server.serve_forever, name="standin-http", daemon=True)
+
+	def start(self):
+		self._thread.start()
+		return self
+
+	def close(self):
+		self._closing.set()
+		self._server.shutdown()
+		self._server.server_close()
+
+	def reset(self, captive: bool = None):
+		if captive is not None:
+			self.captive = captive
+		self.authenticated = False
+		self.clients.clear()
+		self.requests = 0
+		self.connections = 0
+		self.rejected = 0
+		self.request_times = []
+		self._window.clear()
+
+	def peak_rps(self) -> int:
+		# 任一 1 秒滑动窗口内的最大请求数
+		times = sorted(self.request_times)
+		peak = 0
+		start = 0
+		for end, t in enumerate(times):
+			while t - times[start] >= 1.0:
+				start += 1
+			peak = max(peak, end - start + 1)
+		return peak
+
+	def _admit(self) -> bool:
+		now = time.monotonic()
+		with self._lock:
+			self.requests += 1
+			self.request_times.append(now)
+			if not self.capacity:
+				return True
+			while self._window and now - self._window[0] >= 1.0:
+				self._window.popleft()
+			if len(self._window) >= self.capacity:
+				self.rejected += 1
+				return False
+			self._window.append(now)
+			return True
+
+	def url(self, path: str) -> str:
+		return f"http://127.0.0.1:{self.port}{path}"
+
+	@property
+	def portal_url(self) -> str:
+		return f"http://localhost:{self.port}/portal/"
+
+	def _handler_class(self):
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+
+			def log_message(self, *args):
+				pass
+
+			def setup(self):
+				server.connections += 1
+				super().setup()
+
+			def _reply(self, status: int, body: bytes = b"", headers=None):
+				self.send_response(status)
+				for key, value in (headers or {}).items():
+					self.send_header(key, value)
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				if body:
+					self.wfile.write(body)
+
+			def _busy(self):
+				self._reply(503, b"busy", {"Retry-After": str(server.retry_after)})
+
+			def _probe(self):
+				client = parse_qs(self.path.partition("?")[2]).get("c")
+				authenticated = client[0] in server.clients if client else server.authenticated
+				if server.captive and not authenticated:
+					self._reply(302, headers={"Location": server.portal_url})
+				else:
+					self._reply(204)
+
+			def do_GET(self):
+				if not server._admit():
+					return self._busy()
+				path = self.path.split("?", 1)[0]
+				if path == "/204":
+					self._probe()
+				elif path.startswith("/slow/"):
+					time.sleep(int(path.rsplit("/", 1)[1]) / 1000)
+					self._probe()
+				elif path == "/hang":
+					server._closing.wait()
+				elif path == "/ok":
+					self._reply(200, b"Microsoft Connect Test", {"Content-Type": "text/plain"})
+				elif path == "/redirect":
+					self._reply(302, headers={"Location": server.portal_url})
+				elif path.startswith("/portal"):
+					self._reply(200, PORTAL_PAGE, {"Content-Type": "text/html", "Set-Cookie": "sid=bench; Path=/"})
+				else:
+					self._reply(404)
+
+			def do_POST(self):
+				length = int(self.headers.get("Content-Length") or 0)
+				form = parse_qs(self.rfile.read(length).decode("utf-8", errors="ignore"))
+				if not server._admit():
+					return self._busy()
+				ok = form.get("DDDDD") == [server.username] and form.get("upass") == [server.password]
+				if ok and form.get("c"):
+					server.clients.add(form["c"][0])
+				elif ok:
+					server.authenticated = True
+				body = ("认证成功" if ok else "账号或密码错误").encode("gbk")
+				self._reply(200, body, {"Content-Type": "text/html; charset=gbk"})
+
+		return Handler
@@ -0,0 +1,383 @@
+import io
+import sys
+import json
+import time
+import argparse
+import threading
+import logging
+
+from ocoa_core import (
+	PROBE_ONLINE, PROBE_CAPTIVE, MONITOR_CAPTIVE,
+	NetworkService, InstanceServer, FlowProfiler, DecorrelatedBackoff, tracer, setup_logging, configure_log_retention,
+	default_data_dir, send_instance_command, host_jitter
+)
+
+# 命令行 / 服务模式：复用 ocoa_core 的网络逻辑，不加载 tkinter，供计划任务、登录脚本与运维工具调用
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CAPTIVE = 3
+EXIT_OFFLINE = 4
+EXIT_NOT_CONNECTED = 5
+
+EXIT_CODES_HELP = """退出码：
+  0  成功 / 网络可用 / 已连接目标WiFi
+  1  执行失败（权限、配置缺失、指令返回异常等）
+  2  参数错误
+  3  网络需要认证（门户拦截）
+  4  网络不可用
+  5  未连接到目标WiFi"""
+
+# 已有实例（界面或 daemon）运行时转交给它执行的命令：共用其缓存，WLAN 指令由其串行执行
+FORWARDED_COMMANDS = ("status", "check", "connect", "disconnect", "auth", "history")
+
+
+def _emit(args, data: dict, text: str):
+	_print(args, json.dumps(data, ensure_ascii=False) if args.json else text)
+
+
+def _print(args, text: str):
+	# 转发来的命令输出写入 args.out，执行完后整体回传
+	print(text, file=args.out, flush=True)
+
+
+def cmd_status(net: NetworkService, args) -> int:
+	snap = net.get_interface()
+	target = net.preferred_ssid()
+	on_target = net.is_known_ssid(snap.ssid)
+	profile = net.profile_for(snap.ssid)
+	data = {
+		"ssid": snap.ssid,
+		"state": snap.state,
+		"bssid": snap.bssid,
+		"signal": snap.signal,
+		"channel": snap.channel,
+		"interfaces": [iface.as_dict() for iface in snap.interfaces],
+		"target_ssid": target,
+		"on_target": on_target,
+		"profile": profile.to_dict() if profile else None,
+		"session": net.sessions.describe(snap.ssid) if snap.ssid else None,
+		"access_points": [ap.as_dict() for ap in net.scanner.access_points(snap.ssid or target)] if snap.ssid or target else []
+	}
+	signal = f"，信号 {snap.signal}%" if snap.signal is not None else ""
+	if snap.channel is not None:
+		signal += f"，信道 {snap.channel}"
+	best = data["access_points"][0] if data["access_points"] else None
+	if best is not None and snap.ssid and best["bssid"] != (snap.bssid or "").lower():
+		signal += f"，可见接入点 {len(data['access_points'])} 个（最强 {best['bssid']} {best['signal']}%）"
+	expires_in = data["session"]["expires_in_s"] if data["session"] else None
+	if expires_in is not None and expires_in > 0:
+		signal += f"，认证预计 {expires_in // 60} 分钟后到期"
+	_emit(args, data, f"当前WiFi：{snap.ssid or '未连接'}{signal}，目标WiFi：{target or '未配置'}")
+	return EXIT_OK if on_target else EXIT_NOT_CONNECTED
+
+
+def _verdict_exit(verdict: str) -> int:
+	if verdict == PROBE_ONLINE:
+		return EXIT_OK
+	return EXIT_CAPTIVE if verdict == PROBE_CAPTIVE else EXIT_OFFLINE
+
+
+def cmd_check(net: NetworkService, args) -> int:
+	if args.adapters:
+		return _check_adapters(net, args)
+	result = net.probe(net.get_connected_ssid())
+	data = {
+		"verdict": result.verdict,
+		"url": result.url,
+		"status": result.status,
+		"location": result.location,
+		"elapsed_ms": round(result.elapsed * 1000)
+	}
+	_emit(args, data, f"网络状态：{result.verdict}（{data['elapsed_ms']} ms）")
+	return _verdict_exit(result.verdict)
+
+
+def _check_adapters(net: NetworkService, args) -> int:
+	# 每个网卡分别绑定地址探测；退出码取当前WiFi所在网卡的结论
+	adapters = net.probe_adapters()
+	ssid = net.get_connected_ssid()
+	if args.json:
+		_print(args, json.dumps({"ssid": ssid, "adapters": [a.as_dict() for a in adapters]}, ensure_ascii=False))
+	elif not adapters:
+		_print(args, "没有已获取地址的网卡")
+	for adapter in adapters if not args.json else ():
+		item = adapter.as_dict()
+		link = f"WiFi {adapter.ssid}" if adapter.ssid else ("无线（未连接）" if item["wireless"] else "有线")
+		_print(args, f"{adapter.name:<20} {adapter.address:<16} {link:<24} {item['verdict']}（{item['elapsed_ms']} ms）")
+	primary = next((a for a in adapters if ssid and a.ssid == ssid), None)
+	if primary is None:
+		return EXIT_NOT_CONNECTED
+	return _verdict_exit(primary.result.verdict)
+
+
+def cmd_connect(net: NetworkService, args) -> int:
+	ssid = (args.ssid or net.preferred_ssid()).strip()
+	if not ssid:
+		_emit(args, {"ok": False, "error": "未配置WiFi名称"}, "未配置WiFi名称，请使用 --ssid 或在设置中配置")
+		return EXIT_ERROR
+	if not net.connect_to_wifi(ssid):
+		_emit(args, {"ok": False, "ssid": ssid, "error": "连接指令失败"}, "指令发送失败，可能需要管理员或未创建配置文件")
+		return EXIT_ERROR
+	if args.no_wait:
+		_emit(args, {"ok": True, "ssid": ssid}, f"已发送连接指令：{ssid}")
+		return EXIT_OK
+	ready = net.create_readiness_waiter().wait(ssid)
+	data = {
+		"ok": ready.ready,
+		"ssid": ssid,
+		"associated_ms": None if ready.associated_after is None else round(ready.associated_after * 1000),
+		"ip_ms": None if ready.ip_after is None else round(ready.ip_after * 1000)
+	}
+	_emit(args, data, f"已连接：{ssid}" if ready.ready else f"未能在限定时间内连接到：{ssid}")
+	return EXIT_OK if ready.ready else EXIT_NOT_CONNECTED
+
+
+def cmd_disconnect(net: NetworkService, args) -> int:
+	try:
+		ssid, ok = net.disconnect_wifi()
+	except Exception as exc:
+		logging.getLogger(__name__).exception("断开WiFi时发生异常")
+		_emit(args, {"ok": False, "error": str(exc)}, "断开失败，请检查系统权限")
+		return EXIT_ERROR
+	_emit(args, {"ok": ok, "ssid": ssid}, f"已断开：{ssid or '当前WiFi'}" if ok else "断开失败，请重试或以管理员运行")
+	return EXIT_OK if ok else EXIT_ERROR
+
+
+def cmd_auth(net: NetworkService, args) -> int:
+	ssid = net.get_connected_ssid()
+	# 未配置认证地址时探测一次，从门户重定向中发现
+	url = (args.url or net.resolve_auth_url(ssid)).strip()
+	if not url:
+		_emit(args, {"ok": False, "error": "未配置认证URL"}, "未配置认证 URL 且未发现门户重定向，请使用 --url 或在设置中配置")
+		return EXIT_ERROR
+	credentials = net.credentials_for(ssid)
+	if net.portal_login.has_credentials(url, credentials):
+		result = net.portal_login.login(url, credentials)
+		if result.ok:
+			_emit(args, {"ok": True, "method": "headless", "round_trips": result.round_trips,
+				"elapsed_ms": round(result.elapsed * 1000)}, "认证成功，网络已可用")
+			return EXIT_OK
+		error = result.error
+	else:
+		error = "未配置门户账号"
+	if args.browser:
+		import webbrowser
+		with tracer.span("browser.open"):
+			webbrowser.open(url, new=2)
+		_emit(args, {"ok": False, "method": "browser", "error": error}, f"{error}，已打开认证页面：{url}")
+	else:
+		_emit(args, {"ok": False, "method": "headless", "error": error}, f"自动认证失败：{error}")
+	return EXIT_CAPTIVE
+
+
+def cmd_daemon(net: NetworkService, args) -> int:
+	# 常驻监测：状态变化逐行输出，需认证时自动登录门户，失败后按去相关抖动退避重试
+	backoff = DecorrelatedBackoff(10.0, 600.0)
+	retry_at = None
+	# 监测线程（进入 captive 时）与主线程（失败后重试）都会发起登录，同一时刻只允许一次，另一方直接跳过
+	login_lock = threading.Lock()
+
+	def auto_login(ssid: str):
+		nonlocal retry_at
+		if not login_lock.acquire(blocking=False):
+			return
+		try:
+			url = net.auth_url_for(ssid)
+			credentials = net.credentials_for(ssid)
+			if not (url and net.portal_login.has_credentials(url, credentials)):
+				return
+			result = net.portal_login.login(url, credentials)
+			if result.ok:
+				backoff.reset()
+				retry_at = None
+				_emit(args, {"event": "auth", "ok": True, "error": ""}, "自动认证成功")
+			else:
+				delay = backoff.next()
+				retry_at = time.monotonic() + delay
+				_emit(args, {"event": "auth", "ok": False, "error": result.error, "retry_in_s": round(delay, 1)},
+					f"自动认证失败：{result.error}，{delay:.0f} 秒后重试")
+			monitor.poke()
+		finally:
+			login_lock.release()
+
+	def on_transition(previous, current, ssid):
+		nonlocal retry_at
+		_emit(args, {"event": "transition", "from": previous, "to": current, "ssid": ssid, "time": time.time()},
+			f"{time.strftime('%H:%M:%S')} {previous} -> {current}（WiFi：{ssid or '未连接'}）")
+		retry_at = None
+		if current == MONITOR_CAPTIVE:
+			auto_login(ssid)
+
+	def handle(command: str, argv: list) -> dict:
+		if command == "ping":
+			return {"ok": True}
+		if command == "cli":
+			return run_forwarded(net, argv)
+		return {"ok": False, "error": "OCOA 正以后台服务模式（daemon）运行，请先停止后再打开界面"}
+
+	instance = InstanceServer(net.data_dir, handle, mode="daemon")
+	if not instance.start():
+		if send_instance_command(net.data_dir, "ping", timeout=2.0) is not None:
+			_emit(args, {"ok": False, "error": "already running"}, "已有 OCOA 实例在运行，未启动后台监测")
+			return EXIT_ERROR
+		logging.getLogger(__name__).warning("单实例端口被其他程序占用，本次不启用命令转发")
+	monitor = net.create_monitor(on_transition=on_transition)
+	# 已用 --jitter 错峰等待过时不再叠加 startup_jitter
+	delay = 0.0 if args.jitter else net.startup_delay()
+	if delay:
+		logging.getLogger(__name__).info(f"错峰启动：{delay:.1f} 秒后开始监测")
+	monitor.start(delay)
+	net.start_scanner()
+	try:
+		while True:
+			time.sleep(1)
+			# 认证失败后的重试在主线程进行，监测线程不被阻塞
+			if retry_at is not None and time.monotonic() >= retry_at:
+				retry_at = None
+				if monitor.state == MONITOR_CAPTIVE:
+					auto_login(monitor.ssid)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		monitor.stop()
+		instance.close()
+	return EXIT_OK
+
+
+def cmd_history(net: NetworkService, args) -> int:
+	if net.history is None:
+		_emit(args, {"ok": False, "error": "history disabled"}, "连通性历史未开启（history_enabled 为 false）")
+		return EXIT_ERROR
+	since = time.time() - args.days * 86400
+	rows = net.history.rollups(args.period, since)
+	if args.json:
+		_print(args, json.dumps({"period": args.period, "rollups": rows}, ensure_ascii=False))
+		return EXIT_OK
+	if not rows:
+		_print(args, "暂无记录")
+		return EXIT_OK
+	fmt = "%Y-%m-%d %H:00" if args.period == "hour" else "%Y-%m-%d"
+
+	def value(v, suffix=""):
+		return "-" if v is None else f"{v:g}{suffix}"
+	_print(args, f"{'时间':<16} {'可用率':>8} {'恢复P50':>8} {'恢复P95':>8} {'掉线':>4} {'门户':>4} {'连接':>6} {'认证':>6}")
+	for row in rows:
+		_print(
+			args,
+			f"{time.strftime(fmt, time.localtime(row['start'])):<16} {value(row['uptime_pct'], '%'):>8} "
+			f"{value(row['p50_tto_s'], 's'):>8} {value(row['p95_tto_s'], 's'):>8} {row['outages']:>4} {row['captive_kicks']:>4} "
+			f"{row['connects'] - row['connect_failures']:>3}/{row['connects']:<2} {row['auths'] - row['auth_failures']:>3}/{row['auths']:<2}"
+		)
+	return EXIT_OK
+
+
+def _add_common_options(parser, suppress: bool = False):
+	# 子命令上同样接受公共选项；其默认值需屏蔽，避免覆盖写在子命令前的同名选项
+	def default(value):
+		return argparse.SUPPRESS if suppress else value
+	parser.add_argument("--json", action="store_true", default=default(False), help="以 JSON 输出结果")
+	parser.add_argument("--data-dir", default=default(None), help="数据目录（默认为程序目录下的 data/）")
+	parser.add_argument("-v", "--verbose", action="store_true", default=default(False), help="在控制台输出运行日志")
+	parser.add_argument("--trace", action="store_true", default=default(False), help="记录各阶段耗时并写入 logs/metrics.json")
+	parser.add_argument("--profile", default=default(""), metavar="FILE", help="对本次命令做 cProfile 采样并写入 FILE")
+	parser.add_argument("--local", action="store_true", default=default(False), help="在本进程执行，不转交给已运行的实例")
+	parser.add_argument(
+		"--jitter", type=float, default=default(0.0), metavar="SECONDS",
+		help="错峰执行：先等待 0~SECONDS 秒内按主机名确定的时长（大量机器同时运行的登录脚本使用）"
+	)
+
+
+def build_parser() -> argparse.ArgumentParser:
+	common = argparse.ArgumentParser(add_help=False)
+	_add_common_options(common, suppress=True)
+
+	parser = argparse.ArgumentParser(
+		prog="OCOA", description="网络一键认证 - 命令行模式",
+		epilog=EXIT_CODES_HELP, formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	_add_common_options(parser)
+	sub = parser.add_subparsers(dest="command", required=True)
+	sub.add_parser("status", parents=[common], help="显示当前WiFi状态")
+	p = sub.add_parser("check", parents=[common], help="检测网络是否可用")
+	p.add_argument("--adapters", action="store_true", help="按网卡分别检测（多网卡时每条链路各自给出结论）")
+	p = sub.add_parser("connect", parents=[common], help="连接目标WiFi并等待就绪")
+	p.add_argument("--ssid", default="", help="要连接的WiFi（默认使用设置中的 SSID 或优先级最高的配置档）")
+	p.add_argument("--no-wait", action="store_true", help="发送指令后立即返回")
+	sub.add_parser("disconnect", parents=[common], help="断开当前WiFi")
+	p = sub.add_parser("auth", parents=[common], help="执行门户认证")
+	p.add_argument("--url", default="", help="认证 URL（默认依次使用当前WiFi配置档中的地址、设置中的认证 URL、自动发现的门户地址）")
+	p.add_argument("--browser", action="store_true", help="自动认证失败时打开浏览器")
+	sub.add_parser("daemon", parents=[common], help="常驻监测并自动重连 / 认证")
+	p = sub.add_parser("history", parents=[common], help="查看连通性历史汇总")
+	p.add_argument("--period", choices=("hour", "day"), default="day", help="按小时或按天汇总")
+	p.add_argument("--days", type=float, default=7, help="查看最近多少天（默认 7）")
+	return parser
+
+
+COMMANDS = {
+	"status": cmd_status,
+	"check": cmd_check,
+	"connect": cmd_connect,
+	"disconnect": cmd_disconnect,
+	"auth": cmd_auth,
+	"daemon": cmd_daemon,
+	"history": cmd_history
+}
+
+
+def run_forwarded(net: NetworkService, argv: list) -> dict:
+	# 在已运行的实例中执行转交来的命令（参数已由调用方校验），输出收集后整体回传
+	args = build_parser().parse_args(argv)
+	if args.command not in FORWARDED_COMMANDS:
+		return {"ok": False, "error": f"不支持转发的命令：{args.command}"}
+	args.out = io.StringIO()
+	try:
+		code = COMMANDS[args.command](net, args)
+	except Exception as exc:
+		logging.getLogger(__name__).exception(f"转发命令执行失败：{args.command}")
+		_emit(args, {"ok": False, "error": str(exc)}, f"命令执行失败：{exc}")
+		code = EXIT_ERROR
+	return {"ok": True, "exit": code, "output": args.out.getvalue()}
+
+
+def main(argv=None) -> int:
+	argv = list(sys.argv[1:] if argv is None else argv)
+	args = build_parser().parse_args(argv)
+	args.out = sys.stdout
+	if args.jitter > 0:
+		time.sleep(host_jitter(args.jitter))
+	if args.command in FORWARDED_COMMANDS and not (args.local or args.profile):
+		reply = send_instance_command(args.data_dir or default_data_dir(), "cli", argv)
+		if reply is not None:
+			if not reply.get("ok"):
+				_emit(args, {"ok": False, "error": reply.get("error")}, f"转发给运行中的实例失败：{reply.get('error')}")
+				return EXIT_ERROR
+			sys.stdout.write(reply.get("output") or "")
+			sys.stdout.flush()
+			return int(reply.get("exit", EXIT_ERROR))
+	net = NetworkService(args.data_dir)
+	setup_logging(net.logs_dir, console_level=logging.INFO if args.verbose else logging.WARNING)
+	configure_log_retention(net.settings)
+	if args.trace:
+		tracer.enabled = True
+	command = COMMANDS[args.command]
+	# 采样只覆盖命令所在线程；并发探测的工作线程不在统计内
+	profiler = FlowProfiler() if args.profile else None
+	if profiler is not None:
+		command = profiler.wrap(command)
+	try:
+		return command(net, args)
+	except Exception as exc:
+		logging.getLogger(__name__).exception(f"命令执行失败：{args.command}")
+		_emit(args, {"ok": False, "error": str(exc)}, f"命令执行失败：{exc}")
+		return EXIT_ERROR
+	finally:
+		if profiler is not None:
+			print(profiler.dump(args.profile), file=sys.stderr)
+		if net.shutdown():
+			print(f"阶段耗时已写入：{net.metrics_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
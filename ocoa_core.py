@@ -0,0 +1,3773 @@
+import os
+import json
+import codecs
+import re
+import bisect
+import time
+import threading
+import logging
+from collections import deque
+
+# 网络相关的无界面逻辑：GUI（OCOA.py）与命令行（ocoa_cli.py）共用，不得引入 tkinter
+# 只有部分命令用到的模块（socket、sqlite3、http.client、logging.handlers 等）在使用处导入，保持 import ocoa_core 的开销
+
+
+_ssl_context = None
+
+
+def shared_ssl_context():
+	# http.client / ssl 均延迟导入：加载系统证书较慢，仅在首次 HTTPS 请求时进行
+	global _ssl_context
+	if _ssl_context is None:
+		import ssl
+		_ssl_context = ssl.create_default_context()
+	return _ssl_context
+
+
+class _NullSpan:
+	# 追踪关闭时所有 span 共用此对象，开销仅为一次属性判断
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+	def set(self, **attrs):
+		pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+	__slots__ = ("tracer", "name", "attrs", "started", "duration", "error")
+
+	def __init__(self, tracer, name: str, attrs: dict):
+		self.tracer = tracer
+		self.name = name
+		self.attrs = attrs
+		self.started = 0.0
+		self.duration = 0.0
+		self.error = None
+
+	def __enter__(self):
+		self.started = time.perf_counter()
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.duration = time.perf_counter() - self.started
+		if exc_type is not None:
+			self.error = exc_type.__name__
+		self.tracer._finish(self)
+		return False
+
+	def set(self, **attrs):
+		self.attrs.update(attrs)
+
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收纳更慢的样本
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class PhaseHistogram:
+	__slots__ = ("bounds", "count", "errors", "total", "min", "max", "buckets")
+
+	def __init__(self, bounds_ms=LATENCY_BUCKETS_MS):
+		self.bounds = bounds_ms
+		self.count = 0
+		self.errors = 0
+		self.total = 0.0
+		self.min = None
+		self.max = 0.0
+		self.buckets = [0] * (len(bounds_ms) + 1)
+
+	def add(self, seconds: float, error: bool = False):
+		self.count += 1
+		self.errors += bool(error)
+		self.total += seconds
+		self.min = seconds if self.min is None else min(self.min, seconds)
+		self.max = max(self.max, seconds)
+		self.buckets[bisect.bisect_left(self.bounds, seconds * 1000)] += 1
+
+	def quantile(self, q: float) -> float:
+		# 以所在桶的上界估计分位数（秒），不超过实际最大值
+		if not self.count:
+			return 0.0
+		rank = q * self.count
+		seen = 0
+		for i, n in enumerate(self.buckets):
+			seen += n
+			if seen >= rank and n:
+				if i >= len(self.bounds):
+					return self.max
+				return min(self.max, self.bounds[i] / 1000)
+		return self.max
+
+	def to_state(self) -> list:
+		# 紧凑的持久化形式，可由 from_state 还原后继续累加
+		return [self.count, self.errors, round(self.total, 3), self.min, self.max, self.buckets]
+
+	@classmethod
+	def from_state(cls, state, bounds_ms=LATENCY_BUCKETS_MS):
+		hist = cls(bounds_ms)
+		if state and len(state) == 6 and len(state[5]) == len(hist.buckets):
+			hist.count, hist.errors, hist.total, hist.min, hist.max, hist.buckets = state
+		return hist
+
+	def as_dict(self) -> dict:
+		labels = [f"<={b}ms" for b in self.bounds] + [f">{self.bounds[-1]}ms"]
+		return {
+			"count": self.count,
+			"errors": self.errors,
+			"mean_ms": round(self.total * 1000 / self.count, 2) if self.count else 0.0,
+			"min_ms": round((self.min or 0.0) * 1000, 2),
+			"p50_ms": round(self.quantile(0.5) * 1000, 2),
+			"p95_ms": round(self.quantile(0.95) * 1000, 2),
+			"max_ms": round(self.max * 1000, 2),
+			"buckets": {label: n for label, n in zip(labels, self.buckets) if n}
+		}
+
+
+class Tracer:
+	# 轻量追踪：with tracer.span("netsh.connect"): ...，按阶段名汇总为延迟直方图，并保留最近的 span 明细
+	# 默认关闭；关闭时 span() 返回共享的空对象
+	def __init__(self, enabled: bool = False, recent: int = 200):
+		self.enabled = enabled
+		self.recent = deque(maxlen=recent)
+		self._phases = {}
+		self._lock = threading.Lock()
+
+	def span(self, name: str, **attrs):
+		if not self.enabled:
+			return _NULL_SPAN
+		return _Span(self, name, attrs)
+
+	def record(self, name: str, seconds: float, error: str = None, **attrs):
+		# 已在别处测得的耗时（如关联 / DHCP 阶段）直接计入
+		if not self.enabled:
+			return
+		span = _Span(self, name, attrs)
+		span.started = time.perf_counter() - seconds
+		span.duration = seconds
+		span.error = error
+		self._finish(span)
+
+	def _finish(self, span: _Span):
+		with self._lock:
+			hist = self._phases.get(span.name)
+			if hist is None:
+				hist = self._phases[span.name] = PhaseHistogram()
+			hist.add(span.duration, span.error is not None)
+			self.recent.append((time.time(), span.name, span.duration, span.error, span.attrs))
+
+	def phases(self) -> dict:
+		with self._lock:
+			return {name: hist.as_dict() for name, hist in sorted(self._phases.items())}
+
+	def recent_spans(self, limit: int = 50):
+		with self._lock:
+			items = list(self.recent)[-limit:]
+		return [
+			{"time": round(ts, 3), "phase": name, "ms": round(duration * 1000, 2), "error": error, **attrs}
+			for ts, name, duration, error, attrs in items
+		]
+
+	def reset(self):
+		with self._lock:
+			self._phases.clear()
+			self.recent.clear()
+
+	def dump(self, path: str) -> bool:
+		try:
+			atomic_write_json(path, {
+				"generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+				"phases": self.phases(),
+				"recent": self.recent_spans(self.recent.maxlen)
+			})
+			return True
+		except Exception:
+			logging.getLogger(__name__).exception("写入性能指标失败")
+			return False
+
+
+# 进程内共用的追踪器，由 GUI / 命令行按配置开启
+tracer = Tracer()
+
+
+class FlowProfiler:
+	# 对一次完整流程做 cProfile 采样：wrap() 包装的函数在任意线程中依次执行时累计到同一份统计
+	# cProfile 只统计当前线程，故各段串行执行（由锁保证）；仅在用户主动开启时使用
+	def __init__(self):
+		import cProfile
+		self.profile = cProfile.Profile()
+		self._lock = threading.Lock()
+		self.calls = 0
+
+	def wrap(self, fn):
+		def run(*args, **kwargs):
+			with self._lock:
+				self.calls += 1
+				self.profile.enable()
+				try:
+					return fn(*args, **kwargs)
+				finally:
+					self.profile.disable()
+		return run
+
+	def dump(self, path: str, top: int = 15) -> str:
+		# 写出 .prof 文件（可用 snakeviz 等工具查看），返回累计耗时最多的函数摘要
+		import io
+		import pstats
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self.profile.dump_stats(path)
+		out = io.StringIO()
+		pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(top)
+		return out.getvalue()
+
+
+# 连通性判定结果
+PROBE_ONLINE = "online"
+PROBE_CAPTIVE = "captive"
+PROBE_OFFLINE = "offline"
+
+# user_settings.json 中除 wifi_ssid / auth_url 外可选的高级配置项
+OPTIONAL_SETTINGS_KEYS = (
+	"probe_endpoints", "probe_timeout", "probe_deadline",
+	"monitor_enabled", "monitor_auto_reconnect", "monitor_tick_interval",
+	"monitor_probe_max_interval", "monitor_max_probes_per_hour", "monitor_wrong_ssid_retries",
+	"connect_ready_deadline", "ui_log_max_lines", "ui_log_store_size", "trace_enabled",
+	"history_enabled", "history_raw_days", "history_hourly_days", "history_daily_days",
+	"probe_dns_ttl", "probe_keepalive", "probe_https_delay", "session_renew_enabled",
+	"startup_jitter", "probe_rate_per_min", "probe_burst", "portal_rate_per_min", "portal_burst",
+	"log_keep_days", "log_max_mb", "scan_interval", "roam_enabled", "roam_signal_threshold", "roam_signal_margin",
+	"roam_cooldown"
+)
+
+# 默认公共探测地址，可在 user_settings.json 的 probe_endpoints 中追加内网探测
+DEFAULT_PROBE_ENDPOINTS = [
+	"https://www.gstatic.com/generate_204",
+	"http://www.msftconnecttest.com/connecttest.txt"
+]
+
+
+class ProbeEndpoint:
+	def __init__(self, url: str, timeout: float = 3.0, markers=("Microsoft", "Success")):
+		self.url = url
+		self.timeout = float(timeout)
+		self.markers = tuple(markers)
+
+	@classmethod
+	def from_config(cls, item, default_timeout: float = 3.0):
+		# 支持纯字符串或 {"url": ..., "timeout": ..., "markers": [...]} 两种写法
+		if isinstance(item, str):
+			return cls(item, default_timeout)
+		if isinstance(item, dict) and item.get("url"):
+			return cls(
+				item["url"],
+				item.get("timeout", default_timeout),
+				item.get("markers") or ("Microsoft", "Success")
+			)
+		return None
+
+
+class ProbeResult:
+	__slots__ = ("url", "verdict", "status", "location", "elapsed", "error", "portal_url")
+
+	def __init__(self, url, verdict=None, status=None, location="", elapsed=0.0, error=None):
+		self.url = url
+		self.verdict = verdict
+		self.status = status
+		self.location = location
+		self.elapsed = elapsed
+		self.error = error
+		# 被门户劫持时从重定向中解析出的认证页面地址
+		self.portal_url = ""
+
+	@property
+	def decisive(self) -> bool:
+		return self.verdict in (PROBE_ONLINE, PROBE_CAPTIVE)
+
+	def __repr__(self):
+		return f"ProbeResult({self.url!r}, {self.verdict}, status={self.status}, {self.elapsed * 1000:.0f}ms)"
+
+
+class _ProbeCall:
+	# 单次探测的取消句柄：关闭底层 socket 以打断阻塞中的 connect / TLS 握手 / recv
+	# socket 在 connect 之前就登记到 sock，连接尚未建立时也能取消；DNS 解析无法打断
+	def __init__(self):
+		self.conn = None
+		self.sock = None
+		self.cancelled = False
+
+	def cancel(self):
+		self.cancelled = True
+		conn = self.conn
+		for sock in (self.sock, getattr(conn, "sock", None)):
+			if sock is None:
+				continue
+			try:
+				sock.shutdown(2)
+			except Exception:
+				pass
+		if conn is not None:
+			try:
+				conn.close()
+			except Exception:
+				pass
+
+
+class DnsCache:
+	# getaddrinfo 结果缓存：系统解析器不返回 TTL，按固定时长缓存；解析失败不缓存
+	# 切换网络、门户登录后须 clear()，门户网络的 DNS 劫持结果不能带到认证后或下一个网络
+	def __init__(self, ttl: float = 60.0, clock=time.monotonic):
+		self.ttl = float(ttl)
+		self.clock = clock
+		self.hits = 0
+		self.misses = 0
+		self._entries = {}
+		self._lock = threading.Lock()
+
+	def peek(self, host: str, port: int):
+		with self._lock:
+			entry = self._entries.get((host, port))
+		if entry is not None and self.clock() < entry[0]:
+			return entry[1]
+		return None
+
+	def resolve(self, host: str, port: int) -> list:
+		addresses = self.peek(host, port) if self.ttl > 0 else None
+		if addresses is not None:
+			self.hits += 1
+			return addresses
+		self.misses += 1
+		import socket
+		infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+		addresses = [info[4][:2] for info in infos]
+		if self.ttl > 0:
+			with self._lock:
+				self._entries[(host, port)] = (self.clock() + self.ttl, addresses)
+		return addresses
+
+	def evict(self, host: str, port: int):
+		with self._lock:
+			self._entries.pop((host, port), None)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+
+class _ConnectionPool:
+	# 探测用的 keep-alive 连接：每个 (scheme, host, port) 最多保留一条空闲连接
+	# 空闲超过 max_idle 的连接不再复用，避免门户在已建立的连接上放行而误判为可用
+	def __init__(self, max_idle: float = 30.0, clock=time.monotonic):
+		self.max_idle = float(max_idle)
+		self.clock = clock
+		self.reused = 0
+		self.opened = 0
+		self._idle = {}
+		self._lock = threading.Lock()
+
+	def acquire(self, key):
+		with self._lock:
+			item = self._idle.pop(key, None)
+		if item is None:
+			return None
+		conn, released_at = item
+		if self.clock() - released_at > self.max_idle:
+			conn.close()
+			return None
+		self.reused += 1
+		return conn
+
+	def release(self, key, conn):
+		if self.max_idle <= 0:
+			conn.close()
+			return
+		with self._lock:
+			previous = self._idle.get(key)
+			self._idle[key] = (conn, self.clock())
+		if previous is not None:
+			previous[0].close()
+
+	def clear(self):
+		with self._lock:
+			items = list(self._idle.values())
+			self._idle.clear()
+		for conn, _ in items:
+			conn.close()
+
+
+class ProbeEngine:
+	# 分层探测：
+	# 1. 本机路由检查（不发包）：没有可用路由时直接判定不可用
+	# 2. 明文 HTTP 探测地址同时发起，第一个决定性结果（204 / 成功内容 / 门户重定向）即返回，其余取消
+	# 3. HTTPS 地址在 https_delay 后仍无结论（或明文探测都已失败）时才发起，省去多数情况下的 TLS 握手
+	# DNS 结果按 TTL 缓存，连接保持 keep-alive 供下一次探测复用；只读取响应头和有限长度的响应体
+	# source_address 指定本机地址时探测经该网卡发出（多网卡时分别判断每条链路），可在多个线程中同时调用
+	def __init__(self, endpoints=None, probe_timeout: float = 3.0, deadline: float = 4.0, max_workers: int = 8,
+			dns_ttl: float = 60.0, keepalive: float = 30.0, https_delay: float = 0.3):
+		self.endpoints = list(endpoints or [ProbeEndpoint(u, probe_timeout) for u in DEFAULT_PROBE_ENDPOINTS])
+		self.deadline = float(deadline)
+		self.https_delay = float(https_delay)
+		self.dns = DnsCache(dns_ttl)
+		self.pool = _ConnectionPool(keepalive)
+		self._max_workers = max_workers
+		self._executor = None
+		self._executor_lock = threading.Lock()
+
+	@classmethod
+	def from_settings(cls, settings: dict):
+		probe_timeout = float(settings.get("probe_timeout") or 3.0)
+		deadline = float(settings.get("probe_deadline") or probe_timeout + 1.0)
+		endpoints = []
+		for item in settings.get("probe_endpoints") or DEFAULT_PROBE_ENDPOINTS:
+			endpoint = ProbeEndpoint.from_config(item, probe_timeout)
+			if endpoint is not None:
+				endpoints.append(endpoint)
+		return cls(
+			endpoints, probe_timeout, deadline,
+			dns_ttl=float(settings.get("probe_dns_ttl", 60.0)),
+			keepalive=float(settings.get("probe_keepalive", 30.0)),
+			https_delay=float(settings.get("probe_https_delay", 0.3))
+		)
+
+	def reset_network(self):
+		# 网络切换后丢弃 DNS 缓存与空闲连接
+		self.dns.clear()
+		self.pool.clear()
+
+	def _get_executor(self):
+		with self._executor_lock:
+			if self._executor is None:
+				from concurrent.futures import ThreadPoolExecutor
+				self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="probe")
+			return self._executor
+
+	def run(self, endpoints=None, deadline=None, source_address: str = "") -> ProbeResult:
+		from urllib.parse import urlsplit
+		from concurrent.futures import wait, FIRST_COMPLETED
+		endpoints = list(endpoints or self.endpoints)
+		start = time.monotonic()
+		end = start + (self.deadline if deadline is None else float(deadline))
+		if not self._route_available(endpoints, source_address):
+			winner = ProbeResult("", PROBE_OFFLINE, elapsed=time.monotonic() - start, error=OSError("无可用路由"))
+			tracer.record("probe", winner.elapsed, verdict=winner.verdict, url="", tier="route")
+			logging.getLogger(__name__).debug(f"探测结论（无可用路由）：{winner}")
+			return winner
+		plain = [e for e in endpoints if urlsplit(e.url).scheme != "https"]
+		secure = [e for e in endpoints if urlsplit(e.url).scheme == "https"]
+		if not plain:
+			plain, secure = secure, []
+		https_at = start + self.https_delay
+		executor = self._get_executor()
+		calls = []
+		pending = set()
+
+		def launch(batch):
+			for endpoint in batch:
+				call = _ProbeCall()
+				calls.append(call)
+				pending.add(executor.submit(self._probe_once, endpoint, end, call, source_address))
+		launch(plain)
+		winner = None
+		try:
+			while winner is None:
+				now = time.monotonic()
+				if secure and (not pending or now >= https_at):
+					launch(secure)
+					secure = []
+				remaining = end - now
+				if not pending or remaining <= 0:
+					break
+				timeout = min(remaining, max(0.0, https_at - now)) if secure else remaining
+				done, not_done = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+				pending.intersection_update(not_done)
+				# 同一批完成的结果中优先采信“可用”
+				for fut in sorted(done, key=lambda f: f.result().verdict != PROBE_ONLINE):
+					result = fut.result()
+					if result.decisive:
+						winner = result
+						break
+		finally:
+			for call in calls:
+				call.cancel()
+			for fut in pending:
+				fut.cancel()
+		if winner is None:
+			winner = ProbeResult("", PROBE_OFFLINE, elapsed=time.monotonic() - start)
+		tracer.record("probe", time.monotonic() - start, verdict=winner.verdict, url=winner.url, source=source_address)
+		logging.getLogger(__name__).debug(f"探测结论：{winner}")
+		return winner
+
+	def shutdown(self):
+		if self._executor is not None:
+			self._executor.shutdown(wait=False)
+			self._executor = None
+		self.pool.clear()
+
+	def _route_available(self, endpoints, source_address: str = "") -> bool:
+		# 第一层：对已知地址（IP 字面量或 DNS 缓存命中）做 UDP connect 查询路由，不发包；指定网卡时先绑定其地址
+		# 全部地址都无路由时才判定不可用；地址未知时检查是否存在默认路由
+		import ipaddress
+		import socket
+		from urllib.parse import urlsplit
+		addresses = []
+		for endpoint in endpoints:
+			parts = urlsplit(endpoint.url)
+			host = parts.hostname or ""
+			port = parts.port or (443 if parts.scheme == "https" else 80)
+			try:
+				ipaddress.ip_address(host)
+				addresses.append((host, port))
+				continue
+			except ValueError:
+				pass
+			cached = self.dns.peek(host, port)
+			if cached is None:
+				addresses.append(("8.8.8.8", 53))
+			else:
+				addresses.extend(cached)
+		for address in dict.fromkeys(addresses):
+			family = socket.AF_INET6 if ":" in address[0] else socket.AF_INET
+			try:
+				with socket.socket(family, socket.SOCK_DGRAM) as sock:
+					if source_address:
+						sock.bind((source_address, 0))
+					sock.connect(address)
+				return True
+			except OSError:
+				continue
+		return not addresses
+
+	def _probe_once(self, endpoint: ProbeEndpoint, end: float, call: _ProbeCall, source_address: str = "") -> ProbeResult:
+		from urllib.parse import urlsplit
+		start = time.monotonic()
+		result = ProbeResult(endpoint.url)
+		try:
+			parts = urlsplit(endpoint.url)
+			timeout = max(0.05, min(endpoint.timeout, end - start))
+			path = parts.path or "/"
+			if parts.query:
+				path += "?" + parts.query
+			key = (parts.scheme, parts.hostname, parts.port, source_address)
+			conn = self.pool.acquire(key)
+			# 复用的连接可能已被服务器关闭，失败时用新连接重试一次
+			while True:
+				reused = conn is not None
+				if call.cancelled:
+					if reused:
+						conn.close()
+					return result
+				if not reused:
+					conn = self._new_connection(parts, timeout, source_address, call)
+				elif conn.sock is not None:
+					conn.sock.settimeout(timeout)
+				call.conn = conn
+				if call.cancelled:
+					conn.close()
+					return result
+				try:
+					status, location, body, reusable = self._request(conn, parts, path)
+					break
+				except Exception:
+					conn.close()
+					if not reused or call.cancelled:
+						raise
+					conn = None
+			result.status = status
+			result.location = location
+			result.verdict = self._classify(endpoint, parts.hostname, result.status, result.location, body)
+			if result.verdict == PROBE_CAPTIVE:
+				result.portal_url = find_portal_redirect(endpoint.url, result.location, body)
+			if result.verdict != PROBE_ONLINE:
+				# 门户网络常劫持 DNS：未确认可用的解析结果不缓存，认证后重新解析
+				self.dns.evict(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+			# 只复用判定为可用的连接：被门户劫持的连接认证后可能仍指向门户
+			call.conn = None
+			if reusable and result.verdict == PROBE_ONLINE and not call.cancelled:
+				self.pool.release(key, conn)
+			else:
+				conn.close()
+		except Exception as exc:
+			result.error = exc
+			if not call.cancelled:
+				logging.getLogger(__name__).warning(f"Probe failed: {endpoint.url}")
+		result.elapsed = time.monotonic() - start
+		# 被取消的（落败的）探测不计入统计
+		if not call.cancelled:
+			error = type(result.error).__name__ if result.error is not None else None
+			tracer.record("probe.endpoint", result.elapsed, error, url=endpoint.url, verdict=result.verdict)
+		return result
+
+	def _new_connection(self, parts, timeout: float, source_address: str = "", call: _ProbeCall = None):
+		import http.client
+		source = (source_address, 0) if source_address else None
+		if parts.scheme == "https":
+			conn = http.client.HTTPSConnection(
+				parts.hostname, parts.port, timeout=timeout, source_address=source, context=shared_ssl_context()
+			)
+		else:
+			conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout, source_address=source)
+		# 经 DNS 缓存建立 TCP 连接；追踪开启时拆分 DNS / TCP / TLS 各阶段耗时
+		connected_at = []
+
+		def create_connection(address, timeout=None, source_address=None):
+			return self._create_connection(address, timeout, source_address, connected_at, call)
+		conn._create_connection = create_connection
+		conn.connect()
+		self.pool.opened += 1
+		if parts.scheme == "https" and connected_at and tracer.enabled:
+			tracer.record("probe.tls", time.perf_counter() - connected_at[0], host=parts.hostname)
+		return conn
+
+	def _request(self, conn, parts, path: str):
+		# 只读取响应头与有限长度的响应体；响应体已读完且服务器未要求关闭时连接可复用
+		http_start = time.perf_counter()
+		headers = {"User-Agent": "Mozilla/5.0"}
+		if self.pool.max_idle <= 0:
+			headers["Connection"] = "close"
+		conn.request("GET", path, headers=headers)
+		resp = conn.getresponse()
+		if resp.status == 200:
+			# 门户页面的 meta refresh / JS 跳转一般在页面开头
+			body = resp.read(4096)
+		elif resp.length is not None and resp.length <= 1024:
+			body = resp.read()
+		else:
+			body = b""
+		if tracer.enabled:
+			tracer.record("probe.http", time.perf_counter() - http_start, host=parts.hostname, status=resp.status)
+		reusable = resp.isclosed() and not resp.will_close
+		return resp.status, resp.getheader("Location") or "", body, reusable
+
+	def _create_connection(self, address, timeout, source_address, connected_at: list, call: _ProbeCall = None):
+		host, port = address
+		with tracer.span("probe.dns", host=host):
+			addresses = self.dns.resolve(host, port)
+		import socket
+		with tracer.span("probe.tcp", host=host):
+			error = None
+			for sockaddr in addresses:
+				if source_address and (":" in sockaddr[0]) != (":" in source_address[0]):
+					# 绑定的网卡地址与目标地址族不同
+					continue
+				sock = socket.socket(socket.AF_INET6 if ":" in sockaddr[0] else socket.AF_INET, socket.SOCK_STREAM)
+				if call is not None:
+					call.sock = sock
+				try:
+					if call is not None and call.cancelled:
+						raise OSError("探测已取消")
+					sock.settimeout(timeout)
+					if source_address:
+						sock.bind(source_address)
+					sock.connect(sockaddr)
+				except OSError as exc:
+					sock.close()
+					if call is not None and call.cancelled:
+						# 被取消的连接与地址无关，不丢弃 DNS 缓存
+						raise
+					error = exc
+					continue
+				connected_at.append(time.perf_counter())
+				return sock
+			# 缓存的地址都连不上时丢弃，下次重新解析
+			self.dns.evict(host, port)
+			raise error or OSError(f"无法连接：{host}")
+
+	@staticmethod
+	def _classify(endpoint: ProbeEndpoint, host: str, status: int, location: str, body: bytes):
+		from urllib.parse import urlsplit
+		if status == 204:
+			return PROBE_ONLINE
+		if status in (301, 302, 303, 307, 308):
+			# 被重定向到其他主机，视为认证门户劫持
+			target_host = urlsplit(location).hostname if location else None
+			if target_host and target_host != host:
+				return PROBE_CAPTIVE
+			return None
+		if status == 200:
+			content = body.decode("utf-8", errors="ignore")
+			if any(m in content for m in endpoint.markers) or len(content) <= 64:
+				return PROBE_ONLINE
+			# 页面中有跳转到其他主机的 meta refresh / JS 跳转才视为门户拦截；
+			# 其他页面（CDN / 代理的错误页等）不作结论，由其余探测地址决定
+			target_host = urlsplit(find_portal_redirect(endpoint.url, "", body)).hostname
+			if target_host and target_host != host:
+				return PROBE_CAPTIVE
+			return None
+		return None
+
+
+# 门户页面中的跳转：<meta http-equiv="refresh" content="0;url=...">、location.href = "..."、location.replace("...")
+# 只在遇到门户页面时才编译（re 自带缓存），不计入启动时间
+_PORTAL_REDIRECT_PATTERNS = (
+	r"""<meta[^>]+http-equiv\s*=\s*["']?refresh["']?[^>]*content\s*=\s*["']?\s*\d*\s*;?\s*url\s*=\s*['"]?([^"'>\s]+)""",
+	r"""<meta[^>]+content\s*=\s*["']?\s*\d*\s*;?\s*url\s*=\s*['"]?([^"'>\s]+)[^>]*http-equiv\s*=\s*["']?refresh""",
+	r"""location(?:\.href)?\s*=\s*["']([^"']+)["']|location\.(?:replace|assign)\(\s*["']([^"']+)["']"""
+)
+
+
+def find_portal_redirect(base_url: str, location: str = "", body: bytes = b"") -> str:
+	# 依次取 Location 响应头、meta refresh、JS 跳转，相对地址按探测地址补全
+	from urllib.parse import urlsplit, urljoin
+	target = (location or "").strip()
+	if not target and body:
+		text = body.decode("latin-1")
+		for pattern in _PORTAL_REDIRECT_PATTERNS:
+			match = re.search(pattern, text, re.I)
+			if match:
+				target = next(g for g in match.groups() if g)
+				break
+	if not target:
+		return ""
+	target = urljoin(base_url, target.replace("&amp;", "&"))
+	return target if urlsplit(target).scheme in ("http", "https") else ""
+
+
+def decode_html(body: bytes, content_type: str = "") -> str:
+	# 门户页面常见 GBK 编码：依次尝试响应头、meta 声明、utf-8、gbk
+	match = re.search(r"charset=([\w-]+)", content_type or "", re.I)
+	if not match:
+		match = re.search(rb"<meta[^>]+charset=[\"']?([\w-]+)", body[:2048], re.I)
+	candidates = []
+	if match:
+		charset = match.group(1)
+		candidates.append(charset.decode("ascii", "ignore") if isinstance(charset, bytes) else charset)
+	candidates += ["utf-8", "gbk"]
+	for enc in candidates:
+		try:
+			return body.decode(enc)
+		except Exception:
+			pass
+	return body.decode("utf-8", errors="ignore")
+
+
+class HttpResponse:
+	__slots__ = ("status", "url", "headers", "body")
+
+	def __init__(self, status, url, headers, body):
+		self.status = status
+		self.url = url
+		self.headers = headers
+		self.body = body
+
+	@property
+	def text(self) -> str:
+		return decode_html(self.body, self.headers.get("Content-Type", ""))
+
+
+class HttpSession:
+	# 简易 keep-alive 会话：按 (scheme, host, port) 复用连接，处理 Cookie 与重定向
+	def __init__(self, timeout: float = 5.0, max_redirects: int = 5, user_agent: str = "Mozilla/5.0"):
+		self.timeout = timeout
+		self.max_redirects = max_redirects
+		self.user_agent = user_agent
+		self.cookies = {}
+		self.round_trips = 0
+		self._pool = {}
+		self._lock = threading.Lock()
+
+	def get(self, url: str, **kwargs) -> HttpResponse:
+		return self.request("GET", url, **kwargs)
+
+	def post(self, url: str, data=None, **kwargs) -> HttpResponse:
+		return self.request("POST", url, data=data, **kwargs)
+
+	def request(self, method: str, url: str, data=None, headers=None, follow_redirects: bool = True,
+			max_body: int = 1 << 20) -> HttpResponse:
+		from urllib.parse import urljoin, urlencode
+		body = None
+		extra = dict(headers or {})
+		if data is not None:
+			body = urlencode(data).encode("utf-8") if isinstance(data, dict) else data
+			extra.setdefault("Content-Type", "application/x-www-form-urlencoded")
+		for _ in range(self.max_redirects + 1):
+			resp = self._send(method, url, body, extra, max_body)
+			location = resp.headers.get("Location")
+			if not (follow_redirects and location and resp.status in (301, 302, 303, 307, 308)):
+				return resp
+			url = urljoin(url, location)
+			if resp.status in (301, 302, 303):
+				method, body = "GET", None
+				extra.pop("Content-Type", None)
+		return resp
+
+	def close(self):
+		with self._lock:
+			conns = [c for items in self._pool.values() for c in items]
+			self._pool.clear()
+		for conn in conns:
+			try:
+				conn.close()
+			except Exception:
+				pass
+
+	def _send(self, method, url, body, headers, max_body) -> HttpResponse:
+		from urllib.parse import urlsplit
+		import http.client
+		parts = urlsplit(url)
+		key = (parts.scheme, parts.hostname, parts.port)
+		path = parts.path or "/"
+		if parts.query:
+			path += "?" + parts.query
+		send_headers = {"User-Agent": self.user_agent, "Connection": "keep-alive"}
+		cookie = self._cookie_header(parts.hostname or "")
+		if cookie:
+			send_headers["Cookie"] = cookie
+		send_headers.update(headers)
+		# 复用的连接可能已被服务器关闭，失败时换新连接重试一次
+		for attempt in range(2):
+			conn, reused = self._acquire(key)
+			try:
+				conn.request(method, path, body=body, headers=send_headers)
+				resp = conn.getresponse()
+				payload = resp.read(max_body)
+			except (http.client.HTTPException, ConnectionError, BrokenPipeError):
+				conn.close()
+				if reused and attempt == 0:
+					continue
+				raise
+			except Exception:
+				conn.close()
+				raise
+			self.round_trips += 1
+			# 只有响应体已读完（含分块传输的结束块）的连接才放回池中，超出 max_body 未读的部分会污染下一次请求
+			if resp.isclosed() and not resp.will_close:
+				self._release(key, conn)
+			else:
+				conn.close()
+			self._store_cookies(parts.hostname or "", resp.headers.get_all("Set-Cookie") or [])
+			return HttpResponse(resp.status, url, resp.headers, payload)
+
+	def _acquire(self, key):
+		import http.client
+		with self._lock:
+			items = self._pool.get(key)
+			if items:
+				return items.pop(), True
+		scheme, host, port = key
+		if scheme == "https":
+			return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=shared_ssl_context()), False
+		return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+	def _release(self, key, conn):
+		with self._lock:
+			self._pool.setdefault(key, []).append(conn)
+
+	def _store_cookies(self, host: str, values):
+		import http.cookies
+		for value in values:
+			jar = http.cookies.SimpleCookie()
+			try:
+				jar.load(value)
+			except http.cookies.CookieError:
+				continue
+			for name, morsel in jar.items():
+				domain = (morsel["domain"] or host).lstrip(".").lower()
+				self.cookies.setdefault(domain, {})[name] = morsel.value
+
+	def _cookie_header(self, host: str) -> str:
+		host = host.lower()
+		pairs = []
+		for domain, items in self.cookies.items():
+			if host == domain or host.endswith("." + domain):
+				pairs.extend(f"{k}={v}" for k, v in items.items())
+		return "; ".join(pairs)
+
+
+_form_parser_class = None
+
+
+def parse_forms(html: str):
+	# 收集页面中的表单及其输入项；html.parser 仅在首次解析门户页面时导入
+	global _form_parser_class
+	if _form_parser_class is None:
+		from html.parser import HTMLParser
+
+		class _FormParser(HTMLParser):
+			def __init__(self):
+				super().__init__()
+				self.forms = []
+				self._current = None
+
+			def handle_starttag(self, tag, attrs):
+				attrs = dict(attrs)
+				if tag == "form":
+					self._current = {
+						"action": attrs.get("action") or "",
+						"method": (attrs.get("method") or "GET").upper(),
+						"inputs": []
+					}
+					self.forms.append(self._current)
+				elif tag == "input" and self._current is not None and attrs.get("name"):
+					self._current["inputs"].append((
+						attrs["name"], (attrs.get("type") or "text").lower(), attrs.get("value") or ""
+					))
+
+			def handle_endtag(self, tag):
+				if tag == "form":
+					self._current = None
+
+		_form_parser_class = _FormParser
+	parser = _form_parser_class()
+	parser.feed(html)
+	return parser.forms
+
+
+class PortalLoginResult:
+	__slots__ = ("ok", "url", "round_trips", "elapsed", "error")
+
+	def __init__(self, url: str):
+		self.ok = False
+		self.url = url
+		self.round_trips = 0
+		self.elapsed = 0.0
+		self.error = ""
+
+	def __repr__(self):
+		return f"PortalLoginResult(ok={self.ok}, round_trips={self.round_trips}, {self.elapsed * 1000:.0f}ms, error={self.error!r})"
+
+
+class PortalLoginEngine:
+	# 无浏览器认证：读取门户页面、按映射填写登录表单并提交，再用连通性探测确认结果
+	# 配置位于 data/portals.json：
+	# {
+	#   "credentials": {"default": {"username": "...", "password": "..."}},
+	#   "portals": {
+	#     "192.168.0.1": {
+	#       "credentials": "default",
+	#       "username_field": "DDDDD", "password_field": "upass",
+	#       "extra_fields": {"0MKKey": "123456"},
+	#       "submit_url": "", "method": "POST", "success_markers": ["登录成功"]
+	#     }
+	#   }
+	# }
+	# 门户按认证 URL 的 host[:port] 匹配，"*" 为缺省项；未填写字段名时自动识别含密码框的表单
+	# limiter（RequestLimiter）限制本机的登录频率；门户返回 429 / 503 时按 Retry-After 暂停
+	def __init__(self, config_path: str, verify=None, timeout: float = 5.0, on_result=None, limiter=None):
+		self.config_path = config_path
+		self.verify = verify
+		# on_result(result)：每次实际提交登录后回调（用于连通性历史）
+		self.on_result = on_result
+		self.limiter = limiter
+		self.timeout = timeout
+		self.session = HttpSession(timeout=timeout)
+		self._config = {}
+		self._config_mtime = None
+
+	def _load(self) -> dict:
+		try:
+			mtime = os.path.getmtime(self.config_path)
+		except OSError:
+			self._config, self._config_mtime = {}, None
+			return self._config
+		if mtime != self._config_mtime:
+			try:
+				with open(self.config_path, "r", encoding="utf-8") as f:
+					data = json.load(f)
+				self._config = data if isinstance(data, dict) else {}
+			except Exception:
+				logging.getLogger(__name__).exception("读取门户配置失败")
+				self._config = {}
+			self._config_mtime = mtime
+		return self._config
+
+	def portal_for(self, url: str, credentials_ref: str = None):
+		# credentials_ref 来自网络配置档，优先于门户映射中的 credentials
+		from urllib.parse import urlsplit
+		config = self._load()
+		portals = config.get("portals") or {}
+		parts = urlsplit(url)
+		host = (parts.hostname or "").lower()
+		mapping = portals.get(parts.netloc.lower()) or portals.get(host) or portals.get("*")
+		if not isinstance(mapping, dict):
+			return None, None
+		ref = credentials_ref or mapping.get("credentials") or "default"
+		credentials = (config.get("credentials") or {}).get(ref)
+		if not isinstance(credentials, dict) or not credentials.get("username"):
+			return mapping, None
+		return mapping, credentials
+
+	def has_credentials(self, url: str, credentials_ref: str = None) -> bool:
+		return self.portal_for(url, credentials_ref)[1] is not None
+
+	def login(self, url: str, credentials_ref: str = None) -> PortalLoginResult:
+		from urllib.parse import urlencode
+		result = PortalLoginResult(url)
+		start = time.monotonic()
+		trips_before = self.session.round_trips
+		try:
+			mapping, credentials = self.portal_for(url, credentials_ref)
+			if credentials is None:
+				result.error = "未配置门户账号"
+				return result
+			if self.limiter:
+				self.limiter.acquire("portal")
+			submit_url, method, fields = self._build_submission(url, mapping, credentials)
+			if method == "GET":
+				sep = "&" if "?" in submit_url else "?"
+				resp = self.fetch(submit_url + sep + urlencode(fields))
+			else:
+				resp = self.fetch(submit_url, "POST", fields)
+			markers = mapping.get("success_markers") or []
+			if markers and not any(m in resp.text for m in markers):
+				logging.getLogger(__name__).warning(f"门户响应中未发现成功标识（HTTP {resp.status}）")
+			result.ok = self.verify() if self.verify else resp.status < 400
+			if not result.ok:
+				result.error = f"提交后网络仍不可用（HTTP {resp.status}）"
+		except Exception as exc:
+			result.error = str(exc) or exc.__class__.__name__
+			logging.getLogger(__name__).warning(f"门户自动登录失败：{result.error}")
+		finally:
+			result.round_trips = self.session.round_trips - trips_before
+			result.elapsed = time.monotonic() - start
+		tracer.record("portal.login", result.elapsed, None if result.ok else "failed", round_trips=result.round_trips)
+		logging.getLogger(__name__).info(f"门户自动登录：{result}")
+		if self.on_result:
+			self.on_result(result)
+		return result
+
+	def fetch(self, url: str, method: str = "GET", data=None) -> HttpResponse:
+		# 门户请求：过载（429 / 503）时按 Retry-After 让本机暂停门户请求，并作为失败抛出
+		resp = self.session.request(method, url, data=data)
+		if resp.status in (429, 503):
+			if self.limiter:
+				self.limiter.defer("portal", parse_retry_after(resp.headers.get("Retry-After")))
+			raise RuntimeError(f"门户繁忙（HTTP {resp.status}）")
+		return resp
+
+	def _build_submission(self, url: str, mapping: dict, credentials: dict):
+		from urllib.parse import urljoin
+		user_field = mapping.get("username_field")
+		pass_field = mapping.get("password_field")
+		fields = {}
+		submit_url = mapping.get("submit_url") or ""
+		method = (mapping.get("method") or "POST").upper()
+		# 指定了提交地址与字段名时直接提交（单次往返），否则先取页面解析表单
+		if not (submit_url and user_field and pass_field):
+			page = self.fetch(url)
+			form = self._pick_form(parse_forms(page.text))
+			if form is None:
+				raise ValueError("认证页面中未找到登录表单")
+			for name, kind, value in form["inputs"]:
+				if kind not in ("submit", "button", "image", "checkbox", "radio") and name not in fields:
+					fields[name] = value
+				if not pass_field and kind == "password":
+					pass_field = name
+				if not user_field and kind in ("text", "email", "tel", "number"):
+					user_field = name
+			if not submit_url:
+				submit_url = urljoin(page.url, form["action"] or page.url)
+				method = (mapping.get("method") or form["method"]).upper()
+		if not (user_field and pass_field):
+			raise ValueError("无法识别用户名或密码输入框")
+		fields[user_field] = credentials.get("username", "")
+		fields[pass_field] = credentials.get("password", "")
+		fields.update(mapping.get("extra_fields") or {})
+		return urljoin(url, submit_url), method, fields
+
+	@staticmethod
+	def _pick_form(forms):
+		for form in forms:
+			if any(kind == "password" for _, kind, _ in form["inputs"]):
+				return form
+		return forms[0] if forms else None
+
+
+_console_encoding = None
+
+
+def console_encoding() -> str:
+	# netsh 按控制台代码页输出（简体中文系统为 cp936）；只检测一次并缓存，不再逐次尝试多种编码
+	global _console_encoding
+	if _console_encoding is None:
+		encoding = ""
+		if os.name == "nt":
+			try:
+				import ctypes
+				kernel32 = ctypes.windll.kernel32
+				# 无控制台（pythonw 启动）时子进程使用 OEM 代码页
+				codepage = kernel32.GetConsoleOutputCP() or kernel32.GetOEMCP()
+				encoding = "utf-8" if codepage == 65001 else f"cp{codepage}"
+			except Exception:
+				logging.getLogger(__name__).debug("无法读取控制台代码页", exc_info=True)
+		if not encoding:
+			import locale
+			encoding = locale.getpreferredencoding(False) or "utf-8"
+		try:
+			encoding = codecs.lookup(encoding).name
+		except LookupError:
+			encoding = "utf-8"
+		_console_encoding = encoding
+	return _console_encoding
+
+
+def decode_best_effort(data: bytes) -> str:
+	# 优先使用缓存的代码页；解码失败时再回退，并记住实际可用的编码
+	global _console_encoding
+	encoding = console_encoding()
+	try:
+		return data.decode(encoding)
+	except UnicodeDecodeError:
+		pass
+	for fallback in ("utf-8", "gbk"):
+		if fallback == encoding:
+			continue
+		try:
+			text = data.decode(fallback)
+		except UnicodeDecodeError:
+			continue
+		logging.getLogger(__name__).info(f"netsh 输出编码与控制台代码页不符，改用 {fallback}")
+		_console_encoding = fallback
+		return text
+	return data.decode(encoding, errors="replace")
+
+
+def _netsh_int(value: str):
+	try:
+		return int(value.rstrip("%").strip())
+	except ValueError:
+		return None
+
+
+def _netsh_float(value: str):
+	try:
+		return float(value)
+	except ValueError:
+		return None
+
+
+def _netsh_rates(value: str):
+	return tuple(r for r in (_netsh_float(v) for v in value.split()) if r is not None)
+
+
+class _NetshRecord:
+	# netsh 输出的类型化记录：_FIELDS 为属性名，_CONVERTERS 指定数值字段的转换
+	__slots__ = ()
+	_FIELDS = ()
+	_CONVERTERS = {}
+
+	def __init__(self, **values):
+		for field in self._FIELDS:
+			setattr(self, field, values.get(field))
+
+	def set_field(self, field: str, value: str):
+		convert = self._CONVERTERS.get(field)
+		setattr(self, field, convert(value) if convert else value)
+
+	def as_dict(self) -> dict:
+		return {field: getattr(self, field) for field in self._FIELDS}
+
+	def __repr__(self):
+		shown = ", ".join(f"{f}={getattr(self, f)!r}" for f in self._FIELDS[:4])
+		return f"{type(self).__name__}({shown})"
+
+
+class WlanInterface(_NetshRecord):
+	__slots__ = _FIELDS = (
+		"name", "description", "guid", "mac", "interface_type", "state", "ssid", "bssid", "band",
+		"network_type", "radio_type", "authentication", "cipher", "connection_mode",
+		"channel", "receive_rate", "transmit_rate", "signal", "profile"
+	)
+	_CONVERTERS = {"channel": _netsh_int, "signal": _netsh_int, "receive_rate": _netsh_float, "transmit_rate": _netsh_float}
+
+	@property
+	def connected(self) -> bool:
+		return bool(self.ssid) and (self.state or "").lower() in ("connected", "已连接")
+
+
+class WlanBssid(_NetshRecord):
+	__slots__ = _FIELDS = ("bssid", "signal", "radio_type", "band", "channel", "basic_rates", "other_rates")
+	_CONVERTERS = {"channel": _netsh_int, "signal": _netsh_int, "basic_rates": _netsh_rates, "other_rates": _netsh_rates}
+
+
+class WlanNetwork(_NetshRecord):
+	__slots__ = _FIELDS = ("interface", "ssid", "network_type", "authentication", "encryption", "bssids")
+
+	def __init__(self, **values):
+		super().__init__(**values)
+		self.bssids = list(self.bssids or [])
+
+	@property
+	def best(self):
+		# 信号最强的接入点
+		return max(self.bssids, key=lambda b: b.signal or 0, default=None)
+
+	def as_dict(self) -> dict:
+		data = super().as_dict()
+		data["bssids"] = [b.as_dict() for b in self.bssids]
+		return data
+
+
+# 字段名去除空白并转小写后查表，同时覆盖英文与简体中文输出（含 Windows 11 新增字段）
+_INTERFACE_KEYS = {
+	"name": "name", "名称": "name",
+	"description": "description", "描述": "description",
+	"guid": "guid",
+	"physicaladdress": "mac", "物理地址": "mac",
+	"interfacetype": "interface_type", "接口类型": "interface_type",
+	"state": "state", "状态": "state",
+	"ssid": "ssid",
+	"bssid": "bssid", "apbssid": "bssid",
+	"band": "band", "频带": "band", "频段": "band",
+	"networktype": "network_type", "网络类型": "network_type",
+	"radiotype": "radio_type", "无线电类型": "radio_type",
+	"authentication": "authentication", "身份验证": "authentication",
+	"cipher": "cipher", "密码": "cipher",
+	"connectionmode": "connection_mode", "连接模式": "connection_mode",
+	"channel": "channel", "信道": "channel",
+	"receiverate(mbps)": "receive_rate", "接收速率(mbps)": "receive_rate",
+	"transmitrate(mbps)": "transmit_rate", "传输速率(mbps)": "transmit_rate",
+	"signal": "signal", "信号": "signal",
+	"profile": "profile", "配置文件": "profile"
+}
+
+_NETWORK_KEYS = {
+	"networktype": "network_type", "网络类型": "network_type",
+	"authentication": "authentication", "身份验证": "authentication",
+	"encryption": "encryption", "加密": "encryption"
+}
+
+_BSSID_KEYS = {
+	"signal": "signal", "信号": "signal",
+	"radiotype": "radio_type", "无线电类型": "radio_type",
+	"band": "band", "频带": "band", "频段": "band",
+	"channel": "channel", "信道": "channel",
+	"basicrates(mbps)": "basic_rates", "基本速率(mbps)": "basic_rates",
+	"otherrates(mbps)": "other_rates", "其他速率(mbps)": "other_rates"
+}
+
+_INTERFACE_NAME_KEYS = ("interfacename", "接口名称")
+_NETSH_HEADER_RE = re.compile(r"^(SSID|BSSID)\s+\d+$", re.I)
+
+
+_netsh_key_cache = {}
+
+
+def _split_netsh_line(line: str):
+	# 返回 (原始字段名, 规范化字段名, 值)；字段名（含对齐空白）反复出现，规范化结果做缓存
+	key, sep, value = line.partition(":")
+	if not sep:
+		return None, None, None
+	normalized = _netsh_key_cache.get(key)
+	if normalized is None:
+		if len(_netsh_key_cache) > 1024:
+			_netsh_key_cache.clear()
+		normalized = _netsh_key_cache[key] = "".join(key.split()).lower()
+	return key, normalized, value.strip()
+
+
+def parse_interfaces(output: str):
+	# 单次遍历 netsh wlan show interfaces 的输出，按“名称”行切分出每个无线网卡
+	interfaces = []
+	current = None
+	for line in output.splitlines():
+		_, key, value = _split_netsh_line(line)
+		field = _INTERFACE_KEYS.get(key)
+		if field is None:
+			continue
+		if field == "name" or current is None:
+			current = WlanInterface()
+			interfaces.append(current)
+		current.set_field(field, value)
+	return interfaces
+
+
+def parse_networks(output: str):
+	# 单次遍历 netsh wlan show networks mode=bssid 的输出；多个网卡时按“接口名称”分段
+	networks = []
+	interface = ""
+	network = bssid = None
+	for line in output.splitlines():
+		raw_key, key, value = _split_netsh_line(line)
+		if key is None:
+			continue
+		if key in _INTERFACE_NAME_KEYS:
+			interface = value
+			network = bssid = None
+			continue
+		header = _NETSH_HEADER_RE.match(raw_key.strip())
+		if header:
+			if header.group(1).upper() == "SSID":
+				network = WlanNetwork(interface=interface, ssid=value)
+				networks.append(network)
+				bssid = None
+			elif network is not None:
+				bssid = WlanBssid(bssid=value)
+				network.bssids.append(bssid)
+			continue
+		if bssid is not None:
+			field = _BSSID_KEYS.get(key)
+			if field is not None:
+				bssid.set_field(field, value)
+				continue
+		if network is not None:
+			field = _NETWORK_KEYS.get(key)
+			if field is not None:
+				network.set_field(field, value)
+	return networks
+
+
+class IpInterface(_NetshRecord):
+	# netsh interface ipv4 show addresses 中的一个网络接口（有线 / 无线 / 回环）
+	__slots__ = _FIELDS = ("name", "dhcp", "addresses", "gateway", "metric")
+	_CONVERTERS = {"metric": _netsh_int}
+
+	def __init__(self, **values):
+		super().__init__(**values)
+		self.addresses = list(self.addresses or [])
+
+	def set_field(self, field: str, value: str):
+		if field == "addresses":
+			self.addresses.append(value)
+		else:
+			super().set_field(field, value)
+
+	@property
+	def usable_address(self) -> str:
+		# 排除 DHCP 未完成时的 169.254.x.x
+		import ipaddress
+		for address in self.addresses:
+			try:
+				ip = ipaddress.ip_address(address)
+			except ValueError:
+				continue
+			if not (ip.is_link_local or ip.is_unspecified):
+				return address
+		return ""
+
+
+_IP_INTERFACE_KEYS = {
+	"dhcpenabled": "dhcp", "dhcp已启用": "dhcp",
+	"ipaddress": "addresses", "ip地址": "addresses",
+	"defaultgateway": "gateway", "默认网关": "gateway",
+	"interfacemetric": "metric"
+}
+_IP_INTERFACE_HEADER_RE = re.compile(r"^\S.*?\"(.+)\"")
+
+
+def parse_ip_interfaces(output: str):
+	# 按“Configuration for interface "名称"” / “接口 "名称" 的配置”切分
+	interfaces = []
+	current = None
+	for line in output.splitlines():
+		header = _IP_INTERFACE_HEADER_RE.match(line)
+		if header:
+			current = IpInterface(name=header.group(1))
+			interfaces.append(current)
+			continue
+		if current is None:
+			continue
+		_, key, value = _split_netsh_line(line)
+		field = _IP_INTERFACE_KEYS.get(key)
+		if field is not None and value:
+			current.set_field(field, value)
+	return interfaces
+
+
+class InterfaceSnapshot:
+	# 一次 netsh 调用得到的全部无线网卡；ssid / state 等属性取自当前使用的网卡
+	__slots__ = ("interfaces", "fetched_at")
+
+	def __init__(self, interfaces=None, fetched_at: float = 0.0):
+		self.interfaces = list(interfaces or [])
+		self.fetched_at = fetched_at
+
+	@property
+	def primary(self):
+		for iface in self.interfaces:
+			if iface.connected:
+				return iface
+		for iface in self.interfaces:
+			if iface.ssid:
+				return iface
+		return self.interfaces[0] if self.interfaces else None
+
+	def find(self, name: str):
+		for iface in self.interfaces:
+			if iface.name == name:
+				return iface
+		return None
+
+	def _primary_field(self, field: str, default=None):
+		iface = self.primary
+		value = getattr(iface, field) if iface is not None else None
+		return default if value is None else value
+
+	@property
+	def ssid(self) -> str:
+		return self._primary_field("ssid", "")
+
+	@property
+	def state(self) -> str:
+		return self._primary_field("state", "")
+
+	@property
+	def bssid(self) -> str:
+		return self._primary_field("bssid", "")
+
+	@property
+	def signal(self):
+		return self._primary_field("signal")
+
+	@property
+	def channel(self):
+		return self._primary_field("channel")
+
+	def __repr__(self):
+		return f"InterfaceSnapshot(ssid={self.ssid!r}, state={self.state!r}, bssid={self.bssid!r}, signal={self.signal}, interfaces={len(self.interfaces)})"
+
+
+def parse_interface_snapshot(output: str) -> InterfaceSnapshot:
+	return InterfaceSnapshot(parse_interfaces(output), time.monotonic())
+
+
+def run_netsh(*args, timeout: float = 6, context: str = "wlan") -> str:
+	import subprocess
+	with tracer.span("netsh." + "_".join(args[:2])):
+		res = subprocess.run(["netsh", context, *args], capture_output=True, text=False, timeout=timeout)
+	return decode_best_effort(res.stdout or b"")
+
+
+_wlan_api = None
+
+
+def _load_wlan_api():
+	# wlanapi.dll 与所需结构体在首次按 BSSID 连接时才加载；非 Windows 上不可用，返回 None
+	global _wlan_api
+	if _wlan_api is None:
+		import ctypes
+		import types
+		try:
+			dll = ctypes.WinDLL("wlanapi.dll")
+		except (AttributeError, OSError):
+			_wlan_api = False
+			return None
+		from ctypes import wintypes
+
+		class Guid(ctypes.Structure):
+			_fields_ = [("data", ctypes.c_ubyte * 16)]
+
+		class BssidList(ctypes.Structure):
+			# DOT11_BSSID_LIST，只含一个接入点
+			_fields_ = [
+				("header_type", ctypes.c_ubyte), ("header_revision", ctypes.c_ubyte), ("header_size", ctypes.c_ushort),
+				("count", ctypes.c_ulong), ("total", ctypes.c_ulong), ("bssid", ctypes.c_ubyte * 6)
+			]
+
+		class ConnectionParameters(ctypes.Structure):
+			# WLAN_CONNECTION_PARAMETERS
+			_fields_ = [
+				("mode", ctypes.c_int), ("profile", ctypes.c_wchar_p), ("ssid", ctypes.c_void_p),
+				("bssids", ctypes.POINTER(BssidList)), ("bss_type", ctypes.c_int), ("flags", wintypes.DWORD)
+			]
+
+		dll.WlanOpenHandle.argtypes = [wintypes.DWORD, ctypes.c_void_p, ctypes.POINTER(wintypes.DWORD), ctypes.POINTER(wintypes.HANDLE)]
+		dll.WlanOpenHandle.restype = wintypes.DWORD
+		dll.WlanConnect.argtypes = [wintypes.HANDLE, ctypes.POINTER(Guid), ctypes.POINTER(ConnectionParameters), ctypes.c_void_p]
+		dll.WlanConnect.restype = wintypes.DWORD
+		dll.WlanCloseHandle.argtypes = [wintypes.HANDLE, ctypes.c_void_p]
+		dll.WlanCloseHandle.restype = wintypes.DWORD
+		_wlan_api = types.SimpleNamespace(
+			ctypes=ctypes, wintypes=wintypes, dll=dll, Guid=Guid, BssidList=BssidList, ConnectionParameters=ConnectionParameters
+		)
+	return _wlan_api or None
+
+
+def wlan_connect_bssid(interface_guid: str, profile: str, bssid: str) -> bool:
+	# netsh wlan connect 无法指定接入点：改用 WlanConnect 按配置文件连接，并把期望的接入点限定为 bssid
+	# 与 netsh 相同，返回 True 只表示指令已受理，关联在后台完成；WLAN API 不可用或调用失败时返回 False
+	import uuid
+	api = _load_wlan_api()
+	if api is None:
+		return False
+	try:
+		guid = api.Guid.from_buffer_copy(uuid.UUID(interface_guid).bytes_le)
+		mac = bytes.fromhex(bssid.replace(":", "").replace("-", ""))
+	except (ValueError, TypeError, AttributeError):
+		return False
+	if len(mac) != 6:
+		return False
+	ctypes = api.ctypes
+	# NDIS_OBJECT_TYPE_DEFAULT / DOT11_BSSID_LIST_REVISION_1
+	bssids = api.BssidList(0x80, 1, ctypes.sizeof(api.BssidList), 1, 1, (ctypes.c_ubyte * 6)(*mac))
+	# wlan_connection_mode_profile / dot11_BSS_type_infrastructure
+	params = api.ConnectionParameters(0, profile, None, ctypes.pointer(bssids), 1, 0)
+	handle = api.wintypes.HANDLE()
+	negotiated = api.wintypes.DWORD()
+	if api.dll.WlanOpenHandle(2, None, ctypes.byref(negotiated), ctypes.byref(handle)) != 0:
+		return False
+	try:
+		error = api.dll.WlanConnect(handle, ctypes.byref(guid), ctypes.byref(params), None)
+	finally:
+		api.dll.WlanCloseHandle(handle, None)
+	if error != 0:
+		logging.getLogger(__name__).warning(f"按接入点连接失败（WlanConnect 错误码 {error}）")
+	return error == 0
+
+
+def query_interface_snapshot() -> InterfaceSnapshot:
+	try:
+		return parse_interface_snapshot(run_netsh("show", "interfaces"))
+	except Exception:
+		logging.getLogger(__name__).exception("Failed to get connected SSID")
+		return InterfaceSnapshot(fetched_at=time.monotonic())
+
+
+def query_ip_interfaces():
+	# 各网络接口的 IPv4 地址与网关，用于把探测绑定到指定网卡
+	try:
+		return parse_ip_interfaces(run_netsh("ipv4", "show", "addresses", context="interface"))
+	except Exception:
+		logging.getLogger(__name__).exception("查询网卡地址失败")
+		return []
+
+
+def query_visible_networks(interface: str = ""):
+	# 扫描可见网络及其各接入点（BSSID、信号、信道）
+	args = ["show", "networks", "mode=bssid"]
+	if interface:
+		args.append(f"interface={interface}")
+	try:
+		return parse_networks(run_netsh(*args, timeout=10))
+	except Exception:
+		logging.getLogger(__name__).exception("扫描可见网络失败")
+		return []
+
+
+def band_of(channel, band: str = "") -> str:
+	# 较早的 Windows 不输出“波段”，按信道推断（1~14 为 2.4 GHz）
+	if band:
+		return band
+	if channel is None:
+		return ""
+	return "2.4 GHz" if channel <= 14 else "5 GHz"
+
+
+class ScannedAp(_NetshRecord):
+	# 扫描表中的一个接入点
+	__slots__ = _FIELDS = ("ssid", "bssid", "signal", "channel", "band", "radio_type", "interface")
+
+
+class BssidScanCache:
+	# 可见接入点表：解析 netsh wlan show networks mode=bssid，按 SSID（信号由强到弱）与 BSSID 建立索引
+	# get / best 在 max_age 内复用上次扫描；start() 后台每 interval 秒刷新一次，poke() 可提前刷新（间隔不小于 min_interval），
+	# 每次后台刷新后调用 on_scan（用于漫游判断）
+	def __init__(self, fetch=query_visible_networks, interval: float = 60.0, min_interval: float = 10.0,
+			on_scan=None, clock=time.monotonic):
+		self.fetch = fetch
+		self.interval = float(interval)
+		self.min_interval = float(min_interval)
+		self.on_scan = on_scan
+		self.clock = clock
+		self.scans = 0
+		self.fetched_at = None
+		self._by_ssid = {}
+		self._by_bssid = {}
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._wake = threading.Event()
+		self._thread = None
+
+	def refresh(self):
+		networks = self.fetch()
+		by_ssid = {}
+		by_bssid = {}
+		for network in networks:
+			for bss in network.bssids:
+				key = (bss.bssid or "").lower()
+				if not key:
+					continue
+				ap = ScannedAp(
+					ssid=network.ssid or "", bssid=key, signal=bss.signal, channel=bss.channel,
+					band=band_of(bss.channel, bss.band or ""), radio_type=bss.radio_type, interface=network.interface
+				)
+				# 多个网卡都能看到同一接入点时保留信号较强的一条
+				seen = by_bssid.get(key)
+				if seen is not None and (seen.signal or 0) >= (ap.signal or 0):
+					continue
+				by_bssid[key] = ap
+		for ap in by_bssid.values():
+			by_ssid.setdefault(ap.ssid, []).append(ap)
+		for aps in by_ssid.values():
+			aps.sort(key=lambda a: -(a.signal or 0))
+		with self._lock:
+			self._by_ssid = by_ssid
+			self._by_bssid = by_bssid
+			self.fetched_at = self.clock()
+			self.scans += 1
+		return self
+
+	def _ensure(self, max_age):
+		if max_age is None:
+			max_age = self.interval
+		if self.fetched_at is None or self.clock() - self.fetched_at > max_age:
+			self.refresh()
+
+	def access_points(self, ssid: str, max_age: float = None):
+		self._ensure(max_age)
+		return list(self._by_ssid.get(ssid, ()))
+
+	def best(self, ssid: str, max_age: float = None):
+		aps = self.access_points(ssid, max_age)
+		return aps[0] if aps else None
+
+	def lookup(self, bssid: str):
+		return self._by_bssid.get((bssid or "").lower())
+
+	def start(self):
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, name="wlan-scan", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		self._wake.set()
+
+	def poke(self):
+		self._wake.set()
+
+	def _run(self):
+		while not self._stop.is_set():
+			try:
+				self.refresh()
+				if self.on_scan is not None:
+					self.on_scan()
+			except Exception:
+				logging.getLogger(__name__).exception("扫描接入点失败")
+			# 被 poke 提前唤醒时也至少间隔 min_interval，避免频繁扫描
+			if self._stop.wait(self.min_interval):
+				break
+			self._wake.wait(max(0.0, self.interval - self.min_interval))
+			self._wake.clear()
+
+
+class _Flight:
+	__slots__ = ("done", "result")
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+
+
+class InterfaceStateCache:
+	# 接口状态缓存：短 TTL 内复用上一次 netsh 解析结果，并发读取共享同一次刷新
+	# 连接 / 断开指令后需调用 invalidate()
+	def __init__(self, fetch=query_interface_snapshot, ttl: float = 2.0, clock=time.monotonic):
+		self.fetch = fetch
+		self.ttl = float(ttl)
+		self.clock = clock
+		self.hits = 0
+		self.misses = 0
+		self.shared = 0
+		self._snapshot = None
+		self._generation = 0
+		self._flight = None
+		self._lock = threading.Lock()
+
+	def get(self, max_age=None) -> InterfaceSnapshot:
+		# max_age 可覆盖默认 TTL，例如就绪等待时传 0 强制刷新
+		max_age = self.ttl if max_age is None else max_age
+		with self._lock:
+			snap = self._snapshot
+			if snap is not None and self.clock() - snap.fetched_at <= max_age:
+				self.hits += 1
+				return snap
+			flight = self._flight
+			if flight is not None:
+				self.shared += 1
+				leader = False
+			else:
+				flight = self._flight = _Flight()
+				generation = self._generation
+				self.misses += 1
+				leader = True
+		if not leader:
+			flight.done.wait()
+			return flight.result
+		try:
+			result = self.fetch()
+		except Exception:
+			logging.getLogger(__name__).exception("Failed to get connected SSID")
+			result = InterfaceSnapshot()
+		result.fetched_at = self.clock()
+		with self._lock:
+			# 刷新期间被 invalidate 的结果不写入缓存
+			if generation == self._generation:
+				self._snapshot = result
+			self._flight = None
+		flight.result = result
+		flight.done.set()
+		return result
+
+	def invalidate(self):
+		with self._lock:
+			self._snapshot = None
+			self._generation += 1
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {"hits": self.hits, "misses": self.misses, "shared": self.shared}
+
+
+def has_ip_path(target_host: str = "") -> bool:
+	# 通过 UDP connect（不实际发包）查询路由，判断是否已获得可用的本机地址（排除 DHCP 未完成的 169.254.x.x）
+	import ipaddress
+	import socket
+	host = "8.8.8.8"
+	if target_host:
+		try:
+			ipaddress.ip_address(target_host)
+			host = target_host
+		except ValueError:
+			pass
+	try:
+		with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+			sock.connect((host, 53))
+			local = ipaddress.ip_address(sock.getsockname()[0])
+	except OSError:
+		return False
+	return not (local.is_unspecified or local.is_link_local or local.is_loopback)
+
+
+class ReadinessResult:
+	__slots__ = ("ssid", "ready", "associated_after", "ip_after", "elapsed", "polls")
+
+	def __init__(self, ssid: str):
+		self.ssid = ssid
+		self.ready = False
+		self.associated_after = None
+		self.ip_after = None
+		self.elapsed = 0.0
+		self.polls = 0
+
+	def __repr__(self):
+		def ms(v):
+			return "-" if v is None else f"{v * 1000:.0f}ms"
+		return f"ReadinessResult({self.ssid!r}, ready={self.ready}, assoc={ms(self.associated_after)}, ip={ms(self.ip_after)}, polls={self.polls})"
+
+
+class ReadinessWaiter:
+	# 连接后就绪等待：先快后慢地轮询接口状态，直到关联到目标 SSID 且 IP 通路就绪，或超过截止时间
+	def __init__(self, get_ssid, ip_ready, deadline: float = 20.0, initial_interval: float = 0.15,
+			max_interval: float = 2.0, backoff: float = 1.6, clock=time.monotonic, on_result=None):
+		self.get_ssid = get_ssid
+		self.ip_ready = ip_ready
+		self.deadline = float(deadline)
+		self.initial_interval = initial_interval
+		self.max_interval = max_interval
+		self.backoff = backoff
+		self.clock = clock
+		self.on_result = on_result
+		# 最近若干次连接的关联 / DHCP 耗时
+		self.history = deque(maxlen=50)
+		self._cancel = threading.Event()
+
+	def cancel(self):
+		self._cancel.set()
+
+	def wait(self, target_ssid: str) -> ReadinessResult:
+		result = ReadinessResult(target_ssid)
+		start = self.clock()
+		end = start + self.deadline
+		interval = self.initial_interval
+		while not self._cancel.is_set():
+			result.polls += 1
+			if result.associated_after is None and self.get_ssid() == target_ssid:
+				result.associated_after = self.clock() - start
+			if result.associated_after is not None and self.ip_ready():
+				result.ip_after = self.clock() - start
+				result.ready = True
+				break
+			now = self.clock()
+			if now >= end:
+				break
+			self._cancel.wait(min(interval, end - now))
+			interval = min(self.max_interval, interval * self.backoff)
+		result.elapsed = self.clock() - start
+		self.history.append(result)
+		tracer.record("connect.wait", result.elapsed, None if result.ready else "timeout", ssid=target_ssid, polls=result.polls)
+		if result.associated_after is not None:
+			tracer.record("connect.associate", result.associated_after, ssid=target_ssid)
+		if result.ready:
+			tracer.record("connect.dhcp", result.ip_after - result.associated_after, ssid=target_ssid)
+			dhcp = result.ip_after - result.associated_after
+			logging.getLogger(__name__).info(
+				f"连接就绪：关联耗时 {result.associated_after * 1000:.0f} ms，获取IP耗时 {dhcp * 1000:.0f} ms"
+			)
+		else:
+			logging.getLogger(__name__).warning(f"等待连接就绪超时（{self.deadline:g} s）：{result}")
+		if self.on_result:
+			self.on_result(result)
+		return result
+
+
+class SessionLeaseModel:
+	# 门户会话时长学习：按 SSID 记录“认证成功 → 被门户踢下线”的间隔，保存在 data/sessions.json
+	# - 间隔取最后一次探测为可用的时刻，偏保守；两次探测相隔过久的掉线不计入样本
+	# - 样本足够且彼此接近（固定租期）时才给出预测，否则不预测，仅依赖常规探测
+	# - 到期前续期（重新登录或访问一次门户页面）；续期后仍在预测时刻掉线则记为续期无效，之后只加密探测
+	def __init__(self, path: str, min_samples: int = 2, max_samples: int = 8, max_spread: float = 0.25,
+			min_lifetime: float = 120.0, max_detect_gap: float = 600.0, clock=time.time):
+		self.path = path
+		self.min_samples = int(min_samples)
+		self.max_samples = int(max_samples)
+		self.max_spread = float(max_spread)
+		self.min_lifetime = float(min_lifetime)
+		self.max_detect_gap = float(max_detect_gap)
+		self.clock = clock
+		self._state = None
+		self._last_online = {}
+		self._renewed_at = {}
+		self._lock = threading.RLock()
+
+	def _entries(self) -> dict:
+		if self._state is None:
+			state = {}
+			try:
+				if os.path.exists(self.path):
+					with open(self.path, "r", encoding="utf-8") as f:
+						data = json.load(f)
+					if isinstance(data, dict):
+						state = {k: v for k, v in data.items() if isinstance(v, dict)}
+			except Exception:
+				logging.getLogger(__name__).exception("读取会话时长记录失败")
+			self._state = state
+		return self._state
+
+	def _entry(self, ssid: str) -> dict:
+		entries = self._entries()
+		entry = entries.get(ssid)
+		if entry is None:
+			entry = entries[ssid] = {"authed_at": None, "samples": [], "renew_ok": None}
+		return entry
+
+	def _save(self):
+		try:
+			atomic_write_json(self.path, self._entries())
+		except Exception:
+			logging.getLogger(__name__).exception("保存会话时长记录失败")
+
+	# 观测
+
+	def on_authenticated(self, ssid: str):
+		if not ssid:
+			return
+		now = self.clock()
+		with self._lock:
+			entry = self._entry(ssid)
+			# 门户自动登录与监测到的“需认证 → 可用”可能先后报告同一次认证，保留较早的时刻
+			if entry.get("authed_at") and now - entry["authed_at"] < 120:
+				return
+			entry["authed_at"] = now
+			self._last_online[ssid] = now
+			self._renewed_at.pop(ssid, None)
+			self._save()
+
+	def on_online(self, ssid: str):
+		now = self.clock()
+		with self._lock:
+			self._last_online[ssid] = now
+			renewed_at = self._renewed_at.get(ssid)
+			if renewed_at is None:
+				return
+			expiry = self.expiry(ssid)
+			if expiry is None or now > expiry + self.margin(ssid):
+				# 越过预测的到期时刻仍可用：续期有效，租期从续期时刻重新计算
+				entry = self._entry(ssid)
+				entry["authed_at"] = renewed_at
+				entry["renew_ok"] = True
+				del self._renewed_at[ssid]
+				self._save()
+
+	def on_expired(self, ssid: str):
+		# 由可用变为需认证 / 不可用
+		now = self.clock()
+		with self._lock:
+			entry = self._entry(ssid)
+			authed_at = entry.get("authed_at")
+			last_online = self._last_online.pop(ssid, None)
+			if authed_at is None:
+				return
+			if last_online is not None and now - last_online <= self.max_detect_gap:
+				lifetime = last_online - authed_at
+				if lifetime >= self.min_lifetime:
+					entry["samples"] = (entry.get("samples") or [])[-(self.max_samples - 1):] + [round(lifetime)]
+					logging.getLogger(__name__).info(f"记录门户会话时长：{ssid} {lifetime / 60:.1f} 分钟")
+			if self._renewed_at.pop(ssid, None) is not None:
+				entry["renew_ok"] = False
+				logging.getLogger(__name__).info(f"到期前续期未能延长会话：{ssid}，之后仅在到期前后加密探测")
+			entry["authed_at"] = None
+			self._save()
+
+	def on_renewed(self, ssid: str, ok: bool):
+		if ok:
+			with self._lock:
+				self._renewed_at[ssid] = self.clock()
+
+	# 预测
+
+	def lifetime(self, ssid: str):
+		with self._lock:
+			samples = (self._entries().get(ssid) or {}).get("samples") or []
+		if len(samples) < self.min_samples:
+			return None
+		low, high = min(samples), max(samples)
+		if (high - low) > self.max_spread * high:
+			return None
+		return float(low)
+
+	def expiry(self, ssid: str):
+		lifetime = self.lifetime(ssid)
+		with self._lock:
+			authed_at = (self._entries().get(ssid) or {}).get("authed_at")
+		if lifetime is None or authed_at is None:
+			return None
+		return authed_at + lifetime
+
+	def remaining(self, ssid: str):
+		expiry = self.expiry(ssid)
+		return None if expiry is None else expiry - self.clock()
+
+	def margin(self, ssid: str) -> float:
+		# 提前续期 / 加密探测的时间窗
+		return min(300.0, max(30.0, 0.05 * (self.lifetime(ssid) or 0)))
+
+	def should_renew(self, ssid: str) -> bool:
+		with self._lock:
+			return (self._entries().get(ssid) or {}).get("renew_ok") is not False
+
+	def describe(self, ssid: str) -> dict:
+		with self._lock:
+			entry = dict(self._entries().get(ssid) or {})
+		remaining = self.remaining(ssid)
+		return {
+			"lifetime_s": self.lifetime(ssid),
+			"samples": entry.get("samples") or [],
+			"expires_in_s": None if remaining is None else round(remaining),
+			"renew_ok": entry.get("renew_ok")
+		}
+
+
+def host_jitter(window: float, key: str = None) -> float:
+	# 按主机名确定性地落在 [0, window) 内：同一台机器每次启动的偏移相同，机房内各台机器均匀错开
+	if not window or window <= 0:
+		return 0.0
+	import hashlib
+	import socket
+	digest = hashlib.sha256((key or socket.gethostname()).encode("utf-8")).digest()
+	return float(window) * int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def parse_retry_after(value, default: float = 30.0, limit: float = 3600.0) -> float:
+	# Retry-After 可为秒数或 HTTP 日期；无法解析时使用 default
+	value = (value or "").strip()
+	if not value:
+		return default
+	try:
+		seconds = float(value)
+	except ValueError:
+		try:
+			from email.utils import parsedate_to_datetime
+			seconds = parsedate_to_datetime(value).timestamp() - time.time()
+		except Exception:
+			return default
+	return min(limit, max(0.0, seconds))
+
+
+class DecorrelatedBackoff:
+	# 去相关抖动退避：下一次等待在 [base, 3 × 上一次等待] 内随机取值，不超过 cap
+	# 大量客户端同时失败后，重试时刻不会像固定的指数退避那样成批对齐
+	def __init__(self, base: float = 1.0, cap: float = 300.0, rng=None):
+		self.base = float(base)
+		self.cap = float(cap)
+		if rng is None:
+			import random
+			rng = random.Random()
+		self.rng = rng
+		self.attempts = 0
+		self._last = self.base
+
+	def next(self) -> float:
+		self.attempts += 1
+		self._last = min(self.cap, self.rng.uniform(self.base, self._last * 3))
+		return self._last
+
+	def reset(self):
+		self.attempts = 0
+		self._last = self.base
+
+
+class RequestLimiter:
+	# 本机令牌桶限流：界面、后台服务与命令行共用 data/ratelimit.db 中的桶状态，
+	# 由 SQLite 的 BEGIN IMMEDIATE 在进程间串行化取令牌；数据库不可用时退化为进程内限流
+	# rates 为 {名称: (每秒补充的令牌数, 桶容量)}，补充速率为 0 表示不限流
+	# 服务端返回 429 / 503 时 defer() 按 Retry-After 暂停本机所有进程的同类请求
+	def __init__(self, path: str, rates: dict, clock=time.time, sleep=time.sleep):
+		self.path = path
+		self.rates = dict(rates)
+		self.clock = clock
+		self._sleep = sleep
+		self._conn = None
+		self._failed = False
+		self._lock = threading.Lock()
+		self._local = {}
+
+	@classmethod
+	def from_settings(cls, path: str, settings: dict):
+		def rate(name: str, per_min: float, burst: float):
+			return (
+				float(settings.get(f"{name}_rate_per_min", per_min)) / 60.0,
+				max(1.0, float(settings.get(f"{name}_burst", burst)))
+			)
+		return cls(path, {"probe": rate("probe", 60, 6), "portal": rate("portal", 6, 2)})
+
+	def _connect(self):
+		if self._conn is None and not self._failed:
+			try:
+				import sqlite3
+				os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+				conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+				conn.execute(
+					"CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL, blocked_until REAL)"
+				)
+				self._conn = conn
+			except Exception:
+				logging.getLogger(__name__).exception("打开限流状态失败，改为进程内限流")
+				self._failed = True
+		return self._conn
+
+	def _update(self, name: str, fn):
+		# 在同一事务中读出桶状态、由 fn 计算新状态并写回；fn(row) 返回 (新状态, 结果)
+		with self._lock:
+			conn = self._connect()
+			if conn is not None:
+				try:
+					conn.execute("BEGIN IMMEDIATE")
+					try:
+						row = conn.execute(
+							"SELECT tokens, updated, blocked_until FROM buckets WHERE name = ?", (name,)
+						).fetchone()
+						state, value = fn(row)
+						conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (name,) + state)
+						conn.execute("COMMIT")
+					except BaseException:
+						conn.execute("ROLLBACK")
+						raise
+					return value
+				except Exception as exc:
+					logging.getLogger(__name__).warning(f"读写限流状态失败，本次按进程内状态处理：{exc}")
+			state, value = fn(self._local.get(name))
+			self._local[name] = state
+			return value
+
+	def _take(self, name: str) -> float:
+		# 取一个令牌：取到返回 0，否则返回还需等待的秒数（不扣令牌）
+		rate, burst = self.rates[name]
+		now = self.clock()
+
+		def take(row):
+			tokens, updated, blocked_until = row or (burst, now, 0.0)
+			# 时钟回拨时不补充令牌
+			tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+			if now < blocked_until:
+				return (tokens, now, blocked_until), blocked_until - now
+			if tokens >= 1:
+				return (tokens - 1, now, blocked_until), 0.0
+			return (tokens, now, blocked_until), (1 - tokens) / rate
+		return self._update(name, take)
+
+	def acquire(self, name: str, timeout: float = None) -> bool:
+		# 等到取得令牌为止；timeout 内无法取得时返回 False（0 为只尝试一次）
+		if self.rates.get(name, (0, 0))[0] <= 0:
+			return True
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			wait = self._take(name)
+			if wait <= 0:
+				return True
+			if deadline is not None and time.monotonic() + wait > deadline:
+				logging.getLogger(__name__).debug(f"请求限流：{name} 需等待 {wait:.1f} s，本次放弃")
+				return False
+			logging.getLogger(__name__).debug(f"请求限流：{name} 等待 {wait:.1f} s")
+			# 多个进程可能同时在等，加少量随机避免同时醒来争抢
+			import random
+			self._sleep(wait + random.uniform(0, 0.05))
+
+	def retry_after(self, name: str) -> float:
+		# 距下一个令牌可用还需等待的秒数；只读桶状态，不扣令牌也不写库
+		rate, burst = self.rates.get(name, (0, 0))
+		if rate <= 0:
+			return 0.0
+		now = self.clock()
+		with self._lock:
+			row = self._local.get(name)
+			conn = self._connect()
+			if conn is not None:
+				try:
+					row = conn.execute(
+						"SELECT tokens, updated, blocked_until FROM buckets WHERE name = ?", (name,)
+					).fetchone()
+				except Exception as exc:
+					logging.getLogger(__name__).warning(f"读取限流状态失败，按进程内状态估算：{exc}")
+		tokens, updated, blocked_until = row or (burst, now, 0.0)
+		tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+		return max(0.0, blocked_until - now, (1 - tokens) / rate)
+
+	def defer(self, name: str, seconds: float):
+		# 服务端要求暂停：在此之前本机所有进程都不再发起该类请求
+		if name not in self.rates:
+			return
+		burst = self.rates[name][1]
+		now = self.clock()
+		until = now + max(0.0, float(seconds))
+
+		def block(row):
+			tokens, updated, blocked_until = row or (burst, now, 0.0)
+			return (tokens, updated, max(blocked_until, until)), None
+		self._update(name, block)
+		logging.getLogger(__name__).warning(f"服务端繁忙，{name} 请求暂停 {seconds:.0f} s")
+
+	def close(self):
+		with self._lock:
+			if self._conn is not None:
+				try:
+					self._conn.close()
+				except Exception:
+					pass
+				self._conn = None
+
+
+# 连通性监测状态
+MONITOR_UNKNOWN = "unknown"
+MONITOR_DISCONNECTED = "disconnected"
+MONITOR_WRONG_SSID = "wrong_ssid"
+MONITOR_CAPTIVE = "captive"
+MONITOR_OFFLINE = "offline"
+MONITOR_ONLINE = "online"
+# 已连接目标WiFi、需要外网探测的状态
+MONITOR_PROBED_STATES = (MONITOR_CAPTIVE, MONITOR_OFFLINE, MONITOR_ONLINE)
+
+
+class ConnectivityMonitor:
+	# 常驻连通性监测：状态机 + 自适应探测频率
+	# - SSID 为本地查询，按 tick 间隔检查；状态异常时使用快速间隔
+	# - 外网探测稳定可用时指数退避；需认证或探测失败时从快速间隔起按去相关抖动退避，
+	#   机房内大量机器同时掉线时重新探测与重连不会成批对齐，并受每小时探测上限约束
+	# 可在线程中独立运行（start/stop），也可由 GUI 周期调用 check_once
+	# target_ssid() 给出掉线后重连的首选 SSID；is_target(ssid) 判断当前网络是否为已配置的网络
+	# lease（SessionLeaseModel）可预测门户会话到期：到期前调用 renew(ssid) 续期，并在到期前后加密探测
+	# probe() 返回 None 表示被限流跳过：保持原状态，probe_retry() 给出距可再次探测的秒数
+	# 目标WiFi断开时退避重连；被切到其他WiFi时最多重连 wrong_ssid_retries 次，之后视为用户主动切换
+	def __init__(self, get_ssid, probe, target_ssid, reconnect=None, on_transition=None,
+			tick_interval: float = 5.0, fast_interval: float = 2.0,
+			probe_min_interval: float = 3.0, probe_max_interval: float = 60.0,
+			max_probes_per_hour: int = 240, clock=time.monotonic, is_target=None, lease=None, renew=None,
+			probe_retry=None, wrong_ssid_retries: int = 3):
+		self.get_ssid = get_ssid
+		self.probe = probe
+		self.probe_retry = probe_retry
+		self.target_ssid = target_ssid
+		self.is_target = is_target
+		self.reconnect = reconnect
+		self.on_transition = on_transition
+		self.tick_interval = float(tick_interval)
+		self.fast_interval = float(fast_interval)
+		self.probe_min_interval = float(probe_min_interval)
+		self.probe_max_interval = float(probe_max_interval)
+		self.max_probes_per_hour = int(max_probes_per_hour)
+		self.reconnect_enabled = reconnect is not None
+		self.wrong_ssid_retries = int(wrong_ssid_retries)
+		self.clock = clock
+		self.state = MONITOR_UNKNOWN
+		self.ssid = ""
+		self.last_transition = None
+		self._probe_streak = 0
+		self._probe_due = 0.0
+		self._probe_times = deque()
+		self._retry_backoff = DecorrelatedBackoff(
+			self.probe_min_interval, max(self.probe_min_interval, self.probe_max_interval / 2)
+		)
+		self._reconnect_attempts = 0
+		self._reconnect_due = 0.0
+		self._reconnect_backoff = DecorrelatedBackoff(5.0, 300.0)
+		self._seen_target = False
+		self.lease = lease
+		self.renew = renew
+		self._renewed_expiry = None
+		self._lease_wake = None
+		self._lock = threading.Lock()
+		self._check_lock = threading.Lock()
+		self._stop = threading.Event()
+		self._wake = threading.Event()
+		self._thread = None
+
+	@classmethod
+	def from_settings(cls, settings: dict, get_ssid, probe, reconnect=None, on_transition=None,
+			target_ssid=None, is_target=None, lease=None, renew=None, probe_retry=None):
+		def target():
+			return (settings.get("wifi_ssid") or "").strip()
+		monitor = cls(
+			get_ssid, probe, target_ssid or target, reconnect, on_transition, is_target=is_target,
+			lease=lease, renew=renew, probe_retry=probe_retry,
+			tick_interval=float(settings.get("monitor_tick_interval") or 5.0),
+			probe_max_interval=float(settings.get("monitor_probe_max_interval") or 60.0),
+			max_probes_per_hour=int(settings.get("monitor_max_probes_per_hour") or 240),
+			wrong_ssid_retries=int(settings.get("monitor_wrong_ssid_retries", 3))
+		)
+		if settings.get("monitor_auto_reconnect") is False:
+			monitor.reconnect_enabled = False
+		return monitor
+
+	def check_once(self):
+		# 执行一次检测，返回 (原状态, 新状态)
+		# 取 SSID、探测、重连、续期与回调都是阻塞的 netsh / HTTP 调用，一律在 _lock 之外进行：
+		# 锁内只取状态快照和应用状态转换，stop() 与界面线程读取状态不必等一次完整的探测或连接
+		# _check_lock 只用于串行化检测本身（线程模式与界面手动触发不会同时探测）
+		with self._check_lock:
+			target = self.target_ssid()
+			ssid = self.get_ssid()
+			on_target = bool(ssid) and self._is_target(ssid, target)
+			with self._lock:
+				now = self.clock()
+				previous = self.state
+				# 尚无结论（unknown）时按 _probe_due 重试，跳过的探测不会每次检查都重新取令牌
+				should_probe = on_target and (ssid != self.ssid or now >= self._probe_due
+					or previous not in MONITOR_PROBED_STATES + (MONITOR_UNKNOWN,))
+			verdict = self._probe_with_budget(now) if should_probe else None
+			with self._lock:
+				current, reconnect, renew_due = self._apply(now, previous, ssid, target, on_target, should_probe, verdict)
+			if reconnect:
+				try:
+					self.reconnect(target)
+				except Exception:
+					logging.getLogger(__name__).exception("自动重连失败")
+			if renew_due:
+				self._renew(ssid)
+		if current != previous and self.on_transition is not None:
+			try:
+				self.on_transition(previous, current, ssid)
+			except Exception:
+				logging.getLogger(__name__).exception("连通性状态回调异常")
+		return previous, current
+
+	def _apply(self, now: float, previous: str, ssid: str, target: str, on_target: bool, probed: bool, verdict):
+		# 在 _lock 内根据本次检测结果更新状态；返回 (新状态, 是否重连, 是否续期)
+		renew_due = False
+		if not ssid:
+			current = MONITOR_DISCONNECTED
+		elif not on_target:
+			current = MONITOR_WRONG_SSID
+		else:
+			self._seen_target = True
+			current = previous
+			if probed and verdict is not None:
+				# 探测失败（断网、DNS 故障等）与门户拦截分开：只有被拦截时才需要认证
+				current = {PROBE_ONLINE: MONITOR_ONLINE, PROBE_CAPTIVE: MONITOR_CAPTIVE}.get(verdict, MONITOR_OFFLINE)
+				if verdict != PROBE_ONLINE:
+					# 未恢复：去相关抖动退避地重新探测
+					self._probe_streak = 0
+					interval = self._retry_backoff.next()
+				else:
+					# 刚恢复时回到最快节奏，稳定后指数退避
+					self._retry_backoff.reset()
+					self._probe_streak = 0 if current != previous else min(self._probe_streak + 1, 16)
+					interval = min(self.probe_max_interval, self.probe_min_interval * (2 ** self._probe_streak))
+				self._probe_due = now + interval
+			elif probed:
+				# 跳过探测没有任何结论：保持原状态（不触发认证等回调），到可再次探测时重试
+				self._probe_due = now + max(self.fast_interval, self._skip_delay(now))
+		if current in (MONITOR_DISCONNECTED, MONITOR_WRONG_SSID):
+			reconnect = self._should_reconnect(now, target, previous, current)
+		else:
+			reconnect = False
+			self._reconnect_attempts = 0
+			self._reconnect_due = 0.0
+			self._reconnect_backoff.reset()
+		if self.lease is not None and current in (MONITOR_CAPTIVE, MONITOR_ONLINE):
+			renew_due = self._track_lease(now, ssid, previous, current, verdict)
+		self.ssid = ssid
+		self.state = current
+		if current != previous:
+			self.last_transition = now
+			logging.getLogger(__name__).info(f"连通性状态：{previous} -> {current}（WiFi：{ssid or '未连接'}）")
+		return current, reconnect, renew_due
+
+	def _track_lease(self, now: float, ssid: str, previous: str, current: str, verdict) -> bool:
+		# 返回是否应在本次检测后续期
+		lease = self.lease
+		if verdict == PROBE_ONLINE:
+			if previous == MONITOR_CAPTIVE:
+				lease.on_authenticated(ssid)
+			else:
+				lease.on_online(ssid)
+		elif verdict == PROBE_CAPTIVE and previous == MONITOR_ONLINE:
+			# 只有被门户拦截才算会话到期，断网不计入会话时长
+			lease.on_expired(ssid)
+		self._lease_wake = None
+		if current != MONITOR_ONLINE:
+			return False
+		remaining = lease.remaining(ssid)
+		if remaining is None:
+			return False
+		margin = lease.margin(ssid)
+		if remaining > margin:
+			self._lease_wake = now + remaining - margin
+			return False
+		if remaining > -2 * margin:
+			# 预测到期前后加密探测：续期无效或预测偏差时尽快发现掉线
+			self._probe_due = min(self._probe_due, now + self.fast_interval)
+		expiry = lease.expiry(ssid)
+		if expiry == self._renewed_expiry or not lease.should_renew(ssid) or self.renew is None:
+			return False
+		self._renewed_expiry = expiry
+		return True
+
+	def _renew(self, ssid: str):
+		logging.getLogger(__name__).info(f"门户会话即将到期，提前续期：{ssid}")
+		try:
+			ok = bool(self.renew(ssid))
+		except Exception:
+			logging.getLogger(__name__).exception("会话续期失败")
+			ok = False
+		self.lease.on_renewed(ssid, ok)
+
+	def _is_target(self, ssid: str, target: str) -> bool:
+		if self.is_target is not None:
+			return self.is_target(ssid)
+		return not target or ssid == target
+
+	def next_delay(self) -> float:
+		now = self.clock()
+		if self.state == MONITOR_ONLINE:
+			due = self._probe_due if self._lease_wake is None else min(self._probe_due, self._lease_wake)
+			return max(0.2, min(self.tick_interval, due - now))
+		if self.state in (MONITOR_CAPTIVE, MONITOR_OFFLINE):
+			return max(0.2, min(self.fast_interval * 2, self._probe_due - now))
+		return self.fast_interval
+
+	def probes_last_hour(self) -> int:
+		self._trim_probe_times(self.clock())
+		return len(self._probe_times)
+
+	def _trim_probe_times(self, now: float):
+		while self._probe_times and now - self._probe_times[0] > 3600:
+			self._probe_times.popleft()
+
+	def _probe_with_budget(self, now: float):
+		self._trim_probe_times(now)
+		if len(self._probe_times) >= self.max_probes_per_hour:
+			logging.getLogger(__name__).debug("已达到每小时探测上限，本次跳过探测")
+			return None
+		verdict = self.probe()
+		if verdict is not None:
+			self._probe_times.append(now)
+		return verdict
+
+	def _skip_delay(self, now: float) -> float:
+		# 跳过探测后距下一次可探测的秒数：每小时上限取最早一次探测滑出窗口的时间，否则取限流令牌的补充时间
+		if len(self._probe_times) >= self.max_probes_per_hour:
+			return self._probe_times[0] + 3600 - now
+		if self.probe_retry is None:
+			return 0.0
+		try:
+			return float(self.probe_retry())
+		except Exception:
+			logging.getLogger(__name__).exception("读取探测限流状态失败")
+			return 0.0
+
+	def _should_reconnect(self, now: float, target: str, previous: str, current: str) -> bool:
+		# 仅在曾连上目标WiFi后掉线时自动重连，退避重试；重连指令由调用方在锁外发出
+		# 被切到其他WiFi（wrong_ssid）多为目标网络掉线后系统自动改连了别的已保存网络，同样重连；
+		# 但最多 wrong_ssid_retries 次，仍未回到目标网络时视为用户主动切换，不再抢回（0 为不处理）
+		if not (self.reconnect_enabled and self.reconnect and target and self._seen_target):
+			return False
+		if previous == MONITOR_UNKNOWN or now < self._reconnect_due:
+			return False
+		if current == MONITOR_WRONG_SSID and self._reconnect_attempts >= self.wrong_ssid_retries:
+			return False
+		self._reconnect_attempts += 1
+		self._reconnect_due = now + self._reconnect_backoff.next()
+		reason = "WiFi断开" if current == MONITOR_DISCONNECTED else "已切换到其他WiFi"
+		logging.getLogger(__name__).info(f"检测到{reason}，尝试重连：{target}（第 {self._reconnect_attempts} 次）")
+		# 重连后尽快复检
+		self._probe_due = 0.0
+		return True
+
+	def start(self, delay: float = 0.0):
+		# 无界面模式：在后台线程中循环检测；delay 为首次检测前的等待（错峰启动）
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, args=(delay,), name="monitor", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		self._wake.set()
+
+	def poke(self):
+		# 立即触发下一次检测（例如手动连接后）
+		self._probe_due = 0.0
+		self._wake.set()
+
+	def _run(self, delay: float):
+		if delay > 0 and self._stop.wait(delay):
+			return
+		while not self._stop.is_set():
+			try:
+				self.check_once()
+			except Exception:
+				logging.getLogger(__name__).exception("连通性监测异常")
+			self._wake.wait(self.next_delay())
+			self._wake.clear()
+
+
+
+# 连通性历史中的事件类型
+HISTORY_PROBE = "probe"
+HISTORY_SSID = "ssid"
+HISTORY_CONNECT = "connect"
+HISTORY_READY = "ready"
+HISTORY_AUTH = "auth"
+
+# 恢复上网耗时（断网 / 发起连接 → 再次可用）的直方图桶上界（毫秒）
+TIME_TO_ONLINE_BUCKETS_MS = (1000, 2000, 5000, 10000, 20000, 30000, 60000, 120000, 300000, 600000, 1800000, 3600000)
+
+
+class _Rollup:
+	# 一个小时 / 一天的汇总；observed_s 为有观测的时长，online_s 为其中可用的时长
+	__slots__ = ("observed_s", "online_s", "probes", "outages", "captive", "connects", "connect_failures",
+		"auths", "auth_failures", "tto", "dirty")
+
+	def __init__(self, row=None):
+		if row is None:
+			row = (0.0, 0.0, 0, 0, 0, 0, 0, 0, 0, None)
+		(self.observed_s, self.online_s, self.probes, self.outages, self.captive, self.connects,
+			self.connect_failures, self.auths, self.auth_failures, tto) = row
+		self.tto = PhaseHistogram.from_state(json.loads(tto) if tto else None, TIME_TO_ONLINE_BUCKETS_MS)
+		self.dirty = False
+
+	def row(self) -> tuple:
+		return (self.observed_s, self.online_s, self.probes, self.outages, self.captive, self.connects,
+			self.connect_failures, self.auths, self.auth_failures, json.dumps(self.tto.to_state()))
+
+
+class ConnectivityHistory:
+	# 连通性历史：data/history.db（SQLite WAL），原始事件只追加；小时 / 天汇总随事件增量更新
+	# - 可用率按时间加权：相邻两次状态之间的时长计入前一状态，超过 max_gap（休眠、程序未运行）的间隔不计
+	# - 恢复上网耗时：从掉线（或发起连接）到下一次探测为可用
+	# - 定期压缩：删除超过保留期的原始事件与汇总并回收空间，长期运行磁盘占用有上限
+	ROLLUP_COLUMNS = ("observed_s", "online_s", "probes", "outages", "captive", "connects", "connect_failures",
+		"auths", "auth_failures", "tto")
+
+	def __init__(self, path: str, raw_days: float = 14, hourly_days: float = 90, daily_days: float = 730,
+			max_gap: float = 1800, clock=time.time):
+		self.path = path
+		self.raw_days = raw_days
+		self.hourly_days = hourly_days
+		self.daily_days = daily_days
+		self.max_gap = max_gap
+		self.clock = clock
+		self._conn = None
+		self._failed = False
+		self._lock = threading.Lock()
+		self._rollups = {}
+		self._state = None
+		self._state_ts = None
+		self._down_since = None
+		self._next_compact = 0.0
+
+	@classmethod
+	def from_settings(cls, path: str, settings: dict):
+		return cls(
+			path,
+			raw_days=float(settings.get("history_raw_days") or 14),
+			hourly_days=float(settings.get("history_hourly_days") or 90),
+			daily_days=float(settings.get("history_daily_days") or 730)
+		)
+
+	def _open(self):
+		# 首次写入 / 查询时才打开数据库（sqlite3 延迟导入），出错后不再重试，不影响联网逻辑
+		if self._conn is not None or self._failed:
+			return self._conn
+		try:
+			import sqlite3
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+			# auto_vacuum 须在建表前设置，压缩后可逐步归还空闲页
+			conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.executescript("""
+				CREATE TABLE IF NOT EXISTS events (
+					ts REAL NOT NULL, kind TEXT NOT NULL, outcome TEXT, ssid TEXT, latency_ms REAL, detail TEXT
+				);
+				CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+				CREATE TABLE IF NOT EXISTS rollups (
+					period TEXT NOT NULL, bucket INTEGER NOT NULL,
+					observed_s REAL, online_s REAL, probes INTEGER, outages INTEGER, captive INTEGER,
+					connects INTEGER, connect_failures INTEGER, auths INTEGER, auth_failures INTEGER, tto TEXT,
+					PRIMARY KEY (period, bucket)
+				) WITHOUT ROWID;
+				CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+			""")
+			self._conn = conn
+		except Exception:
+			self._failed = True
+			logging.getLogger(__name__).exception("打开连通性历史数据库失败，本次运行不再记录")
+		return self._conn
+
+	def close(self):
+		with self._lock:
+			if self._conn is not None:
+				try:
+					self._conn.close()
+				except Exception:
+					pass
+				self._conn = None
+
+	# 记录接口
+
+	def record_probe(self, verdict: str, latency: float = None, ssid: str = ""):
+		self.record(HISTORY_PROBE, verdict, ssid, latency)
+
+	def record_ssid(self, ssid: str):
+		self.record(HISTORY_SSID, "connected" if ssid else "disconnected", ssid)
+
+	def record_connect(self, ssid: str, ok: bool, latency: float = None):
+		self.record(HISTORY_CONNECT, "ok" if ok else "failed", ssid, latency)
+
+	def record_ready(self, ssid: str, ready: bool, latency: float = None):
+		self.record(HISTORY_READY, "ok" if ready else "timeout", ssid, latency)
+
+	def record_auth(self, method: str, ok: bool, latency: float = None, detail: str = ""):
+		self.record(HISTORY_AUTH, "ok" if ok else "failed", "", latency, f"{method}{': ' + detail if detail else ''}")
+
+	def record(self, kind: str, outcome: str, ssid: str = "", latency: float = None, detail: str = ""):
+		ts = self.clock()
+		with self._lock:
+			conn = self._open()
+			if conn is None:
+				return
+			try:
+				# 界面、后台服务与命令行可能同时写入：BEGIN IMMEDIATE 串行化写者，
+				# 并在事务内重新读取状态与汇总行，不使用其他进程写入前缓存在内存中的值
+				conn.execute("BEGIN IMMEDIATE")
+				self._load_state(conn)
+				conn.execute(
+					"INSERT INTO events (ts, kind, outcome, ssid, latency_ms, detail) VALUES (?, ?, ?, ?, ?, ?)",
+					(ts, kind, outcome, ssid or None, None if latency is None else round(latency * 1000, 1), detail or None)
+				)
+				self._apply(ts, kind, outcome)
+				self._flush(conn)
+				conn.execute("COMMIT")
+			except Exception:
+				self._rollups.clear()
+				self._rollback(conn)
+				logging.getLogger(__name__).exception("写入连通性历史失败")
+				return
+		if ts >= self._next_compact:
+			self.compact()
+
+	@staticmethod
+	def _rollback(conn):
+		try:
+			conn.execute("ROLLBACK")
+		except Exception:
+			pass
+
+	def _load_state(self, conn):
+		meta = dict(conn.execute("SELECT key, value FROM meta WHERE key = 'state'"))
+		state = json.loads(meta.get("state") or "null") or {}
+		self._state = state.get("state")
+		self._state_ts = state.get("ts")
+		self._down_since = state.get("down_since")
+
+	# 增量汇总
+
+	@staticmethod
+	def bucket_start(ts: float, period: str) -> int:
+		# 按本地时间对齐到整点 / 当日零点
+		tm = time.localtime(ts)
+		if period == "hour":
+			return int(ts) - tm.tm_min * 60 - tm.tm_sec
+		return int(time.mktime((tm.tm_year, tm.tm_mon, tm.tm_mday, 0, 0, 0, 0, 0, -1)))
+
+	def _rollup(self, period: str, bucket: int) -> _Rollup:
+		key = (period, bucket)
+		rollup = self._rollups.get(key)
+		if rollup is None:
+			row = self._conn.execute(
+				f"SELECT {', '.join(self.ROLLUP_COLUMNS)} FROM rollups WHERE period = ? AND bucket = ?", key
+			).fetchone()
+			rollup = self._rollups[key] = _Rollup(row)
+		return rollup
+
+	def _rollups_at(self, ts: float):
+		return (self._rollup("hour", self.bucket_start(ts, "hour")), self._rollup("day", self.bucket_start(ts, "day")))
+
+	def _accumulate(self, start: float, end: float, online: bool):
+		# 将 [start, end) 按小时边界拆开计入各自的小时 / 天汇总
+		while start < end:
+			hour = self.bucket_start(start, "hour")
+			piece_end = min(end, hour + 3600)
+			seconds = piece_end - start
+			for rollup in self._rollups_at(start):
+				rollup.observed_s += seconds
+				if online:
+					rollup.online_s += seconds
+				rollup.dirty = True
+			start = piece_end
+
+	def _apply(self, ts: float, kind: str, outcome: str):
+		if kind == HISTORY_PROBE:
+			state = outcome
+		elif kind == HISTORY_SSID and outcome == "disconnected":
+			state = "disconnected"
+		else:
+			state = None
+		rollups = self._rollups_at(ts)
+		for rollup in rollups:
+			rollup.dirty = True
+			if kind == HISTORY_PROBE:
+				rollup.probes += 1
+			elif kind == HISTORY_CONNECT:
+				rollup.connects += 1
+				rollup.connect_failures += outcome != "ok"
+			elif kind == HISTORY_AUTH:
+				rollup.auths += 1
+				rollup.auth_failures += outcome != "ok"
+		if kind == HISTORY_CONNECT and self._down_since is None:
+			# 主动发起连接也作为一次“恢复上网”的起点
+			self._down_since = ts
+		if state is None or (self._state_ts is not None and ts < self._state_ts):
+			# 其他进程已写入更晚的状态时只计数，不回退状态，避免同一时段重复计时
+			return
+		if self._state is not None and self._state_ts is not None and 0 < ts - self._state_ts <= self.max_gap:
+			self._accumulate(self._state_ts, ts, self._state == PROBE_ONLINE)
+		if state == PROBE_ONLINE:
+			if self._down_since is not None:
+				for rollup in rollups:
+					rollup.tto.add(ts - self._down_since)
+				self._down_since = None
+		else:
+			if self._state == PROBE_ONLINE:
+				# 由可用变为不可用记为一次掉线；被门户踢下线单独计数
+				for rollup in rollups:
+					rollup.outages += 1
+					rollup.captive += state == PROBE_CAPTIVE
+			if self._down_since is None:
+				self._down_since = ts
+		self._state = state
+		self._state_ts = ts
+
+	def _flush(self, conn):
+		placeholders = ", ".join("?" * (len(self.ROLLUP_COLUMNS) + 2))
+		for (period, bucket), rollup in list(self._rollups.items()):
+			if rollup.dirty:
+				conn.execute(
+					f"INSERT OR REPLACE INTO rollups (period, bucket, {', '.join(self.ROLLUP_COLUMNS)}) VALUES ({placeholders})",
+					(period, bucket) + rollup.row()
+				)
+		# 汇总行只在本次事务内缓存，下次写入时重新读取
+		self._rollups.clear()
+		conn.execute(
+			"INSERT OR REPLACE INTO meta (key, value) VALUES ('state', ?)",
+			(json.dumps({"state": self._state, "ts": self._state_ts, "down_since": self._down_since}),)
+		)
+
+	# 压缩与查询
+
+	def compact(self) -> dict:
+		now = self.clock()
+		removed = {}
+		with self._lock:
+			conn = self._open()
+			if conn is None:
+				return removed
+			self._next_compact = now + 6 * 3600
+			try:
+				conn.execute("BEGIN")
+				removed["events"] = conn.execute("DELETE FROM events WHERE ts < ?", (now - self.raw_days * 86400,)).rowcount
+				removed["hour"] = conn.execute(
+					"DELETE FROM rollups WHERE period = 'hour' AND bucket < ?", (now - self.hourly_days * 86400,)).rowcount
+				removed["day"] = conn.execute(
+					"DELETE FROM rollups WHERE period = 'day' AND bucket < ?", (now - self.daily_days * 86400,)).rowcount
+				conn.execute("COMMIT")
+				if any(removed.values()):
+					conn.execute("PRAGMA incremental_vacuum")
+					conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+					logging.getLogger(__name__).info(f"连通性历史已压缩：{removed}")
+			except Exception:
+				self._rollback(conn)
+				logging.getLogger(__name__).exception("压缩连通性历史失败")
+		return removed
+
+	def rollups(self, period: str = "day", since: float = None) -> list:
+		# 返回 [{"start", "uptime_pct", "p50_tto_s", "p95_tto_s", "outages", ...}]，按时间升序
+		with self._lock:
+			conn = self._open()
+			if conn is None:
+				return []
+			rows = conn.execute(
+				f"SELECT bucket, {', '.join(self.ROLLUP_COLUMNS)} FROM rollups WHERE period = ? AND bucket >= ? ORDER BY bucket",
+				(period, int(since or 0))
+			).fetchall()
+		items = []
+		for row in rows:
+			rollup = _Rollup(row[1:])
+			items.append({
+				"start": row[0],
+				"uptime_pct": round(rollup.online_s * 100 / rollup.observed_s, 2) if rollup.observed_s else None,
+				"observed_s": round(rollup.observed_s),
+				"p50_tto_s": round(rollup.tto.quantile(0.5), 1) if rollup.tto.count else None,
+				"p95_tto_s": round(rollup.tto.quantile(0.95), 1) if rollup.tto.count else None,
+				"recoveries": rollup.tto.count,
+				"outages": rollup.outages,
+				"captive_kicks": rollup.captive,
+				"probes": rollup.probes,
+				"connects": rollup.connects,
+				"connect_failures": rollup.connect_failures,
+				"auths": rollup.auths,
+				"auth_failures": rollup.auth_failures
+			})
+		return items
+
+	def events(self, since: float = None, kind: str = None, limit: int = 200) -> list:
+		with self._lock:
+			conn = self._open()
+			if conn is None:
+				return []
+			sql = "SELECT ts, kind, outcome, ssid, latency_ms, detail FROM events WHERE ts >= ?"
+			params = [since or 0]
+			if kind:
+				sql += " AND kind = ?"
+				params.append(kind)
+			sql += " ORDER BY ts DESC LIMIT ?"
+			params.append(limit)
+			rows = conn.execute(sql, params).fetchall()
+		keys = ("ts", "kind", "outcome", "ssid", "latency_ms", "detail")
+		return [dict(zip(keys, row)) for row in reversed(rows)]
+
+
+def atomic_write_json(path: str, data):
+	# 先写临时文件再原子替换，避免中途断电或并发读取看到半个文件
+	import tempfile
+	directory = os.path.dirname(path) or "."
+	os.makedirs(directory, exist_ok=True)
+	fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+	try:
+		with os.fdopen(fd, "w", encoding="utf-8") as f:
+			json.dump(data, f, ensure_ascii=False, indent=2)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp_path, path)
+	except BaseException:
+		try:
+			os.unlink(tmp_path)
+		except OSError:
+			pass
+		raise
+
+
+class NetworkProfile:
+	__slots__ = ("ssid", "auth_url", "credentials", "probe_endpoints", "priority")
+
+	def __init__(self, ssid: str, auth_url: str = "", credentials: str = "", probe_endpoints=None, priority: int = 0):
+		self.ssid = ssid
+		self.auth_url = auth_url
+		self.credentials = credentials
+		self.probe_endpoints = list(probe_endpoints or [])
+		self.priority = int(priority)
+
+	@classmethod
+	def from_dict(cls, data: dict):
+		ssid = (data.get("ssid") or "").strip()
+		if not ssid:
+			return None
+		return cls(
+			ssid,
+			normalize_url(data.get("auth_url") or ""),
+			data.get("credentials") or "",
+			data.get("probe_endpoints") or [],
+			data.get("priority") or 0
+		)
+
+	def to_dict(self) -> dict:
+		data = {"ssid": self.ssid, "auth_url": self.auth_url, "priority": self.priority}
+		if self.credentials:
+			data["credentials"] = self.credentials
+		if self.probe_endpoints:
+			data["probe_endpoints"] = self.probe_endpoints
+		return data
+
+	def __repr__(self):
+		return f"NetworkProfile({self.ssid!r}, auth_url={self.auth_url!r}, priority={self.priority})"
+
+
+class ProfileStore:
+	# 多网络配置档：data/profiles.json 中按 SSID 建立索引，记录认证地址、账号引用、探测地址与优先级
+	# "discovered" 中按 SSID 记录从门户重定向中自动发现的认证地址（未配置认证地址时使用）
+	# 文件未变化（mtime / 大小一致）时跳过重新加载，写入采用临时文件 + 原子替换
+	def __init__(self, path: str):
+		self.path = path
+		self._profiles = {}
+		self._discovered = {}
+		self._stamp = None
+		self._lock = threading.Lock()
+
+	def reload(self) -> bool:
+		try:
+			st = os.stat(self.path)
+			stamp = (st.st_mtime_ns, st.st_size)
+		except OSError:
+			stamp = None
+		with self._lock:
+			if stamp == self._stamp:
+				return False
+			profiles = {}
+			discovered = {}
+			if stamp is not None:
+				try:
+					with open(self.path, "r", encoding="utf-8") as f:
+						data = json.load(f)
+					if not isinstance(data, dict):
+						data = {}
+					for item in data.get("profiles") or []:
+						profile = NetworkProfile.from_dict(item) if isinstance(item, dict) else None
+						if profile is not None:
+							profiles[profile.ssid] = profile
+					for ssid, item in (data.get("discovered") or {}).items():
+						if isinstance(item, dict) and item.get("auth_url"):
+							discovered[ssid] = item
+				except Exception:
+					logging.getLogger(__name__).exception("读取网络配置档失败")
+			self._profiles = profiles
+			self._discovered = discovered
+			self._stamp = stamp
+			return True
+
+	def get(self, ssid: str):
+		self.reload()
+		return self._profiles.get(ssid)
+
+	def all(self):
+		# 按优先级从高到低
+		self.reload()
+		return sorted(self._profiles.values(), key=lambda p: -p.priority)
+
+	def upsert(self, profile: NetworkProfile) -> bool:
+		self.reload()
+		with self._lock:
+			profiles = dict(self._profiles)
+			profiles[profile.ssid] = profile
+			return self._write(profiles)
+
+	def remove(self, ssid: str) -> bool:
+		self.reload()
+		with self._lock:
+			profiles = dict(self._profiles)
+			if profiles.pop(ssid, None) is None:
+				return False
+			return self._write(profiles)
+
+	def discovered_url(self, ssid: str) -> str:
+		self.reload()
+		item = self._discovered.get(ssid)
+		return item["auth_url"] if item else ""
+
+	def remember_discovered(self, ssid: str, auth_url: str) -> bool:
+		# 地址未变化时不写文件，避免每次探测都落盘
+		self.reload()
+		with self._lock:
+			item = self._discovered.get(ssid)
+			if item is not None and item.get("auth_url") == auth_url:
+				return False
+			discovered = dict(self._discovered)
+			discovered[ssid] = {"auth_url": auth_url, "discovered_at": int(time.time())}
+			return self._write(self._profiles, discovered)
+
+	def _write(self, profiles: dict, discovered: dict = None) -> bool:
+		discovered = self._discovered if discovered is None else discovered
+		try:
+			ordered = sorted(profiles.values(), key=lambda p: (-p.priority, p.ssid))
+			data = {"profiles": [p.to_dict() for p in ordered]}
+			if discovered:
+				data["discovered"] = discovered
+			atomic_write_json(self.path, data)
+			st = os.stat(self.path)
+			self._profiles = profiles
+			self._discovered = discovered
+			self._stamp = (st.st_mtime_ns, st.st_size)
+			return True
+		except Exception:
+			logging.getLogger(__name__).exception("保存网络配置档失败")
+			return False
+
+
+def default_data_dir() -> str:
+	# Persist user data under data/ next to the program
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def _load_log_handlers():
+	# logging.handlers（连带 pickle 等）只在配置日志时导入，两个处理器类随之定义为模块级名称
+	global CompressedTimedRotatingFileHandler, _EnqueueHandler
+	if "CompressedTimedRotatingFileHandler" in globals():
+		return
+	from logging.handlers import TimedRotatingFileHandler, QueueHandler
+
+	class CompressedTimedRotatingFileHandler(TimedRotatingFileHandler):
+		# 每天零点轮转，旧日志以 gzip 压缩保存为 app.log.YYYY-MM-DD.gz；
+		# 除保留天数外另限制 app.log* 的总大小（max_total_bytes，0 为不限），超出时从最旧的轮转文件删起
+		# 写入后不逐条 flush，由 AsyncLogWriter 每写完一批统一 flush
+		def __init__(self, filename: str, backup_count: int = 7, max_total_bytes: int = 0, encoding: str = "utf-8"):
+			super().__init__(filename, when="midnight", backupCount=backup_count, encoding=encoding, delay=True)
+			self.max_total_bytes = max_total_bytes
+			self.namer = lambda name: name + ".gz"
+			self.rotator = self._compress
+
+		def emit(self, record):
+			try:
+				if self.shouldRollover(record):
+					self.doRollover()
+				if self.stream is None:
+					self.stream = self._open()
+				self.stream.write(self.format(record) + self.terminator)
+			except Exception:
+				self.handleError(record)
+
+		def doRollover(self):
+			super().doRollover()
+			self.enforce_size_cap()
+
+		@staticmethod
+		def _compress(source: str, dest: str):
+			import gzip
+			import shutil
+			try:
+				with open(source, "rb") as src, gzip.open(dest, "wb", compresslevel=6) as dst:
+					shutil.copyfileobj(src, dst, 1024 * 1024)
+				os.remove(source)
+			except OSError:
+				# 压缩失败时保留未压缩的轮转文件，不丢日志
+				try:
+					if os.path.exists(dest):
+						os.remove(dest)
+					os.replace(source, dest[:-len(".gz")])
+				except OSError:
+					pass
+
+		def enforce_size_cap(self):
+			if self.max_total_bytes <= 0:
+				return
+			logs_dir, base = os.path.split(self.baseFilename)
+			rotated = []
+			total = 0
+			try:
+				for entry in os.scandir(logs_dir):
+					if entry.name == base:
+						total += entry.stat().st_size
+					elif entry.name.startswith(base + "."):
+						size = entry.stat().st_size
+						total += size
+						rotated.append((entry.name, size))
+			except OSError:
+				return
+			# 文件名带日期后缀，按名称排序即由旧到新；正在写入的 app.log 不删除
+			for name, size in sorted(rotated):
+				if total <= self.max_total_bytes:
+					break
+				try:
+					os.remove(os.path.join(logs_dir, name))
+					total -= size
+				except OSError:
+					pass
+
+
+	class _EnqueueHandler(QueueHandler):
+		# 同进程内的队列不必像 QueueHandler 默认那样复制记录并预先格式化，只把参数合入消息；异常堆栈由写线程格式化
+		def prepare(self, record):
+			if record.args:
+				record.msg = record.getMessage()
+				record.args = None
+			return record
+
+
+def __getattr__(name):
+	# from ocoa_core import CompressedTimedRotatingFileHandler 时按需定义
+	if name in ("CompressedTimedRotatingFileHandler", "_EnqueueHandler"):
+		_load_log_handlers()
+		return globals()[name]
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class AsyncLogWriter:
+	# 文件 / 控制台日志由后台线程写入：日志调用只把记录放入队列（QueueHandler），不再等待磁盘
+	# 写线程取到队列为空或每写满 batch_size 条后 flush 一次；stop() 写完队列中剩余的记录再关闭文件（进程退出时自动调用）
+	_STOP = object()
+
+	def __init__(self, handlers, batch_size: int = 256):
+		self.handlers = list(handlers)
+		self.batch_size = batch_size
+		import queue
+		self.queue = queue.SimpleQueue()
+		self._thread = threading.Thread(target=self._run, name="ocoa-log-writer", daemon=True)
+		self._thread.start()
+
+	def queue_handler(self) -> logging.Handler:
+		_load_log_handlers()
+		handler = _EnqueueHandler(self.queue)
+		handler.setLevel(min(h.level for h in self.handlers))
+		return handler
+
+	def call_soon(self, fn):
+		# 在写线程上执行（先 flush 此前的记录），用于与写入互斥的维护操作
+		self.queue.put(fn)
+
+	def flush(self, timeout: float = 5.0) -> bool:
+		# 等待此前入队的记录全部写出
+		if not self._thread.is_alive():
+			return True
+		done = threading.Event()
+		self.call_soon(done.set)
+		return done.wait(timeout)
+
+	def stop(self, timeout: float = 5.0):
+		if self._thread.is_alive():
+			self.queue.put(self._STOP)
+			self._thread.join(timeout)
+		for handler in self.handlers:
+			try:
+				handler.flush()
+				handler.close()
+			except Exception:
+				pass
+
+	def _run(self):
+		import queue
+		while True:
+			item = self.queue.get()
+			written = 0
+			while True:
+				if item is self._STOP:
+					self._flush_handlers()
+					return
+				if callable(item):
+					self._flush_handlers()
+					try:
+						item()
+					except Exception:
+						pass
+				else:
+					for handler in self.handlers:
+						if item.levelno >= handler.level:
+							handler.handle(item)
+					written += 1
+					if written >= self.batch_size:
+						break
+				try:
+					item = self.queue.get_nowait()
+				except queue.Empty:
+					break
+			self._flush_handlers()
+
+	def _flush_handlers(self):
+		for handler in self.handlers:
+			try:
+				handler.flush()
+			except Exception:
+				pass
+
+
+_log_writer = None
+
+
+def setup_logging(logs_dir: str, console_level=logging.INFO, keep_days: int = 7, max_total_mb: float = 20):
+	# 文件与控制台日志经 AsyncLogWriter 在后台线程写出；重复调用时沿用已有的写线程
+	global _log_writer
+	if _log_writer is not None:
+		return _log_writer
+	try:
+		os.makedirs(logs_dir, exist_ok=True)
+		logger = logging.getLogger()
+		logger.setLevel(logging.INFO)
+		# 日志格式只用到时间、等级、模块名与消息：不查找调用位置，也不记录线程 / 进程信息
+		logging._srcfile = None
+		logging.logThreads = False
+		logging.logProcesses = False
+		logging.logMultiprocessing = False
+		_load_log_handlers()
+		file_handler = CompressedTimedRotatingFileHandler(
+			os.path.join(logs_dir, "app.log"), backup_count=keep_days, max_total_bytes=int(max_total_mb * 1024 * 1024)
+		)
+		file_fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+		file_handler.setFormatter(file_fmt)
+		file_handler.setLevel(logging.INFO)
+		console = logging.StreamHandler()
+		console.setLevel(console_level)
+		console.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+		writer = AsyncLogWriter([file_handler, console])
+		logger.addHandler(writer.queue_handler())
+		writer.call_soon(file_handler.enforce_size_cap)
+		import atexit
+		atexit.register(writer.stop)
+		_log_writer = writer
+	except Exception:
+		logging.basicConfig(level=logging.INFO)
+	return _log_writer
+
+
+def configure_log_retention(settings: dict):
+	# setup_logging 早于读取设置，user_settings.json 中的 log_keep_days / log_max_mb 在读取后再应用
+	if _log_writer is None:
+		return
+	for handler in _log_writer.handlers:
+		if isinstance(handler, CompressedTimedRotatingFileHandler):
+			try:
+				if settings.get("log_keep_days") is not None:
+					handler.backupCount = max(1, int(settings["log_keep_days"]))
+				if settings.get("log_max_mb") is not None:
+					handler.max_total_bytes = max(0, int(float(settings["log_max_mb"]) * 1024 * 1024))
+			except (TypeError, ValueError):
+				logging.getLogger(__name__).warning("日志保留设置无效，沿用默认值")
+			_log_writer.call_soon(handler.enforce_size_cap)
+
+
+def flush_logging(timeout: float = 5.0) -> bool:
+	return _log_writer.flush(timeout) if _log_writer is not None else True
+
+
+def normalize_url(value: str) -> str:
+	value = (value or "").strip()
+	if not value:
+		return ""
+	# If already has scheme, keep
+	if value.lower().startswith(("http://", "https://")):
+		return value
+	# Accept IP/host[:port][/path]
+	# Basic pattern for IPv4 or hostname
+	pattern = r"^(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?(?:/.*)?$|^[a-zA-Z0-9.-]+(?::\d+)?(?:/.*)?$"
+	if re.match(pattern, value):
+		return f"http://{value}"
+	return value
+
+
+class AdapterProbe:
+	# 单个网卡的探测结果：name 为网卡名，wlan 为对应的无线网卡信息（有线网卡为 None）
+	__slots__ = ("name", "address", "wlan", "result")
+
+	def __init__(self, name: str, address: str, wlan=None, result=None):
+		self.name = name
+		self.address = address
+		self.wlan = wlan
+		self.result = result
+
+	@property
+	def ssid(self) -> str:
+		return self.wlan.ssid or "" if self.wlan is not None else ""
+
+	def as_dict(self) -> dict:
+		result = self.result
+		return {
+			"name": self.name,
+			"address": self.address,
+			"wireless": self.wlan is not None,
+			"ssid": self.ssid,
+			"verdict": result.verdict if result else None,
+			"elapsed_ms": round(result.elapsed * 1000) if result else None,
+			"url": result.url if result else "",
+			"portal_url": result.portal_url if result else ""
+		}
+
+	def __repr__(self):
+		return f"AdapterProbe({self.name!r}, {self.address}, ssid={self.ssid!r}, {self.result.verdict if self.result else None})"
+
+
+class NetworkService:
+	# 无界面的网络操作集合：设置读写、WiFi 连接 / 断开、连通性探测与门户认证
+	def __init__(self, data_dir: str = None):
+		self.data_dir = data_dir or default_data_dir()
+		self.settings_path = os.path.join(self.data_dir, "user_settings.json")
+		self.portals_path = os.path.join(self.data_dir, "portals.json")
+		self.profiles = ProfileStore(os.path.join(self.data_dir, "profiles.json"))
+		self.logs_dir = os.path.join(self.data_dir, "logs")
+		self.settings = {
+			"wifi_ssid": "",
+			"auth_url": ""
+		}
+		self.load_settings()
+		# 连通性历史（data/history.db）；history_enabled 为 false 时不记录
+		self.history = None
+		if self.settings.get("history_enabled", True):
+			self.history = ConnectivityHistory.from_settings(os.path.join(self.data_dir, "history.db"), self.settings)
+		self._last_ssid = None
+		# 各 SSID 的门户会话时长（data/sessions.json），用于到期前续期
+		self.sessions = SessionLeaseModel(os.path.join(self.data_dir, "sessions.json"))
+		self._renewing = False
+		# 连接 / 断开指令串行执行（界面操作、监测重连与转发来的命令共用同一实例）
+		self._wlan_lock = threading.Lock()
+		# 各网卡 IPv4 地址（netsh interface ipv4），多网卡时用于把探测绑定到无线网卡
+		self._ip_interfaces = None
+		self._ip_fetched_at = 0.0
+		self.iface_cache = InterfaceStateCache(fetch=self._fetch_interfaces)
+		# 可见接入点表：连接 / 重连时选用信号最强的接入点，当前接入点信号变弱时漫游（scan_interval 为 0 时不在后台扫描）
+		self.scanner = BssidScanCache(interval=self._scan_interval() or 60.0, on_scan=self.maybe_roam)
+		self._roamed_at = None
+		# 探测与门户请求的本机限流（data/ratelimit.db，多个进程共享）
+		self.limiter = RequestLimiter.from_settings(os.path.join(self.data_dir, "ratelimit.db"), self.settings)
+		self.probe_engine = ProbeEngine.from_settings(self.settings)
+		self._last_verdict = None
+		self.portal_login = PortalLoginEngine(
+			self.portals_path, verify=self._verify_login, on_result=self._record_auth, limiter=self.limiter
+		)
+		self._profile_endpoints = {}
+		self._discovered_url = ""
+		self.metrics_path = os.path.join(self.logs_dir, "metrics.json")
+		if self.settings.get("trace_enabled"):
+			tracer.enabled = True
+
+	@property
+	def target_ssid(self) -> str:
+		return (self.settings.get("wifi_ssid") or "").strip()
+
+	@property
+	def auth_url(self) -> str:
+		return (self.settings.get("auth_url") or "").strip()
+
+	def profile_for(self, ssid: str):
+		# 配置档优先；设置中的 wifi_ssid / auth_url 作为缺省配置档
+		if not ssid:
+			return None
+		profile = self.profiles.get(ssid)
+		if profile is None and ssid == self.target_ssid:
+			profile = NetworkProfile(ssid, self.auth_url)
+		return profile
+
+	def is_known_ssid(self, ssid: str) -> bool:
+		if not self.target_ssid and not self.profiles.all():
+			# 未配置任何网络时不区分 SSID
+			return bool(ssid)
+		return self.profile_for(ssid) is not None
+
+	def preferred_ssid(self) -> str:
+		# 未连接时优先连接的网络：设置中的 SSID，其次是优先级最高的配置档
+		if self.target_ssid:
+			return self.target_ssid
+		profiles = self.profiles.all()
+		return profiles[0].ssid if profiles else ""
+
+	def auth_url_for(self, ssid: str) -> str:
+		# 配置档中的地址 > 设置中的认证 URL > 该 SSID 自动发现的门户地址（手动填写的地址始终优先）
+		profile = self.profile_for(ssid)
+		if profile and profile.auth_url:
+			return profile.auth_url.strip()
+		if self.auth_url:
+			return self.auth_url
+		return self.profiles.discovered_url(ssid) if ssid else self._discovered_url
+
+	def resolve_auth_url(self, ssid: str) -> str:
+		# 尚无认证地址时探测一次：若被门户劫持，重定向目标即为认证页面
+		url = self.auth_url_for(ssid)
+		if not url:
+			result = self.probe(ssid)
+			url = result.portal_url if result.verdict == PROBE_CAPTIVE else ""
+		return url
+
+	def _remember_portal(self, ssid: str, url: str):
+		if not ssid:
+			self._discovered_url = url
+			return
+		if self.profiles.remember_discovered(ssid, url):
+			logging.getLogger(__name__).info(f"已发现 {ssid} 的认证地址：{url}")
+
+	def credentials_for(self, ssid: str):
+		profile = self.profile_for(ssid)
+		return profile.credentials or None if profile else None
+
+	def load_settings(self):
+		try:
+			if os.path.exists(self.settings_path):
+				with open(self.settings_path, "r", encoding="utf-8") as f:
+					data = json.load(f)
+					if isinstance(data, dict):
+						self.settings.update({
+							"wifi_ssid": data.get("wifi_ssid", ""),
+							"auth_url": data.get("auth_url", "")
+						})
+						# 可选的探测、监测等高级配置
+						for key in OPTIONAL_SETTINGS_KEYS:
+							if key in data:
+								self.settings[key] = data[key]
+		except Exception:
+			# Ignore malformed file; keep defaults
+			pass
+
+	def save_settings(self, wifi_ssid: str, auth_url: str) -> bool:
+		try:
+			data = dict(self.settings)
+			data.update({"wifi_ssid": wifi_ssid, "auth_url": auth_url})
+			atomic_write_json(self.settings_path, data)
+			self.settings.update(data)
+			# 同步为该 SSID 的配置档，切换网络时可自动选用对应认证地址
+			if wifi_ssid:
+				profile = self.profiles.get(wifi_ssid) or NetworkProfile(wifi_ssid)
+				profile.auth_url = auth_url
+				self.profiles.upsert(profile)
+			return True
+		except Exception:
+			return False
+
+	def _fetch_interfaces(self) -> InterfaceSnapshot:
+		# 接口缓存的刷新函数：顺带记录 SSID 变化；信号低于漫游阈值时让扫描线程提前刷新
+		snap = query_interface_snapshot()
+		if snap.signal is not None and snap.signal < self._roam_policy()[0]:
+			self.scanner.poke()
+		if snap.ssid != self._last_ssid:
+			if self._last_ssid is not None:
+				self.probe_engine.reset_network()
+				self._ip_interfaces = None
+			if self.history and (self._last_ssid is not None or snap.ssid):
+				self.history.record_ssid(snap.ssid)
+			self._last_ssid = snap.ssid
+		return snap
+
+	def _record_auth(self, result: PortalLoginResult):
+		if self.history:
+			self.history.record_auth("renew" if self._renewing else "portal", result.ok, result.elapsed, result.error)
+		# 续期登录不重置会话起点，由 SessionLeaseModel 判断续期是否有效
+		if result.ok and not self._renewing:
+			self.sessions.on_authenticated(self.get_connected_ssid())
+
+	def renew_session(self, ssid: str) -> bool:
+		# 会话到期前续期：配置了门户账号时重新登录，否则访问一次门户页面作为保活请求
+		url = self.auth_url_for(ssid)
+		if not url:
+			return False
+		credentials = self.credentials_for(ssid)
+		self._renewing = True
+		try:
+			if self.portal_login.has_credentials(url, credentials):
+				return self.portal_login.login(url, credentials).ok
+			self.limiter.acquire("portal")
+			with tracer.span("portal.keepalive"):
+				resp = self.portal_login.fetch(url)
+			return resp.status < 400
+		except Exception as exc:
+			logging.getLogger(__name__).warning(f"门户保活请求失败：{exc}")
+			return False
+		finally:
+			self._renewing = False
+
+	def _record_ready(self, result: ReadinessResult):
+		if self.history:
+			self.history.record_ready(result.ssid, result.ready, result.elapsed)
+
+	def get_interface(self, max_age=None) -> InterfaceSnapshot:
+		return self.iface_cache.get(max_age)
+
+	def get_connected_ssid(self, max_age=None) -> str:
+		return self.iface_cache.get(max_age).ssid
+
+	def connect_to_wifi(self, ssid: str, bssid: str = None, fallback: bool = True) -> bool:
+		import subprocess
+		ok = False
+		start = time.monotonic()
+		try:
+			# 依据现有配置文件进行连接：profile 名通常与 SSID 相同
+			# 扫描表中有该 SSID 时指定信号最强（或 bssid 指定）的接入点；隐藏网络、WLAN API 不可用时由 netsh 连接，交给系统选择
+			# fallback 为 False 时只按接入点连接，不改用 netsh（漫游：netsh 无法指定接入点）
+			target = self._connect_target(ssid, bssid)
+			with self._wlan_lock, tracer.span("netsh.connect", ssid=ssid):
+				if target is not None:
+					ok = wlan_connect_bssid(target[0], ssid, target[1])
+				if not ok and fallback:
+					res = subprocess.run(
+						["netsh", "wlan", "connect", f"name={ssid}"],
+						capture_output=True,
+						text=False,
+						timeout=8
+					)
+					ok = res.returncode == 0
+		except Exception:
+			logging.getLogger(__name__).exception("Exception during WiFi connect command")
+		finally:
+			self.iface_cache.invalidate()
+			self._ip_interfaces = None
+		if self.history:
+			self.history.record_connect(ssid, ok, time.monotonic() - start)
+		return ok
+
+	def _connect_target(self, ssid: str, bssid: str = None):
+		# 返回 (网卡 GUID, BSSID)；扫描表中没有该 SSID 或网卡 GUID 未知时返回 None
+		if bssid:
+			ap = self.scanner.lookup(bssid)
+		else:
+			ap = self.scanner.best(ssid)
+			bssid = ap.bssid if ap else ""
+		if not bssid:
+			return None
+		snap = self.get_interface()
+		iface = (snap.find(ap.interface) if ap and ap.interface else None) or snap.primary
+		if iface is None or not iface.guid:
+			return None
+		return iface.guid, bssid
+
+	def _reconnect(self, ssid: str) -> bool:
+		# 漫游切换接入点时会短暂断开，此时监测不再另发重连指令
+		if self._roamed_at is not None and time.monotonic() - self._roamed_at < 15.0:
+			return False
+		return self.connect_to_wifi(ssid)
+
+	def _scan_interval(self) -> float:
+		try:
+			return max(0.0, float(self.settings.get("scan_interval", 60.0)))
+		except (TypeError, ValueError):
+			return 60.0
+
+	def _roam_policy(self):
+		# (信号阈值 %, 信号差 %, 冷却秒数)
+		try:
+			return (
+				float(self.settings.get("roam_signal_threshold") or 50),
+				float(self.settings.get("roam_signal_margin") or 20),
+				float(self.settings.get("roam_cooldown") or 600)
+			)
+		except (TypeError, ValueError):
+			return 50.0, 20.0, 600.0
+
+	def start_scanner(self):
+		if self._scan_interval() > 0:
+			self.scanner.start()
+
+	def roam_candidate(self):
+		# 当前接入点信号低于 roam_signal_threshold，且同一 SSID 下有信号强出 roam_signal_margin 的接入点时返回该接入点；
+		# 两次漫游至少间隔 roam_cooldown 秒，避免在信号相近的接入点之间来回切换
+		if self.settings.get("roam_enabled") is False:
+			return None
+		snap = self.get_interface()
+		ssid, current, signal = snap.ssid, (snap.bssid or "").lower(), snap.signal
+		if not ssid or signal is None or not self.is_known_ssid(ssid):
+			return None
+		threshold, margin, cooldown = self._roam_policy()
+		if signal >= threshold or (self._roamed_at is not None and time.monotonic() - self._roamed_at < cooldown):
+			return None
+		best = self.scanner.best(ssid)
+		if best is None or best.bssid == current or (best.signal or 0) < signal + margin:
+			return None
+		return best
+
+	def maybe_roam(self) -> bool:
+		# 只经 WLAN API 指定接入点漫游：netsh 只能按配置文件连接，系统多半重新关联到原来的接入点，
+		# 因此 WLAN API 不可用或找不到网卡时不漫游，连接失败也不改用 netsh
+		best = self.roam_candidate()
+		if best is None:
+			return False
+		snap = self.get_interface()
+		if _load_wlan_api() is None or self._connect_target(snap.ssid, best.bssid) is None:
+			logging.getLogger(__name__).debug(f"无法指定接入点（WLAN API 不可用或网卡未知），不漫游到 {best.bssid}")
+			return False
+		self._roamed_at = time.monotonic()
+		logging.getLogger(__name__).info(
+			f"当前接入点 {snap.bssid} 信号 {snap.signal}%，漫游到 {best.bssid}（信号 {best.signal}%，{best.band or '未知频段'}，信道 {best.channel}）"
+		)
+		return self.connect_to_wifi(snap.ssid, best.bssid, fallback=False)
+
+	def disconnect_wifi(self):
+		# 返回 (断开前的 SSID, 是否成功)
+		import subprocess
+		ssid = self.get_connected_ssid()
+		try:
+			with self._wlan_lock, tracer.span("netsh.disconnect"):
+				res = subprocess.run(
+					["netsh", "wlan", "disconnect"],
+					capture_output=True,
+					text=False,
+					timeout=6
+				)
+		finally:
+			self.iface_cache.invalidate()
+		return ssid, res.returncode == 0
+
+	def has_ip_path(self) -> bool:
+		from urllib.parse import urlsplit
+		if not has_ip_path(urlsplit(self.auth_url).hostname or "" if self.auth_url else ""):
+			return False
+		# 多网卡时默认路由可能经有线网卡，需确认无线网卡本身已获得地址（DHCP 完成）
+		wlan = self.get_interface().primary
+		if wlan is None or not self._maybe_multi_homed():
+			return True
+		if not any(i.name != wlan.name for i in self._routed_interfaces()):
+			return True
+		iface = next((i for i in self.get_ip_interfaces(max_age=0) if i.name == wlan.name), None)
+		return iface is not None and bool(iface.usable_address)
+
+	def get_ip_interfaces(self, max_age: float = 30.0):
+		if self._ip_interfaces is None or time.monotonic() - self._ip_fetched_at > max_age:
+			self._ip_interfaces = query_ip_interfaces()
+			self._ip_fetched_at = time.monotonic()
+		return self._ip_interfaces
+
+	@staticmethod
+	def _maybe_multi_homed() -> bool:
+		# 不启动子进程的粗判：本机只有一个非回环、非链路本地的 IPv4 地址时不可能经其他网卡出网，
+		# 单网卡主机的探测路径上省去一次 netsh interface ipv4 查询；无法判断时按多网卡处理
+		import socket
+		try:
+			addresses = socket.gethostbyname_ex(socket.gethostname())[2]
+		except OSError:
+			return True
+		return len({a for a in addresses if not a.startswith(("127.", "169.254."))}) > 1
+
+	def _routed_interfaces(self):
+		# 有可用地址和默认网关的网卡（排除回环与 DHCP 未完成的网卡）
+		return [i for i in self.get_ip_interfaces() if i.usable_address and i.gateway]
+
+	def source_address_for(self, ssid: str) -> str:
+		# 仅在多网卡（如有线 + 无线）时绑定无线网卡地址，避免探测经其他链路成功而掩盖门户掉线
+		if not ssid or not self._maybe_multi_homed():
+			return ""
+		routed = self._routed_interfaces()
+		if len(routed) < 2:
+			return ""
+		wlan = next((i for i in self.get_interface().interfaces if i.ssid == ssid), None)
+		if wlan is None:
+			return ""
+		return next((i.usable_address for i in routed if i.name == wlan.name), "")
+
+	def _endpoints_for(self, ssid: str):
+		# 配置档指定了探测地址时（如内网探测）使用配置档的地址，否则返回 None 使用默认地址
+		profile = self.profiles.get(ssid) if ssid else None
+		if profile is None or not profile.probe_endpoints:
+			return None
+		key = (profile.ssid, json.dumps(profile.probe_endpoints, sort_keys=True))
+		endpoints = self._profile_endpoints.get(key)
+		if endpoints is None:
+			timeout = float(self.settings.get("probe_timeout") or 3.0)
+			endpoints = [e for e in (ProbeEndpoint.from_config(i, timeout) for i in profile.probe_endpoints) if e]
+			self._profile_endpoints[key] = endpoints
+		return endpoints
+
+	def _run_probe(self, ssid: str, source_address: str, wait: float = None) -> ProbeResult:
+		# wait 内取不到限流令牌时不探测，返回无结论（verdict 为 None）的结果
+		if not self.limiter.acquire("probe", wait):
+			return ProbeResult("", None, error=RuntimeError("探测过于频繁，已跳过"))
+		result = self.probe_engine.run(endpoints=self._endpoints_for(ssid), source_address=source_address)
+		if source_address and isinstance(result.error, OSError):
+			# 网卡地址可能已变化（重新获取 IP），下次重新查询
+			self._ip_interfaces = None
+		return result
+
+	def probe(self, ssid: str = None, wait: float = None) -> ProbeResult:
+		result = self._run_probe(ssid, self.source_address_for(ssid), wait)
+		if result.verdict is None:
+			return result
+		previous, self._last_verdict = self._last_verdict, result.verdict
+		if {previous, result.verdict} == {PROBE_CAPTIVE, PROBE_ONLINE}:
+			# 门户放行或重新拦截后，之前的解析结果与空闲连接都可能指向错误的地址
+			self.probe_engine.reset_network()
+		if self.history:
+			self.history.record_probe(result.verdict, result.elapsed, ssid or "")
+		if result.portal_url:
+			self._remember_portal(ssid or "", result.portal_url)
+		return result
+
+	def probe_adapters(self):
+		# 对每个有地址和网关的网卡分别绑定其地址并发探测，各自给出可用 / 需认证 / 不可用的结论
+		wlans = {i.name: i for i in self.get_interface().interfaces}
+		targets = [AdapterProbe(i.name, i.usable_address, wlans.get(i.name)) for i in self._routed_interfaces()]
+		if not targets:
+			return []
+		from concurrent.futures import ThreadPoolExecutor
+		with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="adapter-probe") as executor:
+			futures = [executor.submit(self._run_probe, t.ssid, t.address) for t in targets]
+			for target, future in zip(targets, futures):
+				target.result = future.result()
+		for target in targets:
+			logging.getLogger(__name__).info(f"网卡探测：{target}")
+			if target.ssid and target.result.portal_url:
+				self._remember_portal(target.ssid, target.result.portal_url)
+		return targets
+
+	def _verify_login(self) -> bool:
+		# 登录后门户才放行：先丢弃登录前（可能被 DNS 劫持）的解析结果与连接，
+		# 再按当前 SSID 的配置档验证（只能访问内网的配置档使用其自己的探测地址）
+		self.probe_engine.reset_network()
+		return self.is_network_usable(self.get_connected_ssid())
+
+	def is_network_usable(self, ssid: str = None) -> bool:
+		# 通过公共探测地址判断是否真正“可用”（并发探测，取最快的决定性结果）
+		return self.probe(ssid).verdict == PROBE_ONLINE
+
+	def create_readiness_waiter(self) -> ReadinessWaiter:
+		return ReadinessWaiter(
+			lambda: self.get_connected_ssid(max_age=0), self.has_ip_path,
+			deadline=float(self.settings.get("connect_ready_deadline") or 20.0),
+			on_result=self._record_ready
+		)
+
+	def create_monitor(self, on_transition=None) -> ConnectivityMonitor:
+		return ConnectivityMonitor.from_settings(
+			self.settings, self.get_connected_ssid,
+			# 限流时不等待，本次视为跳过探测
+			lambda: self.probe(self.get_connected_ssid(), wait=0).verdict,
+			reconnect=self._reconnect,
+			on_transition=on_transition,
+			target_ssid=self.preferred_ssid,
+			is_target=self.is_known_ssid,
+			lease=self.sessions if self.settings.get("session_renew_enabled", True) else None,
+			renew=self.renew_session,
+			probe_retry=lambda: self.limiter.retry_after("probe")
+		)
+
+	def startup_delay(self, key: str = None) -> float:
+		# 错峰启动：startup_jitter 秒内按主机名确定的偏移，机房内大量机器同时开机时不会同时探测与认证
+		return host_jitter(float(self.settings.get("startup_jitter") or 0), key)
+
+	def dump_metrics(self) -> bool:
+		return tracer.dump(self.metrics_path)
+
+	def shutdown(self) -> bool:
+		# 开启追踪时退出前写出各阶段耗时统计；返回是否写出了 metrics.json
+		dumped = bool(tracer.enabled and tracer.recent) and self.dump_metrics()
+		self.scanner.stop()
+		self.probe_engine.shutdown()
+		self.portal_login.session.close()
+		self.limiter.close()
+		if self.history:
+			self.history.close()
+		return dumped
+
+
+def instance_port(data_dir: str) -> int:
+	# 单实例端口由数据目录推导：同一份数据只允许一个实例，不同安装目录互不影响
+	import zlib
+	key = os.path.normcase(os.path.abspath(data_dir)).encode("utf-8")
+	return 49152 + zlib.crc32(key) % 16000
+
+
+class InstanceServer:
+	# 单实例与本地命令通道：首个实例独占 127.0.0.1 上的固定端口（绑定即为抢占，天然互斥），
+	# 随机令牌写入 data/instance.json，后续启动的界面 / 命令行携带令牌把命令转交给它后立即退出
+	# 协议：每个连接一行 JSON 请求 {"token", "command", "args"}，先回一行确认，执行完再回一行结果
+	# 界面在构建窗口之前就绑定端口，handler 可稍后再设置；之前收到的命令回复“正在启动”
+	def __init__(self, data_dir: str, handler=None, mode: str = "gui"):
+		self.data_dir = data_dir
+		self.handler = handler
+		self.mode = mode
+		self.path = os.path.join(data_dir, "instance.json")
+		self.port = instance_port(data_dir)
+		self._token = ""
+		self._server = None
+		self._thread = None
+
+	@property
+	def serving(self) -> bool:
+		return self._server is not None
+
+	def start(self) -> bool:
+		import secrets
+		import socket
+		import socketserver
+		owner = self
+
+		class Handler(socketserver.StreamRequestHandler):
+			def handle(self):
+				owner._serve(self.rfile, self.wfile)
+
+		class Server(socketserver.ThreadingTCPServer):
+			daemon_threads = True
+			allow_reuse_address = False
+
+			def server_bind(self):
+				# Windows 下默认可被设置了 SO_REUSEADDR 的其他进程抢绑，需独占
+				if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+					self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+				super().server_bind()
+
+		try:
+			self._server = Server(("127.0.0.1", self.port), Handler)
+		except OSError:
+			return False
+		self._token = secrets.token_hex(16)
+		try:
+			atomic_write_json(self.path, {"port": self.port, "token": self._token, "pid": os.getpid(), "mode": self.mode})
+		except Exception:
+			logging.getLogger(__name__).exception("写入实例信息失败")
+			self._server.server_close()
+			self._server = None
+			return False
+		self._thread = threading.Thread(target=self._server.serve_forever, name="instance-ipc", daemon=True)
+		self._thread.start()
+		logging.getLogger(__name__).info(f"已启用单实例命令通道：127.0.0.1:{self.port}")
+		return True
+
+	def _serve(self, rfile, wfile):
+		import hmac
+		try:
+			request = json.loads(rfile.readline(65536).decode("utf-8"))
+			if not hmac.compare_digest(str(request.get("token", "")), self._token):
+				reply = {"ok": False, "error": "invalid token"}
+			else:
+				wfile.write(json.dumps({"accepted": True, "pid": os.getpid(), "mode": self.mode}).encode("utf-8") + b"\n")
+				wfile.flush()
+				handler = self.handler
+				if handler is None:
+					reply = {"ok": False, "error": "OCOA 正在启动，请稍后再试"}
+				else:
+					reply = handler(request.get("command") or "", list(request.get("args") or []))
+		except Exception as exc:
+			logging.getLogger(__name__).exception("处理转发命令失败")
+			reply = {"ok": False, "error": str(exc)}
+		try:
+			wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+		except OSError:
+			pass
+
+	def close(self):
+		if self._server is None:
+			return
+		self._server.shutdown()
+		self._server.server_close()
+		self._server = None
+		# 仅删除自己写入的实例信息
+		try:
+			with open(self.path, "r", encoding="utf-8") as f:
+				if json.load(f).get("token") == self._token:
+					os.remove(self.path)
+		except Exception:
+			pass
+
+
+def send_instance_command(data_dir: str, command: str, args=(), timeout: float = 120.0):
+	# 转交命令给已运行的实例；返回其结果，没有可用实例时返回 None（调用方自行处理）
+	try:
+		with open(os.path.join(data_dir, "instance.json"), "r", encoding="utf-8") as f:
+			info = json.load(f)
+		token = info["token"]
+	except Exception:
+		return None
+	request = json.dumps({"token": token, "command": command, "args": list(args)}).encode("utf-8") + b"\n"
+	import socket
+	try:
+		with socket.create_connection(("127.0.0.1", instance_port(data_dir)), timeout=1.0) as sock:
+			sock.sendall(request)
+			rfile = sock.makefile("rb")
+			# 确认行须很快返回，否则视为端口被其他程序占用
+			ack = json.loads(rfile.readline(65536) or b"null")
+			if not isinstance(ack, dict) or not ack.get("accepted"):
+				return None
+			sock.settimeout(timeout)
+			reply = json.loads(rfile.readline() or b"null")
+	except (OSError, ValueError):
+		return None
+	if isinstance(reply, dict):
+		reply.setdefault("mode", ack.get("mode"))
+		reply.setdefault("pid", ack.get("pid"))
+	return reply